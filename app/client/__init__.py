@@ -1,2 +1,6 @@
-from .wslclient import WSLClient
-from .mobile import MobileClient
+from utils.lazy import lazy_import
+
+__getattr__ = lazy_import(__name__, {
+    "WSLClient": ".wslclient",
+    "MobileClient": ".mobile",
+})
@@ -1,25 +1,68 @@
 import os
-from config import logger
+from config import logger, eva_configuration, tracer
 import asyncio
-from typing_extensions import Dict, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.queues import Queue
+from typing_extensions import Dict, Iterator, List, Optional, Callable
  
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi import File, UploadFile, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 import uvicorn
 from pathlib import Path
 
 from client.data_manager import DataManager
+from client.outbox import Outbox
+from utils.media import media_store
+from utils.extension.html import get_template
+
+
+class _WholeFileResponse(FileResponse):
+    """ A FileResponse that always sends the whole file, the endpoint already decided the Range header is ignored """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        scope = {**scope, "headers": [(name, value) for name, value in scope["headers"] if name not in (b"range", b"if-range")]}
+        await super().__call__(scope, receive, send)
 
 
 class ConnectionManager:
-    def __init__(self, stt_model: str, vision_model: str):
+    """
+    FastAPI server for the mobile clients.
+    
+    In multi-session mode every client id gets its own DataManager, so the turns of different
+    clients never mix. Otherwise all clients share a single DataManager, as one conversation.
+    
+    Attributes:
+        stt_model: Speech to text model shared by the data managers.
+        vision_model: Vision model shared by the data managers.
+        data_managers (Dict): Data manager of each client id, a single one under None if not multi-session.
+        on_connect (Callable): Called with the client id when a client connects.
+        loop: The event loop the server is running on.
+        outboxes (Dict): Outbound message queue of each connection, written by its own task.
+        stt_executor: Executor running the transcriptions of all the clients.
+        vision_executor: Executor running the image descriptions of all the clients.
+        relay: Queue to the engine process when the server runs in its own process, see client.ipc.
+    """
+    def __init__(self, stt_model: str, vision_model: str, multi_session: bool = False, relay: Optional[Queue] = None):
         self.app = FastAPI()
-        self.data_manager = DataManager(stt_model, vision_model) 
+        self.stt_model = stt_model
+        self.vision_model = vision_model
+        self.multi_session: bool = multi_session
+        self.relay: Optional[Queue] = relay # in the server process, the messages are relayed to the engine
+        self.data_managers: Dict[Optional[str], DataManager] = {}
+        self.on_connect: Optional[Callable[[str], None]] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # the models run on their own workers, the server loop only dispatches
+        self.stt_executor = ThreadPoolExecutor(eva_configuration.get("STT_WORKERS", 2), thread_name_prefix="stt")
+        self.vision_executor = ThreadPoolExecutor(eva_configuration.get("VISION_WORKERS", 2), thread_name_prefix="vision")
+        self._lock = threading.Lock() # the sessions look up their data manager from their own threads
         
-        self.media_folder: str = "/media" # TODO: make this configurable
         self.client_id: Optional[str] = None
         self.active_connections: Dict[str, WebSocket] = {}
+        self.outboxes: Dict[str, Outbox] = {}
         
         # Common CORS headers for file downloads
         self.cors_headers = {
@@ -27,60 +70,125 @@ class ConnectionManager:
             "Access-Control-Allow-Methods": "GET, OPTIONS",
             "Access-Control-Allow-Headers": "Content-Type, Accept, Range, *",
             "Access-Control-Max-Age": "86400",  # 24 hours
+            "Access-Control-Expose-Headers": "ETag, Content-Range, Accept-Ranges, Content-Length",
         }
         
         self.setup_routes()
 
+    def get_data_manager(self, client_id: Optional[str] = None) -> DataManager:
+        """ Get the data manager of the client, create it on first use """
+        key = client_id if self.multi_session else None
+        with self._lock:
+            if key not in self.data_managers:
+                self.data_managers[key] = self._new_data_manager()
+                
+            return self.data_managers[key]
+    
+    def _new_data_manager(self) -> DataManager:
+        """ Create the data manager of a client, the server process mode relays the data instead """
+        return DataManager(self.stt_model, self.vision_model, self.stt_executor, self.vision_executor)
+
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
 
         websocket.receive_limit = None
         websocket.send_limit = None
+        self.loop = asyncio.get_running_loop()
+        self.disconnect(client_id) # a reconnecting client replaces its previous connection
         self.active_connections[client_id] = websocket
-        self.client_id = client_id # manage the client_id later
+        self.outboxes[client_id] = Outbox(websocket)
+        self.outboxes[client_id].start()
+        self.client_id = client_id # the latest client, used when no client id is given
         
-        initial_data = self.data_manager.get_session_data()
-        await self.send_message(initial_data)
+        # clients opt in to binary media frames with ?protocol=binary, the others keep JSON
+        protocol = websocket.query_params.get("protocol", "json")
+        initial_data = self.get_data_manager(client_id).get_session_data(protocol)
+        await self.send_message(initial_data, client_id)
+        
+        if self.on_connect:
+            self.on_connect(client_id)
+
+    def is_connected(self, client_id: Optional[str]) -> bool:
+        """ Whether the client has an open connection """
+        return (client_id or self.client_id) in self.active_connections
+    
+    def release_client(self, client_id: str) -> None:
+        """ Drop the data manager of a client that is gone, called from its session thread """
+        if not self.multi_session or self.is_connected(client_id):
+            return
+        
+        with self._lock:
+            data_manager = self.data_managers.pop(client_id, None)
+        if data_manager and self.loop:
+            asyncio.run_coroutine_threadsafe(data_manager.stop(), self.loop)
 
-    def disconnect(self, client_id: str):
+    def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None) -> bool:
+        """ Remove the connection of the client, only if it is still the given websocket """
+        if websocket is not None and self.active_connections.get(client_id) is not websocket:
+            return False
+        
         self.active_connections.pop(client_id, None)
+        if outbox := self.outboxes.pop(client_id, None):
+            outbox.close()
+            
+        return True
 
-    async def send_message(self, message: str, client_id: str = None):
-        # manage the client id later.
+    def _queue_message(self, message: str, client_id: Optional[str], coalesce: bool, droppable: bool = False) -> None:
+        """ Queue a message in the outbox of the client, on the server loop """
         if client_id is None:
             client_id = self.client_id
         
         #logger.info(f"Sending message to client: {client_id} :: {message}")
         
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_text(message)
+        if outbox := self.outboxes.get(client_id):
+            outbox.put(message, coalesce, droppable)
+
+    async def send_message(self, message: str, client_id: str = None, coalesce: bool = False):
+        """ Queue a message to the client, it is sent by the outbox of the connection """
+        self._queue_message(message, client_id, coalesce)
+            
+    def post_message(self, message: str, client_id: str = None, coalesce: bool = True) -> bool:
+        """ Queue a message from any thread without waiting, False if no client ever connected """
+        if self.loop is None:
+            return False
+        
+        self.loop.call_soon_threadsafe(self._queue_message, message, client_id, coalesce)
+        return True
         
     async def broadcast(self, message: str):
-        for websocket in self.active_connections.values():
-            await websocket.send_text(message)
+        for outbox in self.outboxes.values():
+            outbox.put(message, coalesce=True)
 
             
     def setup_routes(self):
         @self.app.websocket("/ws/{client_id}")
         async def websocket_endpoint(websocket: WebSocket, client_id: str):
             await self.connect(websocket, client_id)
-            await self.data_manager.start_queue()
+            data_manager = self.get_data_manager(client_id)
+            await data_manager.start_queue()
             try:
                 while True:
-                    message = await websocket.receive_text()
-
-                    response = await self.data_manager.process_message(message, client_id)
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(message.get("code", 1000))
+                    
+                    # binary frames carry raw media, text frames carry JSON
+                    message = message["bytes"] if message.get("bytes") is not None else message.get("text")
+                    response = await data_manager.process_message(message, client_id)
 
-                    await self.send_message(response)
-                    await asyncio.sleep(0.3)
+                    # the acknowledgements are the first messages dropped for a slow client
+                    self._queue_message(response, client_id, coalesce=False, droppable=True)
                     
             except WebSocketDisconnect:
-                self.disconnect(client_id)
+                pass
             except Exception as e:
                 raise Exception(f"Error handling connection: {str(e)}")
             finally:
-                self.disconnect(client_id)
-                await self.data_manager.stop()
+                # a client that reconnected keeps its data manager running
+                if self.disconnect(client_id, websocket):
+                    await data_manager.stop()
+                    if self.relay is not None and self.multi_session:
+                        self.data_managers.pop(client_id, None) # the relay keeps no state, the engine owns the session
         
         # @self.app.post("/upload/")
         # async def upload_file(file: UploadFile = File(...)):
@@ -103,7 +211,7 @@ class ConnectionManager:
         #     return {"url": file_path}
 
         @self.app.get("/download/{file_type}/{filename}")
-        async def download_file(file_type: str, filename: str, session_id: Optional[str] = None):
+        async def download_file(file_type: str, filename: str, request: Request):
             """
             GET endpoint to serve audio and image files. This handles the actual file downloads.
             For browsers using CORS, the preflight OPTIONS request will be handled by options_download_file below.
@@ -112,49 +220,90 @@ class ConnectionManager:
             - Modern browsers using CORS will first send an OPTIONS request (preflight) 
             - After receiving a successful response from OPTIONS, they'll send the actual GET request
             - Both endpoints use the same CORS headers from self.cors_headers
+            
+            The files are content addressed and never change, so the name is a strong ETag and they are cached
+            as immutable. Revalidations get a 304 and audio seeking is served with Range requests.
             """
             if file_type not in ["images", "audio"]:
                 raise HTTPException(status_code=400, detail="Invalid file type.")
-            
-            if not session_id:
-                logger.warning(f"File request without session ID for file: {filename} - this may cause caching issues")
                 
-            # Construct the path relative to the app root directory
-            file_path = os.path.join(os.getcwd(), "app", "data", "media", file_type, filename)
-                
-            if not os.path.isfile(file_path):
-                logger.error(f"File not found: {file_path}")
+            # the file is kept in the store until the response is sent
+            file_path = media_store.acquire(file_type, filename)
+            if file_path is None:
+                logger.error(f"File not found: {file_type}/{filename}")
                 raise HTTPException(status_code=404, detail=f"File: {filename} not found")
+            
+            release = BackgroundTask(media_store.release, file_type, filename)
+            headers = {
+                **self.cors_headers,
+                "ETag": f'"{Path(filename).stem}"',
+                "Cache-Control": "public, max-age=31536000, immutable",
+                "Accept-Ranges": "bytes",
+            }
 
             try:
+                # the client already has this file
+                if self._etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+                    return Response(status_code=304, headers=headers, background=release)
+                
                 # Use appropriate media type based on file_type
                 media_type = "audio/mpeg" if file_type == "audio" else "image/jpeg"
+                size = file_path.stat().st_size
+                
+                # a partial request, unless If-Range refers to another version
+                byte_range = request.headers.get("range")
+                if_range = request.headers.get("if-range")
+                if byte_range and (not if_range or if_range == headers["ETag"]):
+                    start, end = self._parse_range(byte_range, size)
+                    if start is not None:
+                        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                        headers["Content-Length"] = str(end - start + 1)
+                        return StreamingResponse(
+                            self._read_range(file_path, start, end),
+                            status_code=206,
+                            media_type=media_type,
+                            headers=headers,
+                            background=release
+                        )
                 
                 # Create a response with the file
-                response = FileResponse(
+                return _WholeFileResponse(
                     file_path, 
                     filename=filename, 
-                    media_type=media_type
+                    media_type=media_type,
+                    headers=headers,
+                    background=release
                 )
                 
-                # Add CORS headers from the common set
-                for header, value in self.cors_headers.items():
-                    response.headers[header] = value
-                
-                # Set caching headers based on session_id
-                if session_id:
-                    # Use cache control that allows caching but requires revalidation
-                    response.headers["Cache-Control"] = "private, max-age=60, must-revalidate"
-                    response.headers["Vary"] = "session_id"  # Vary on the session ID
-                else:
-                    # No caching if no session ID (to be safe)
-                    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate"
-                
-                return response
+            except HTTPException:
+                media_store.release(file_type, filename)
+                raise
             except Exception as e:
+                media_store.release(file_type, filename)
                 logger.error(f"Error accessing file: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Error accessing file: {str(e)}")
 
+        @self.app.get("/template/{template_id}")
+        async def get_html_template(template_id: str, request: Request):
+            """
+            GET endpoint of the html templates, for the clients that missed the pushed template after a reconnect.
+            The hash is the ETag, the client asks for /template/<id>?v=<hash> so a version is cached as immutable.
+            """
+            try:
+                html, content_hash = get_template(f"{template_id}.html")
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail=f"Template: {template_id} not found")
+            
+            headers = {
+                **self.cors_headers,
+                "ETag": f'"{content_hash}"',
+                "Cache-Control": "public, max-age=31536000, immutable",
+            }
+            if self._etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+            
+            return Response(content=html, media_type="text/html", headers=headers)
+
         @self.app.options("/download/{file_type}/{filename}")
         async def options_download_file(file_type: str, filename: str):
             """
@@ -177,9 +326,73 @@ class ConnectionManager:
         def is_valid(filename: str, allowed_extensions: List[str]) -> bool:
             return any(filename.lower().endswith(ext) for ext in allowed_extensions)
 
-    def get_message(self):
-        return self.data_manager.get_first_data()
+    @staticmethod
+    def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        """ Whether an If-None-Match header matches the ETag, weak comparison as in RFC 9110 """
+        if not if_none_match:
+            return False
+        
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    
+    @staticmethod
+    def _parse_range(byte_range: str, size: int) -> tuple[Optional[int], Optional[int]]:
+        """
+        Parse a single bytes range, (None, None) to serve the whole file, raise a 416 if it is unsatisfiable.
+        As in RFC 9110, an invalid range (bytes=5-3, bytes=a-b) is ignored, only a valid one out of the file is a 416.
+        """
+        unit, _, ranges = byte_range.partition("=")
+        if unit.strip() != "bytes" or "," in ranges: # multiple ranges are answered with the whole file
+            return None, None
+        
+        first, _, last = (part.strip() for part in ranges.partition("-"))
+        if not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+            return None, None
+        if first and last and int(last) < int(first):
+            return None, None
+        
+        if not first: # the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+            satisfiable = int(last) > 0 and size > 0
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+            satisfiable = start < size
+            
+        if not satisfiable:
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+        
+        return start, end
+    
+    @staticmethod
+    def _read_range(file_path: Path, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """ Read the bytes from start to end included, chunk by chunk """
+        with open(file_path, "rb") as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = file.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        
+    def get_message(self, client_id: Optional[str] = None, timeout: Optional[float] = None) -> Optional[Dict]:
+        """ Block the calling thread until the next message of the client is assembled """
+        data_manager = self.get_data_manager(client_id)
+        data_manager.trace_id = tracer.trace_id # the input belongs to the turn waiting for it
+        return data_manager.get_turn(timeout)
+
+    async def wait_message(self, client_id: Optional[str] = None) -> Dict:
+        """ Wait on the server loop for the next message of the client """
+        data_manager = self.get_data_manager(client_id)
+        data_manager.trace_id = tracer.trace_id
+        return await data_manager.wait_turn()
 
     def run_server(self):
         uvicorn.run(self.app, host="0.0.0.0", port=8080)
 
+    async def serve(self):
+        """ Serve the app on the running event loop, used by the async mode """
+        config = uvicorn.Config(self.app, host="0.0.0.0", port=8080)
+        await uvicorn.Server(config).serve()
+
@@ -1,12 +1,16 @@
-from config import logger
-import json
+from config import logger, tracer
 import asyncio
-from typing_extensions import Dict, Optional, List
+import queue
+from concurrent.futures import Executor
+from typing_extensions import Dict, Optional, Set
 import secrets
+import time
 
 from utils.stt.transcriber import Transcriber
+from utils.stt.incremental import IncrementalTranscriber
 from utils.vision.describer import Describer
-from client.functions import convert_audio_data 
+from client.functions import convert_audio_data, convert_pcm_data
+from client.protocol import decode_frame, dumps, loads
 
 class DataManager:
     """
@@ -18,22 +22,70 @@ class DataManager:
 
     Attributes:
         session_data (asyncio.Queue): Queue for storing session data to be processed
-        session_data_list (List[Dict]): List to store processed session data
+        sessions (Dict[str, Dict]): The turns being assembled, keyed by session id, with the audio stream if any
+        session_ttl (float): Seconds after which an incomplete session without pending items is dropped
         transcriber (Transcriber): Model for speech-to-text transcription
         img_describer (Describer): Model for image description/analysis
         processing_task (Optional[asyncio.Task]): Task for processing the data queue
+        stt_executor (Executor): Executor running the transcriptions, off the server loop
+        vision_executor (Executor): Executor running the image descriptions, off the server loop
+        turns (queue.Queue): Thread-safe queue of the complete session data, pushed as soon as they are assembled
+        data_ready (asyncio.Event): Set when a complete session data is pushed, for consumers on the server loop
+        max_buffered_bytes (int): Cap of the media held by the manager, the items over it are rejected
+        max_message_bytes (int): Cap of a single item
+        buffered_bytes (int): The media currently held, queued or being processed
+        frames_dropped (int): The camera frames replaced by a newer one before they were described
+        trace_id (Optional[str]): The trace of the turn waiting for the input, set by the session thread
+    
+    Ingest policies:
+        audio, audioChunk: never dropped, only rejected with an ack over the hard caps
+        frontImage, backImage: latest only, a frame waiting for the vision model is replaced by a newer one
+                                of the same camera, one description per camera runs at a time
     """
     
-    def __init__(self, stt_model: Transcriber, vision_model: Describer) -> None:
+    type_mapping = {
+        "frontImage": "observation",
+        "backImage": "view",
+        "audio": "user_message"
+    }
+    media_types = ("audio", "audioChunk", "frontImage", "backImage")
+    
+    def __init__(
+        self, 
+        stt_model: Transcriber, 
+        vision_model: Describer, 
+        stt_executor: Optional[Executor] = None, 
+        vision_executor: Optional[Executor] = None,
+        session_ttl: float = 120.0,
+        max_buffered_bytes: int = 64 * 1024 * 1024,
+        max_message_bytes: int = 16 * 1024 * 1024
+    ) -> None:
         self.session_data = asyncio.Queue()
-        self.session_data_list : List[Dict] = []
+        self.sessions: Dict[str, Dict] = {} # session_id -> {"content", "pending", "updated"}
+        self.session_ttl: float = session_ttl
+        self._last_sweep: float = time.monotonic()
         
         self.transcriber: Transcriber = stt_model
         self.img_describer: Describer = vision_model
+        self.stt_executor: Optional[Executor] = stt_executor # None uses the default executor of the loop
+        self.vision_executor: Optional[Executor] = vision_executor
         self.processing_task = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._last_turn: Optional[asyncio.Task] = None
+        self.turns: queue.Queue = queue.Queue()
+        self.data_ready = asyncio.Event()
+        
+        self.max_buffered_bytes: int = max_buffered_bytes
+        self.max_message_bytes: int = max_message_bytes
+        self.buffered_bytes: int = 0
+        self.frames_dropped: int = 0
+        self.trace_id: Optional[str] = None
         
     async def start_queue(self) -> None:
-        """Start the processing task."""
+        """Start the processing task, unless it is already running."""
+        if self.processing_task and not self.processing_task.done():
+            return
+        
         self.processing_task = asyncio.create_task(self._process_queue())
         
     async def stop(self) -> None:
@@ -46,21 +98,66 @@ class DataManager:
             except asyncio.CancelledError:
                 pass
             
-    async def process_message(self, message: str, client_id: Optional[str] = None) -> str:
-        """Process incoming messages and handle them accordingly."""
-        message_json = json.loads(message)
-        session_id = message_json.get("session_id")
-        message_type = message_json.get("type")
-                
+    @staticmethod
+    def parse_message(message: str | bytes) -> Dict:
+        """Parse an incoming message, JSON text or binary frame."""
+        if isinstance(message, (bytes, bytearray)):
+            frame = decode_frame(message)
+            return {
+                "session_id": frame.session_id,
+                "type": frame.type,
+                "content": frame.payload, # raw bytes, no base64
+                "sequence": frame.sequence
+            }
+        
+        return loads(message)
+    
+    @staticmethod
+    def acknowledge(message_json: Dict, accepted: bool = True) -> str:
+        """Build the validation message of an incoming message, binary acks echo the sequence."""
         response_data = {
-            "session_id" : session_id,
-            "type" : f"validation-{message_type}",
-            "content" : "success"
+            "session_id" : message_json.get("session_id"),
+            "type" : f"validation-{message_json.get('type')}",
+            "content" : "success" if accepted else "rejected"
             }
+        if "sequence" in message_json:
+            response_data["sequence"] = message_json["sequence"]
+        
+        return dumps(response_data)
+            
+    async def process_message(self, message: str | bytes, client_id: Optional[str] = None) -> str:
+        """Process incoming messages and handle them accordingly, JSON text or binary frames."""
+        message_json = self.parse_message(message)
+        if not self.admit(message_json):
+            return self.acknowledge(message_json, accepted=False)
         
         await self.session_data.put(message_json) # put data in the queue for process
         
-        return json.dumps(response_data)
+        return self.acknowledge(message_json)
+    
+    @classmethod
+    def _content_size(cls, data: Dict) -> int:
+        """The media bytes accounted for an item, the control messages (over) hold none."""
+        if data.get("type") not in cls.media_types:
+            return 0
+        
+        content = data.get("content")
+        return len(content) if isinstance(content, (str, bytes, bytearray, memoryview)) else 0
+    
+    def admit(self, message_json: Dict) -> bool:
+        """Account for an incoming item, False if it is over the memory caps and must be rejected."""
+        size = self._content_size(message_json)
+        if size > self.max_message_bytes or (size and self.buffered_bytes + size > self.max_buffered_bytes):
+            logger.warning(f"DataManager: {message_json.get('type')} of {size / 1024:.0f}KB rejected, "
+                           f"{self.buffered_bytes / 1024 / 1024:.1f}MB buffered.")
+            return False
+        
+        self.buffered_bytes += size
+        return True
+    
+    def _release(self, data: Dict) -> None:
+        """Release the memory accounted for a processed or dropped item."""
+        self.buffered_bytes = max(0, self.buffered_bytes - self._content_size(data))
     
     async def _process_queue(self) -> None:
         """Process the data in the queue."""
@@ -69,33 +166,26 @@ class DataManager:
                 data = await self.session_data.get()
                 if data is None:
                     continue
-
-                data_type = data["type"]
-                content = data["content"]
                 
-                result = None
+                self._expire_sessions()
                 
-                # process the data based on the data type
-                match data_type:
-                    case "audio":
-                        audio_data = convert_audio_data(content)
-                        result = self.transcriber.transcribe(audio_data)
+                # the items are processed concurrently, the turn is detached on over so the next one starts clean
+                session_id = data.get("session_id")
+                if data["type"] == "over":
+                    session = self.sessions.pop(session_id, None)
+                    if session and session.get("stream"):
+                        self._spawn(self._finish_stream(session), session)
+                    self._last_turn = self._spawn(self._finish_session(session_id, session, self._last_turn))
                     
-                    case "frontImage" | "backImage":
-                        result = self.img_describer.describe("vision", content)
+                elif data["type"] == "audioChunk":
+                    self._stream_audio(data, self._get_session(session_id))
                     
-                    case "over":
-                        result = "success"
+                elif data["type"] in ("frontImage", "backImage"):
+                    self._describe_latest(data, self._get_session(session_id))
                     
-                    case _:
-                        logger.error(f"Unsupported data type: {data_type}")
-                        result = "error"
-                        return
-
-                data["content"] = result
-                self.session_data_list.append(data)
-                logger.debug(f"Session data: {self.session_data_list}")
-                await asyncio.sleep(0.5)
+                else:
+                    session = self._get_session(session_id)
+                    self._spawn(self._process_data(data, session), session)
                 
             except asyncio.CancelledError:
                 logger.info("Processing queue cancelled")
@@ -103,51 +193,186 @@ class DataManager:
             except Exception as e:
                 logger.error(f"Error in processing data queue: {e}", exc_info=True)
                 continue
+    
+    def _spawn(self, coro, session: Optional[Dict] = None) -> asyncio.Task:
+        """Run a processing task, keep a reference to it and count it as pending in its session."""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        
+        if session is not None:
+            session["pending"].add(task)
+            task.add_done_callback(session["pending"].discard)
+            
+        return task
+    
+    def _get_session(self, session_id: Optional[str]) -> Dict:
+        """Get the pending turn of the session, create it on its first item."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = {
+                "content": {}, "pending": set(), "updated": time.monotonic(), "trace_id": self.trace_id
+            }
+            
+        session["updated"] = time.monotonic()
+        return session
+    
+    def _expire_sessions(self) -> None:
+        """Drop the incomplete sessions that did not receive anything for session_ttl seconds."""
+        now = time.monotonic()
+        if now - self._last_sweep < self.session_ttl / 4:
+            return
+        
+        self._last_sweep = now
+        for session_id, session in list(self.sessions.items()):
+            if not session["pending"] and now - session["updated"] > self.session_ttl:
+                logger.warning(f"Session {session_id} expired before it was over, dropped.")
+                del self.sessions[session_id]
+                self.buffered_bytes = max(0, self.buffered_bytes - session.get("stream_bytes", 0))
             
+    def _transcribe(self, content: str | bytes) -> Optional[tuple[str, str]]:
+        """Decode and transcribe the audio, runs on the stt executor."""
+        audio_data = convert_audio_data(content)
+        return self.transcriber.transcribe(audio_data)
+    
+    async def _process_data(self, data: Dict, session: Dict) -> None:
+        """Process a single item on its executor and gather the result in its session."""
+        loop = asyncio.get_running_loop()
+        data_type = data["type"]
+        content = data["content"]
+        
+        try:
+            match data_type:
+                case "audio":
+                    task = tracer.bind(self._transcribe, content, trace_id=session["trace_id"])
+                    result = await loop.run_in_executor(self.stt_executor, task)
+                
+                case "frontImage" | "backImage":
+                    task = tracer.bind(self.img_describer.describe, "vision", content, trace_id=session["trace_id"])
+                    result = await loop.run_in_executor(self.vision_executor, task)
+                
+                case _:
+                    logger.error(f"Unsupported data type: {data_type}")
+                    return
+                
+        except Exception as e:
+            logger.error(f"Error in processing {data_type} data: {e}", exc_info=True)
+            return
+        
+        finally:
+            self._release(data)
+        
+        session["content"][self.type_mapping[data_type]] = result
+        session["updated"] = time.monotonic()
+        
+    def _describe_latest(self, data: Dict, session: Dict) -> None:
+        """Describe the frame, or keep it as the latest one of its camera while a description is running."""
+        camera = data["type"]
+        describing = session.setdefault("describing", {}) # camera -> running description
+        waiting = session.setdefault("frames", {}) # camera -> latest frame not described yet
+        
+        task = describing.get(camera)
+        if task is None or task.done():
+            describing[camera] = self._spawn(self._describe_frames(data, session), session)
+            return
+        
+        stale = waiting.get(camera)
+        if stale is not None:
+            self._release(stale)
+            self.frames_dropped += 1
+        waiting[camera] = data
+        
+    async def _describe_frames(self, data: Dict, session: Dict) -> None:
+        """Describe the frames of a camera one at a time, skipping to the latest one after each."""
+        while data is not None:
+            await self._process_data(data, session)
+            data = session["frames"].pop(data["type"], None)
+        
+    def _stream_audio(self, data: Dict, session: Dict) -> None:
+        """Append a streamed audio chunk to the session, commit the complete segments in the background."""
+        stream = session.get("stream")
+        if stream is None:
+            stream = session["stream"] = IncrementalTranscriber(self.transcriber)
+            
+        session["stream_bytes"] = session.get("stream_bytes", 0) + self._content_size(data) # held until the stream is over
+        stream.append(convert_pcm_data(data["content"], data.get("sample_rate", 16000)))
+        
+        # one step at a time, the next one picks up everything appended meanwhile
+        stepping = session.get("stepping")
+        if stream.ready and (stepping is None or stepping.done()):
+            session["stepping"] = self._spawn(self._step_stream(stream, session["trace_id"]), session)
+    
+    async def _step_stream(self, stream: IncrementalTranscriber, trace_id: Optional[str]) -> None:
+        """Commit the complete segments of the stream on the stt executor."""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.stt_executor, tracer.bind(stream.step, trace_id=trace_id))
+            
+        except Exception as e:
+            logger.error(f"Error in transcribing the audio stream: {e}", exc_info=True)
+        
+    async def _finish_stream(self, session: Dict) -> None:
+        """Transcribe the tail of the streamed utterance once it is over."""
+        loop = asyncio.get_running_loop()
+        try:
+            task = tracer.bind(session["stream"].finish, trace_id=session["trace_id"])
+            result = await loop.run_in_executor(self.stt_executor, task)
+            
+        except Exception as e:
+            logger.error(f"Error in finishing the audio stream: {e}", exc_info=True)
+            return
+        
+        finally:
+            self.buffered_bytes = max(0, self.buffered_bytes - session.pop("stream_bytes", 0))
+        
+        session["content"]["user_message"] = result
+        
+    async def _finish_session(self, session_id: Optional[str], session: Optional[Dict], previous: Optional[asyncio.Task]) -> None:
+        """Wait for the items of the session, then hand the complete session data over, in the order they were over."""
+        if session and session["pending"]:
+            await asyncio.wait(set(session["pending"]))
+        if previous and not previous.done():
+            await asyncio.wait({previous})
+        
+        first_session_data = {"session_id": session_id, **(session["content"] if session else {})}
+        logger.debug(f"Session data: {first_session_data}")
+        
+        self.turns.put(first_session_data)
+        self.data_ready.set()
+        
     def _generate_session_id(self) -> str:
         """Generate a session id for the client."""
         return secrets.token_urlsafe(16)
     
-    def get_session_data(self) -> str:
-        """Get the session data for the server."""
+    def get_session_data(self, protocol: str = "json") -> str:
+        """Get the session data for the server, binary clients get the negotiated protocol back."""
         data_json = { 
                         "session_id": self._generate_session_id(), 
                         "type": "receive_start", 
                         "content": "success"
         }
+        if protocol == "binary":
+            data_json["protocol"] = "binary"
         
-        return json.dumps(data_json)
-
-    def get_first_data(self) -> Optional[Dict]:
-        """Get the first session data in the list."""
-        
-        if not self.session_data_list:
-            return None
+        return dumps(data_json)
+    
+    def get_turn(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Block until the next complete session data is pushed, None on timeout. Called from the graph thread."""
         
-        # identify the first session
-        # Find first session with type "over" and get its session_id
         try:
-            idx = next(i for i, session in enumerate(self.session_data_list) if session.get("type") == "over")
-            first_session_data = {"session_id": self.session_data_list[idx]["session_id"]}
-        except StopIteration:
+            return self.turns.get(timeout=timeout)
+        except queue.Empty:
             return None
-
-        # mapping the data type to the data name
-        type_mapping = {
-            'frontImage': 'observation',
-            'backImage': 'view',
-            'audio': 'user_message'
-        }
-        
-        # get the data from the first session
-        for i in range(idx):
-            data_type = self.session_data_list[i].get('type')
-            if data_type in type_mapping:
-                first_session_data[type_mapping[data_type]] = self.session_data_list[i].get('content')
-        
-        self.session_data_list = self.session_data_list[idx+1:]  # Remove processed data after processing
+    
+    async def wait_turn(self) -> Dict:
+        """Wait for the next complete session data on the server loop, used by the async mode."""
         
-        return first_session_data
+        while True:
+            try:
+                return self.turns.get_nowait()
+            except queue.Empty:
+                self.data_ready.clear()
+                await self.data_ready.wait()
             
 
                 
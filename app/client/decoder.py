@@ -0,0 +1,117 @@
+from config import logger, eva_configuration
+import io
+import sys
+import time
+import wave
+from typing_extensions import List, Optional
+
+import numpy as np
+
+try:
+    import av # in-process ffmpeg, optional
+except ImportError:
+    av = None
+
+##### In-process audio decoding #####
+# The clips uploaded by the clients (webm/opus, ogg, wav, mp3) are decoded in the calling thread,
+# the stt executor, instead of an ffmpeg subprocess per clip. WAV is parsed directly, the other
+# formats are decoded with PyAV. Without PyAV the decoding falls back to pydub.
+# The output is always mono float32 at 16kHz, the format of the transcribers. The resampling goes
+# through the ffmpeg resampler, low-pass filtered, the browsers record at 44.1k or 48k.
+
+TARGET_RATE = 16000
+
+def _to_float32(samples: np.ndarray) -> np.ndarray:
+    """ Normalize integer samples to float32 in [-1, 1] """
+    if samples.dtype.kind == "f":
+        return samples.astype(np.float32, copy=False)
+    return samples.astype(np.float32) / np.iinfo(samples.dtype).max
+
+def _resample_frames(frames, target: int = TARGET_RATE) -> np.ndarray:
+    """ Mix down and resample PyAV audio frames to mono float32 """
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=target)
+    chunks: List[np.ndarray] = []
+    for frame in frames:
+        chunks.extend(resampled.to_ndarray()[0] for resampled in resampler.resample(frame))
+    chunks.extend(resampled.to_ndarray()[0] for resampled in resampler.resample(None)) # flush the filter
+
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+
+def resample(samples: np.ndarray, rate: int, target: int = TARGET_RATE) -> np.ndarray:
+    """ Resample float32 mono samples with the ffmpeg resampler """
+
+    if rate == target or not len(samples):
+        return samples.astype(np.float32, copy=False)
+    if av is None:
+        raise RuntimeError(f"PyAV is required to resample {rate}Hz audio.")
+
+    frame = av.AudioFrame.from_ndarray(samples.astype(np.float32, copy=False).reshape(1, -1), format="flt", layout="mono")
+    frame.sample_rate = rate
+    return _resample_frames([frame], target)
+
+def _decode_wav(data: bytes) -> np.ndarray:
+    """ The WAV fast path, PCM straight into numpy """
+    with wave.open(io.BytesIO(data)) as wav:
+        width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    dtype = {1: np.uint8, 2: "<i2", 4: "<i4"}.get(width)
+    if dtype is None:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+
+    samples = np.frombuffer(frames, dtype=dtype)
+    samples = (samples.astype(np.float32) - 128) / 128 if width == 1 else _to_float32(samples)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+
+    return resample(samples, rate)
+
+def _decode_av(data: bytes) -> np.ndarray:
+    """ Decode any container with PyAV, the resampler mixes the frames down to mono """
+    with av.open(io.BytesIO(data), mode="r") as container:
+        stream = container.streams.audio[0]
+        stream.codec_context.thread_count = 1 # the stt executor decodes the clips in parallel
+        return _resample_frames(container.decode(stream))
+
+def _decode_pydub(data: bytes) -> np.ndarray:
+    """ The ffmpeg subprocess fallback """
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(io.BytesIO(data)).set_channels(1).set_frame_rate(TARGET_RATE)
+    return _to_float32(np.array(audio.get_array_of_samples()))
+
+def decode_audio(data: bytes | memoryview) -> np.ndarray:
+    """ Decode an uploaded clip to mono float32 at 16kHz, in the calling thread """
+    data = bytes(data) if isinstance(data, memoryview) else data
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return _decode_wav(data)
+    if av is not None:
+        return _decode_av(data)
+    return _decode_pydub(data)
+
+if av is None:
+    logger.warning("Decoder: PyAV is not installed, the audio is decoded with ffmpeg subprocesses.")
+
+
+if __name__ == "__main__":
+    # python -m client.decoder <audio file> [runs]
+    from concurrent.futures import ThreadPoolExecutor
+
+    with open(sys.argv[1], "rb") as file:
+        clip = file.read()
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workers = eva_configuration.get("STT_WORKERS", 2)
+
+    def benchmark(name: str, decode) -> Optional[np.ndarray]:
+        with ThreadPoolExecutor(workers) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(lambda _: decode(clip), range(runs)))
+            elapsed = time.perf_counter() - start
+
+        print(f"{name:<8} {runs} clips in {elapsed:.2f}s, {elapsed / runs * 1000:.1f}ms per clip, {len(results[0]) / TARGET_RATE:.2f}s of audio")
+        return results[0]
+
+    decoded = benchmark("decoder", decode_audio)
+    baseline = benchmark("pydub", _decode_pydub)
+    length = min(len(decoded), len(baseline))
+    print(f"max difference {np.abs(decoded[:length] - baseline[:length]).max():.4f}")
@@ -1,40 +1,44 @@
 from config import logger
 from io import BytesIO
-from typing_extensions import Dict, Optional, List
+from typing_extensions import Dict, Optional
 
 from PIL import Image
 import base64
-from pydub import AudioSegment
 import numpy as np
-import cv2
+
+from client.decoder import decode_audio, resample
 
     
-def convert_audio_data(mp3_data: str) -> Optional[np.ndarray]:
-    """Convert the given MP3 data to an audio numpy array."""
+def convert_audio_data(audio_data: str | bytes | memoryview) -> Optional[np.ndarray]:
+    """Decode the given audio clip (mp3, webm, ogg or wav), base64 or raw bytes, to a 16kHz audio numpy array."""
     
-    if not mp3_data:
-        raise ValueError("No MP3 data provided")
+    if not audio_data:
+        raise ValueError("No audio data provided")
     
     try:
-        mp3_data = base64.b64decode(mp3_data)
-        audio = AudioSegment.from_mp3(BytesIO(mp3_data))
-
-        audio = audio.set_channels(1).set_frame_rate(16000)
-
-        # Convert to numpy array
-        samples = np.array(audio.get_array_of_samples())
-        audio_data = samples.astype(np.float32) / np.iinfo(samples.dtype).max
+        if isinstance(audio_data, str):
+            audio_data = base64.b64decode(audio_data)
+        return decode_audio(audio_data)
     
     except Exception as e:
-        logger.info(f"Error converting mp3 to audio data: {str(e)}")
+        logger.info(f"Error decoding audio data: {str(e)}")
         return None
 
-    return audio_data
+def convert_pcm_data(pcm_data: str | bytes | memoryview, sample_rate: int = 16000) -> np.ndarray:
+    """Convert a chunk of 16-bit mono PCM, base64 or raw bytes, to a 16kHz audio numpy array."""
+    
+    if isinstance(pcm_data, str):
+        pcm_data = base64.b64decode(pcm_data)
+    
+    samples = np.frombuffer(pcm_data, dtype="<i2").astype(np.float32) / 32768.0
+    return resample(samples, sample_rate)
 
-def convert_image_data(image_data: str) -> Optional[np.ndarray]:
+def convert_image_data(image_data: str | bytes | memoryview) -> Optional[np.ndarray]:
+    import cv2
 
     try:
-        image_data = base64.b64decode(image_data)
+        if isinstance(image_data, str):
+            image_data = base64.b64decode(image_data)
         nparr = np.frombuffer(image_data, np.uint8)
         img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
     
@@ -46,6 +50,7 @@ def convert_image_data(image_data: str) -> Optional[np.ndarray]:
 
 def convert_to_mp3(audio_data) -> str:
     """Convert the given audio data to an MP3 format."""
+    from pydub import AudioSegment
     
     samples = (np.array(audio_data) * np.iinfo(np.int16).max).astype(np.int16)
     
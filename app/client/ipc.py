@@ -0,0 +1,264 @@
+from config import logger
+import asyncio
+import threading
+import multiprocessing as mp
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.sharedctypes import Synchronized
+from typing_extensions import Any, Dict, Optional, Set, Tuple
+
+from client.connection import ConnectionManager
+from client.data_manager import DataManager
+from utils.media import media_store
+
+##### Server process mode #####
+# The FastAPI server runs in its own process, so the model inference never stalls the websockets
+# and the downloads. The two processes talk over multiprocessing queues:
+#
+#   inbound  (server -> engine): ("connect", client_id), ("message", client_id, message), ("stop", client_id)
+#   outbound (engine -> server): (client_id, message, coalesce)
+#
+# Media payloads larger than INLINE_LIMIT travel through shared memory, the queue only carries its name.
+# The server process admits the media against a shared counter of the bytes buffered by the engine, so
+# a client gets a single ack per message, the engine side check is only a backstop.
+# The media files are written by the engine and downloaded from the server process, which holds the
+# download references: only the server process evicts them.
+
+INLINE_LIMIT = 64 * 1024
+
+
+def pack_content(content: Any) -> Tuple:
+    """ Move a message content to shared memory if it is large, the engine unpacks and frees it """
+    is_text = isinstance(content, str)
+    data = content.encode("utf-8") if is_text else content
+    if not isinstance(data, (bytes, bytearray, memoryview)) or len(data) < INLINE_LIMIT:
+        return ("inline", bytes(content) if isinstance(content, memoryview) else content)
+
+    shm = SharedMemory(create=True, size=len(data))
+    shm.buf[:len(data)] = data
+    name = shm.name
+    shm.close()
+    resource_tracker.unregister(shm._name, "shared_memory") # the engine unlinks it
+
+    return ("shm", name, len(data), is_text)
+
+
+def unpack_content(packed: Tuple) -> Any:
+    """ Read a content packed by pack_content, and release its shared memory """
+    if packed[0] == "inline":
+        return packed[1]
+
+    _, name, size, is_text = packed
+    shm = SharedMemory(name=name)
+    try:
+        data = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return data.decode("utf-8") if is_text else data
+
+
+class RelayManager(DataManager):
+    """
+    Data manager of the server process, the messages are admitted, acknowledged and relayed to the engine.
+
+    The caps are the ones of the DataManager, checked against the bytes buffered by the engine for
+    all the clients, plus the ones relayed and not picked up yet.
+    """
+
+    def __init__(
+        self,
+        relay: mp.Queue,
+        buffered: Synchronized,
+        max_buffered_bytes: int = 64 * 1024 * 1024,
+        max_message_bytes: int = 16 * 1024 * 1024
+    ) -> None:
+        self.relay: mp.Queue = relay
+        self.buffered: Synchronized = buffered
+        self.max_buffered_bytes: int = max_buffered_bytes
+        self.max_message_bytes: int = max_message_bytes
+        self.client_id: Optional[str] = None
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self.buffered.value
+
+    @buffered_bytes.setter
+    def buffered_bytes(self, value: int) -> None:
+        self.buffered.value = value
+
+    def admit(self, message_json: Dict) -> bool:
+        """Reserve the item in the shared counter, the engine releases it once it is picked up."""
+        with self.buffered.get_lock():
+            return super().admit(message_json)
+
+    async def start_queue(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        self.relay.put(("stop", self.client_id))
+
+    async def process_message(self, message: str | bytes, client_id: Optional[str] = None) -> str:
+        message_json = self.parse_message(message)
+        self.client_id = client_id
+        if not self.admit(message_json):
+            return self.acknowledge(message_json, accepted=False)
+
+        relayed = {key: value for key, value in message_json.items() if key != "content"}
+        relayed["content"] = pack_content(message_json.get("content"))
+        self.relay.put(("message", client_id, relayed))
+
+        return self.acknowledge(message_json)
+
+
+class RelayedDataManager(DataManager):
+    """
+    Data manager of the engine in the server process mode, its buffered bytes are mirrored to the shared counter.
+    """
+
+    def __init__(self, buffered: Synchronized, *args, **kwargs) -> None:
+        self.buffered: Synchronized = buffered
+        self._buffered_bytes: int = 0
+        super().__init__(*args, **kwargs)
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._buffered_bytes
+
+    @buffered_bytes.setter
+    def buffered_bytes(self, value: int) -> None:
+        with self.buffered.get_lock():
+            self.buffered.value += value - self._buffered_bytes
+        self._buffered_bytes = value
+
+
+class RelayConnectionManager(ConnectionManager):
+    """
+    Server process side of the server process mode, the data of the clients is relayed to the engine.
+    """
+
+    def __init__(self, relay: mp.Queue, buffered: Synchronized, multi_session: bool = False):
+        super().__init__(None, None, multi_session, relay=relay)
+        self.buffered: Synchronized = buffered
+
+    def _new_data_manager(self) -> DataManager:
+        return RelayManager(self.relay, self.buffered)
+
+
+def serve_process(inbound: mp.Queue, outbound: mp.Queue, buffered: Synchronized, multi_session: bool) -> None:
+    """ Entry point of the server process """
+
+    server = RelayConnectionManager(inbound, buffered, multi_session)
+    server.on_connect = lambda client_id: inbound.put(("connect", client_id))
+
+    def relay_outbound() -> None:
+        while True:
+            client_id, message, coalesce = outbound.get()
+            if not server.post_message(message, client_id, coalesce):
+                logger.warning("Server process: No client is connected, the message is dropped.")
+
+    threading.Thread(target=relay_outbound, daemon=True, name="relay-outbound").start()
+    media_store.start_janitor(rescan=True) # the files written by the engine are indexed by the janitor
+    server.run_server()
+
+
+class ProcessConnectionManager(ConnectionManager):
+    """
+    Engine side of the server process mode, a drop-in replacement of the ConnectionManager.
+
+    The websockets and downloads are served by a child process. The engine keeps the data
+    managers and the models: the relayed messages are processed here and the turns are read
+    with get_message / wait_message as usual, the outgoing messages are posted to the server.
+
+    Examples:
+        >>> server = ProcessConnectionManager(stt_model, vision_model)
+        >>> threading.Thread(target=server.run_server, daemon=True).start()
+    """
+
+    def __init__(self, stt_model: Any, vision_model: Any, multi_session: bool = False):
+        super().__init__(stt_model, vision_model, multi_session)
+
+        context = mp.get_context("spawn") # the server process must not inherit the models
+        self.connected: Set[str] = set() # the clients connected to the server process
+        self.inbound: mp.Queue = context.Queue()
+        self.outbound: mp.Queue = context.Queue()
+        self.buffered: Synchronized = context.Value("q", 0) # media bytes buffered by the engine or in flight
+        self.process = context.Process(
+            target=serve_process,
+            args=(self.inbound, self.outbound, self.buffered, multi_session),
+            daemon=True,
+            name="eva-server"
+        )
+
+    async def _relay_inbound(self) -> None:
+        """ Process the messages relayed by the server process, on the running loop """
+        self.loop = asyncio.get_running_loop()
+
+        def read_inbound() -> None:
+            while True:
+                event = self.inbound.get()
+                asyncio.run_coroutine_threadsafe(self._handle_event(*event), self.loop)
+
+        threading.Thread(target=read_inbound, daemon=True, name="relay-inbound").start()
+        await asyncio.Event().wait()
+
+    async def _handle_event(self, kind: str, client_id: Optional[str], message_json: Optional[Dict] = None) -> None:
+        """ Handle a connection event or a message of the server process """
+        try:
+            match kind:
+                case "connect":
+                    self.client_id = client_id
+                    self.connected.add(client_id)
+                    await self.get_data_manager(client_id).start_queue()
+                    if self.on_connect:
+                        self.on_connect(client_id)
+
+                case "message":
+                    message_json["content"] = unpack_content(message_json["content"])
+                    with self.buffered.get_lock(): # the reservation of the server process, admit accounts for it again
+                        self.buffered.value -= DataManager._content_size(message_json)
+                    
+                    data_manager = self.get_data_manager(client_id)
+                    await data_manager.start_queue()
+                    if data_manager.admit(message_json):
+                        await data_manager.session_data.put(message_json)
+                    else: # the server process acknowledged it already, the client is told it was dropped
+                        self.post_message(data_manager.acknowledge(message_json, accepted=False), client_id)
+
+                case "stop":
+                    self.connected.discard(client_id)
+                    await self.get_data_manager(client_id).stop()
+
+        except Exception as e:
+            logger.error(f"Server process: Failed to process a relayed {kind}: {str(e)}")
+
+    def _new_data_manager(self) -> DataManager:
+        return RelayedDataManager(self.buffered, self.stt_model, self.vision_model, self.stt_executor, self.vision_executor)
+
+    def is_connected(self, client_id: Optional[str]) -> bool:
+        return (client_id or self.client_id) in self.connected
+
+    def release_client(self, client_id: str) -> None:
+        data_manager = self.data_managers.get(client_id)
+        super().release_client(client_id)
+        if data_manager is not None and client_id not in self.data_managers:
+            data_manager.buffered_bytes = 0 # the media it held is dropped with it
+
+    def post_message(self, message: str, client_id: str = None, coalesce: bool = True) -> bool:
+        """ Post a message to the server process, it resolves the latest client and drops it if none is connected """
+        self.outbound.put((client_id, message, coalesce))
+        return True
+
+    async def send_message(self, message: str, client_id: str = None, coalesce: bool = False):
+        self.post_message(message, client_id, coalesce)
+
+    def run_server(self):
+        """ Start the server process and process its messages, blocks like uvicorn.run """
+        self.process.start()
+        asyncio.run(self._relay_inbound())
+
+    async def serve(self):
+        """ Start the server process and process its messages on the running loop, used by the async mode """
+        self.process.start()
+        await self._relay_inbound()
@@ -0,0 +1,391 @@
+from config import logger
+import io
+import os
+import sys
+import time
+import wave
+import random
+import base64
+import asyncio
+import argparse
+import resource
+import multiprocessing as mp
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing_extensions import Dict, List, Optional
+
+import orjson
+import uvicorn
+import websockets
+
+from client.connection import ConnectionManager
+from client.protocol import dumps, encode_frame
+
+##### Mobile server load test #####
+# Simulates many mobile clients against the ConnectionManager, on localhost only.
+# The STT, vision, LLM and TTS backends are stubs that sleep for a configurable latency,
+# the audio is still decoded by the real decoder pool. Every client replays turns of
+# frontImage / backImage / audio / over messages and waits for the spoken answer.
+#
+#   python -m client.loadtest --clients 50 --turns 10 --llm-latency 1.5
+#   python -m client.loadtest --clients 20 --fixtures data/loadtest --binary
+#
+# The fixture directory holds .wav/.mp3/.webm/.ogg utterances and .jpg/.png frames,
+# synthetic ones are used without it. The server and its stub engine run in their own process,
+# so the latencies are not slowed down by the clients and the reported RSS is the server's only.
+
+AUDIO_SUFFIXES = (".wav", ".mp3", ".webm", ".ogg")
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+class StubTranscriber:
+    """ Stands for the Transcriber, the decoded audio is dropped after the latency """
+
+    def __init__(self, latency: float):
+        self.latency: float = latency
+
+    def transcribe(self, audioclip) -> Optional[tuple[str, str]]:
+        time.sleep(_jitter(self.latency))
+        return f"<load test> {len(audioclip) / 16000:.1f} seconds of speech", "en"
+
+
+class StubDescriber:
+    """ Stands for the Describer """
+
+    def __init__(self, latency: float):
+        self.latency: float = latency
+
+    def describe(self, prompt: str, image_data) -> str:
+        time.sleep(_jitter(self.latency))
+        return f"<load test> an image of {len(image_data)} bytes"
+
+
+def _jitter(latency: float) -> float:
+    """ The latency with 20% of noise """
+    return max(0.0, random.gauss(latency, latency * 0.2))
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+def _rss_mb() -> float:
+    """ The resident memory of the calling process in MB, the peak where /proc is not available """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _synthetic_audio(seconds: float = 3.0) -> bytes:
+    """ A 16kHz wav of a wobbling tone """
+    samples = bytearray()
+    for i in range(int(seconds * 16000)):
+        value = int(8000 * ((i // 40) % 2 * 2 - 1) * (0.5 + 0.5 * ((i // 4000) % 2)))
+        samples += value.to_bytes(2, "little", signed=True)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(bytes(samples))
+    return buffer.getvalue()
+
+
+def load_fixtures(folder: Optional[str]) -> Dict[str, List[bytes]]:
+    """ Load the audio and image fixtures, synthetic ones if the folder is not given """
+    fixtures: Dict[str, List[bytes]] = {"audio": [], "image": []}
+    if folder:
+        for path in sorted(Path(folder).iterdir()):
+            if path.suffix.lower() in AUDIO_SUFFIXES:
+                fixtures["audio"].append(path.read_bytes())
+            elif path.suffix.lower() in IMAGE_SUFFIXES:
+                fixtures["image"].append(path.read_bytes())
+
+    if not fixtures["audio"]:
+        fixtures["audio"].append(_synthetic_audio())
+    if not fixtures["image"]:
+        fixtures["image"].append(os.urandom(200 * 1024)) # the stub describer never decodes it
+    return fixtures
+
+
+@dataclass
+class Stats:
+    turn_latency: List[float] = field(default_factory=list)
+    ack_latency: List[float] = field(default_factory=list)
+    messages: int = 0
+    turns: int = 0
+    rejected: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    rss: List[float] = field(default_factory=list) # of the server process
+
+
+class StubServer:
+    """
+    The server under test, a ConnectionManager with stub backends and a stub engine, run in its own process.
+
+    Examples:
+        >>> process = mp.get_context("spawn").Process(target=StubServer(8765).run, args=(ready, stop, rss))
+    """
+
+    def __init__(
+        self,
+        port: int,
+        stt_latency: float = 0.3,
+        vision_latency: float = 0.8,
+        llm_latency: float = 1.0,
+        tts_latency: float = 0.3
+    ) -> None:
+        self.port: int = port
+        self.stt_latency: float = stt_latency
+        self.vision_latency: float = vision_latency
+        self.llm_latency: float = llm_latency
+        self.tts_latency: float = tts_latency
+
+        self.server: Optional[ConnectionManager] = None
+        self._engines: Dict[str, asyncio.Task] = {}
+
+    def _start_engine(self, client_id: str) -> None:
+        if client_id not in self._engines:
+            self._engines[client_id] = asyncio.create_task(self._engine(client_id))
+
+    async def _engine(self, client_id: str) -> None:
+        """ Answer every turn of the client like the graph would, after the LLM and TTS latencies """
+        while True:
+            turn = await self.server.wait_message(client_id)
+            await asyncio.sleep(_jitter(self.llm_latency))
+            await asyncio.sleep(_jitter(self.tts_latency))
+
+            answer = {
+                "session_id": turn.get("session_id"),
+                "type": "audio",
+                "content": "audio/loadtest.mp3",
+                "text": f"answer to {turn.get('user_message')}"
+            }
+            await self.server.send_message(dumps([answer]), client_id, coalesce=True)
+
+    def run(self, ready: mp.Event, stop: mp.Event, rss: mp.Queue) -> None:
+        """ Entry point of the server process, serves until stop is set and reports its RSS meanwhile """
+        asyncio.run(self._serve(ready, stop, rss))
+
+    async def _serve(self, ready: mp.Event, stop: mp.Event, rss: mp.Queue) -> None:
+        self.server = ConnectionManager(StubTranscriber(self.stt_latency), StubDescriber(self.vision_latency), multi_session=True)
+        self.server.on_connect = self._start_engine
+
+        config = uvicorn.Config(self.server.app, host="127.0.0.1", port=self.port, log_level="warning")
+        server = uvicorn.Server(config)
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        ready.set()
+
+        while not stop.is_set():
+            rss.put(_rss_mb())
+            await asyncio.sleep(0.5)
+        rss.put(_rss_mb())
+
+        for engine in self._engines.values():
+            engine.cancel()
+        server.should_exit = True
+        await serving
+
+
+class LoadTest:
+    """
+    Load generator for the mobile server, with the backends replaced by stubs.
+
+    Attributes:
+        clients (int): The number of concurrent websocket clients.
+        turns (int): The turns each client plays.
+        frames (int): The frames sent per camera in a turn, more than one exercises the coalescing.
+        think (float): Seconds a client waits between turns.
+        binary (bool): Whether the clients send binary frames instead of base64 JSON.
+        server (StubServer): The server under test, run in a separate process with the backend latencies.
+    Examples:
+        >>> report = asyncio.run(LoadTest(clients=20, turns=5).run())
+    """
+
+    def __init__(
+        self,
+        clients: int = 10,
+        turns: int = 5,
+        frames: int = 1,
+        think: float = 1.0,
+        ramp: float = 2.0,
+        binary: bool = False,
+        stt_latency: float = 0.3,
+        vision_latency: float = 0.8,
+        llm_latency: float = 1.0,
+        tts_latency: float = 0.3,
+        turn_timeout: float = 60.0,
+        fixtures: Optional[str] = None,
+        port: int = 8765
+    ) -> None:
+        self.clients: int = clients
+        self.turns: int = turns
+        self.frames: int = frames
+        self.think: float = think
+        self.ramp: float = ramp
+        self.binary: bool = binary
+        self.turn_timeout: float = turn_timeout
+        self.port: int = port
+
+        self.fixtures: Dict[str, List[bytes]] = load_fixtures(fixtures)
+        self.server = StubServer(port, stt_latency, vision_latency, llm_latency, tts_latency)
+        self.stats = Stats()
+        self.elapsed: float = 0.0
+
+    ##### simulated clients, in this process #####
+
+    def _encode(self, message_type: str, session_id: str, sequence: int, content: bytes | str) -> bytes | str:
+        if self.binary:
+            payload = content.encode("utf-8") if isinstance(content, str) else content
+            return encode_frame(message_type, session_id, sequence, payload)
+
+        if isinstance(content, bytes):
+            content = base64.b64encode(content).decode("ascii")
+        return dumps({"session_id": session_id, "type": message_type, "content": content})
+
+    async def _client(self, index: int) -> None:
+        await asyncio.sleep(self.ramp * index / max(self.clients, 1))
+
+        protocol = "binary" if self.binary else "json"
+        url = f"ws://127.0.0.1:{self.port}/ws/load-{index}?protocol={protocol}"
+        sent: Dict[str, List[float]] = {} # message type -> send times waiting for their ack
+        answered = asyncio.Event()
+
+        def handle(message: Dict) -> None:
+            message_type = message.get("type", "")
+            if message_type.startswith("validation-"):
+                waiting = sent.get(message_type.removeprefix("validation-"))
+                if waiting:
+                    self.stats.ack_latency.append(time.perf_counter() - waiting.pop(0))
+                if message.get("content") == "rejected":
+                    self.stats.rejected += 1
+            elif message_type == "audio":
+                answered.set()
+
+        try:
+            async with websockets.connect(url, max_size=None) as websocket:
+                session_id = orjson.loads(await websocket.recv())["session_id"]
+
+                async def receive() -> None:
+                    async for frame in websocket:
+                        message = orjson.loads(frame)
+                        for item in message if isinstance(message, list) else [message]:
+                            handle(item)
+
+                receiver = asyncio.create_task(receive())
+                sequence = 0
+                for turn in range(self.turns):
+                    answered.clear()
+                    items = [(camera, random.choice(self.fixtures["image"]))
+                             for _ in range(self.frames) for camera in ("frontImage", "backImage")]
+                    items += [("audio", random.choice(self.fixtures["audio"])), ("over", "done")]
+
+                    for message_type, content in items:
+                        sequence += 1
+                        sent.setdefault(message_type, []).append(time.perf_counter())
+                        await websocket.send(self._encode(message_type, session_id, sequence, content))
+                        self.stats.messages += 1
+                    over_time = time.perf_counter()
+
+                    try:
+                        await asyncio.wait_for(answered.wait(), self.turn_timeout)
+                        self.stats.turn_latency.append(time.perf_counter() - over_time)
+                        self.stats.turns += 1
+                    except asyncio.TimeoutError:
+                        self.stats.timeouts += 1
+
+                    await asyncio.sleep(_jitter(self.think))
+
+                receiver.cancel()
+
+        except Exception as e:
+            logger.error(f"Load test: client {index} failed: {e}")
+            self.stats.errors += 1
+
+    async def run(self) -> Stats:
+        """ Start the stubbed server in its own process, play the clients and return the statistics """
+        context = mp.get_context("spawn") # a fresh interpreter, nothing of the clients is inherited
+        ready, stop, rss = context.Event(), context.Event(), context.Queue()
+        process = context.Process(target=self.server.run, args=(ready, stop, rss), daemon=True, name="loadtest-server")
+        process.start()
+
+        try:
+            if not await asyncio.to_thread(ready.wait, 60):
+                raise RuntimeError("The load test server did not start.")
+
+            start = time.perf_counter()
+            await asyncio.gather(*(self._client(index) for index in range(self.clients)))
+            self.elapsed = time.perf_counter() - start
+
+        finally:
+            stop.set()
+            await asyncio.to_thread(process.join, 10)
+            while not rss.empty():
+                self.stats.rss.append(rss.get())
+            if process.is_alive():
+                process.terminate()
+
+        return self.stats
+
+    def report(self) -> str:
+        stats = self.stats
+        lines = [
+            f"clients={self.clients} turns={self.turns} frames/camera={self.frames} protocol={'binary' if self.binary else 'json'}",
+            f"completed {stats.turns} turns in {self.elapsed:.1f}s, {stats.turns / self.elapsed:.2f} turns/s, "
+            f"{stats.messages / self.elapsed:.1f} messages/s",
+            f"timeouts={stats.timeouts} rejected={stats.rejected} errors={stats.errors}",
+        ]
+        for name, values in (("turn", stats.turn_latency), ("ack", stats.ack_latency)):
+            lines.append(
+                f"{name:<5} latency n={len(values):<6} p50={_percentile(values, 0.5) * 1000:8.1f}ms  "
+                f"p95={_percentile(values, 0.95) * 1000:8.1f}ms  p99={_percentile(values, 0.99) * 1000:8.1f}ms"
+            )
+        if stats.rss:
+            lines.append(f"server rss  start={stats.rss[0]:.0f}MB  peak={max(stats.rss):.0f}MB  end={stats.rss[-1]:.0f}MB")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the mobile server with stub backends")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=1, help="frames per camera in a turn")
+    parser.add_argument("--think", type=float, default=1.0, help="seconds between the turns of a client")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds to connect all the clients")
+    parser.add_argument("--binary", action="store_true", help="send binary frames instead of base64 JSON")
+    parser.add_argument("--stt-latency", type=float, default=0.3)
+    parser.add_argument("--vision-latency", type=float, default=0.8)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--tts-latency", type=float, default=0.3)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for the answer of a turn")
+    parser.add_argument("--fixtures", help="folder of audio and image fixtures")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    load_test = LoadTest(
+        clients=args.clients,
+        turns=args.turns,
+        frames=args.frames,
+        think=args.think,
+        ramp=args.ramp,
+        binary=args.binary,
+        stt_latency=args.stt_latency,
+        vision_latency=args.vision_latency,
+        llm_latency=args.llm_latency,
+        tts_latency=args.tts_latency,
+        turn_timeout=args.timeout,
+        fixtures=args.fixtures,
+        port=args.port
+    )
+    asyncio.run(load_test.run())
+    print(load_test.report())
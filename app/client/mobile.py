@@ -1,31 +1,72 @@
-import os
+import time
 import threading
 import asyncio
-from config import logger
-import time
+from config import logger, tracer
 import json
 import secrets
+from queue import Queue
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from utils.tts import Speaker
 from utils.stt import Transcriber
 from utils.vision import Describer
+from utils.extension.html import get_template
 from client.connection import ConnectionManager
+from client.protocol import dumps
+
+class SessionClosed(Exception):
+    """Raised when the client of a session stayed disconnected for longer than its idle timeout"""
+
 
 class MobileClient:
-    def __init__(self):   
+    def __init__(
+        self, 
+        async_mode: bool = False, 
+        multi_session: bool = False, 
+        client_id: Optional[str] = None, 
+        server_process: bool = False
+    ):   
         self.session_id = None
         self.server_thread = None
+        self.async_mode: bool = async_mode # serve on the graph event loop instead of a thread
+        self.multi_session: bool = multi_session # one conversation per connected client, served by the SessionManager
+        self.client_id: Optional[str] = client_id # the connection this client talks to, None for the latest one
+        self.server_process: bool = server_process # serve the websockets from a separate process
+        self.idle_timeout: Optional[float] = None # seconds to wait for a disconnected client, None waits forever
         
         self.server: ConnectionManager = None
         self.speaker: Speaker = None
+        self._server_task: Optional[asyncio.Task] = None
+        self.interrupted = threading.Event() # barge-in is not supported, the phone plays the speech
+        
+        # the messages are delivered in order by a worker, the streamed sentences are synthesized on the way
+        self._delivery: Queue = Queue()
+        self._delivery_thread: Optional[threading.Thread] = None
+        self._sentence_index: int = 0
+        self._templates: Dict[str, str] = {} # template id -> hash already pushed to the client
 
     def initialize_modules(self, stt_model: Transcriber, vision_model: Describer, tts_model: Speaker) -> None:
         """Initialize the modules for mobile client"""
-        self.server = ConnectionManager(stt_model, vision_model)
+        if self.server_process:
+            from client.ipc import ProcessConnectionManager
+            self.server = ProcessConnectionManager(stt_model, vision_model, self.multi_session)
+        else:
+            self.server = ConnectionManager(stt_model, vision_model, self.multi_session)
         self.speaker = tts_model
-        self.initialize_client()
+        
+        # in async mode the server is started on the graph event loop by astart,
+        # in multi-session mode it is served by the SessionManager
+        if not (self.async_mode or self.multi_session):
+            self.initialize_client()
+            
+    def bind(self, client_id: str) -> "MobileClient":
+        """Return a client talking to a single connection, sharing the server and the speaker"""
+        client = MobileClient(self.async_mode, self.multi_session, client_id, self.server_process)
+        client.server = self.server
+        client.speaker = self.speaker
+        
+        return client
 
     def initialize_client(self) -> None:
         try:
@@ -35,35 +76,79 @@ class MobileClient:
         except Exception as e:
             raise Exception(f"Error initializing server: {str(e)}")
 
-    def send_data(self, data_str: str) -> None:
-        """Send data to the Mobile client through FastAPI"""
-        async def send_message():
-            await self.server.send_message(data_str)
-
-        try:
-            asyncio.run(send_message())
-        except RuntimeError as e:
-            logger.error(f"Error in sending message: {str(e)}")
+    def _post_data(self, data_str: str) -> None:
+        """Post data to the Mobile client through FastAPI"""
+        
+        # the message is queued to the connection on the server loop, the graph never waits for the client
+        if not self.server.post_message(data_str, self.client_id):
+            logger.warning("No client is connected, the message is dropped.")
             
+    def _deliver(self) -> None:
+        """Deliver the queued messages in order, synthesizing the streamed sentences one by one"""
+        while True:
+            deliver = self._delivery.get()
+            try:
+                deliver()
+                
+            except Exception as e:
+                logger.error(f"Error: Failed to deliver message to client: {str(e)}")
+            finally:
+                self._delivery.task_done()
+    
+    def _deliver_item(self, item) -> None:
+        """Post a message, synthesize a sentence first"""
+        if isinstance(item, tuple):
+            sentence, language, index = item
+            audio_path = self.speaker.get_audio(sentence, language)
+            item = self._speech_message(sentence, audio_path, index)
         
-    def send(self, data: Dict) -> None:
-        """process the data and send to the Mobile client"""
-        if not data:
-            logger.warning("No data is sent to client.")
-            return
-
-        speech_text = data["speech"]
-        audio_path = self.speaker.get_audio(speech_text)
+        self._post_data(item)
+    
+    def _enqueue(self, item) -> None:
+        """Queue a message or a sentence for the delivery worker, in the trace of the turn"""
+        if self._delivery_thread is None:
+            self._delivery_thread = threading.Thread(target=self._deliver, daemon=True)
+            self._delivery_thread.start()
+            
+        self._delivery.put(tracer.bind(self._deliver_item, item))
         
+    def send_data(self, data_str: str) -> None:
+        """Send data to the Mobile client, behind the sentences still being synthesized"""
+        self._enqueue(data_str)
+            
+    def _speech_message(self, speech_text: str, audio_path: Optional[str], index: Optional[int] = None) -> str:
+        """Build the audio message for the speech, streamed sentences carry their index in the response"""
         data_json = { 
                 "session_id": self.session_id, 
                 "type": "audio", 
                 "content": audio_path,
                 "text": speech_text
         }
+        if index is not None:
+            data_json["sentence"] = index
 
         print(f"Sending data to client: {json.dumps(data_json, indent=2)}")
-        self.send_data(json.dumps([data_json]))
+        return dumps([data_json])
+    
+    def send(self, data: Dict) -> None:
+        """process the data and send to the Mobile client"""
+        if not data:
+            logger.warning("No data is sent to client.")
+            return
+
+        # the speech was already delivered sentence by sentence
+        if data.get("streamed"):
+            self._sentence_index = 0
+            return
+
+        speech_text = data["speech"]
+        audio_path = self.speaker.get_audio(speech_text, data.get("language"))
+        self.send_data(self._speech_message(speech_text, audio_path))
+    
+    def send_sentence(self, sentence: str, language: Optional[str]) -> None:
+        """Synthesize a single sentence of a streamed response and push it as soon as it is ready"""
+        self._enqueue((sentence, language, self._sentence_index))
+        self._sentence_index += 1
     
     def send_over(self) -> None:
         """inform the client the current data package is over"""
@@ -72,18 +157,10 @@ class MobileClient:
             "content": self.generate_session_id(),
         }
         
-        self.send_data(json.dumps(data_json))
+        self.send_data(dumps(data_json))
         
-    def receive(self) -> Dict:
-        """Receive data from the Mobile client"""
-        while True:
-            user_input = self.server.get_message()            
-            if user_input:
-                break
-            
-            time.sleep(1)
-            continue
-                
+    def _parse_input(self, user_input: Dict) -> Dict:
+        """Unpack the session data from the Mobile client"""
         self.session_id = user_input.get("session_id")
         
         observation = user_input.get("observation", "<|same|>")
@@ -95,15 +172,90 @@ class MobileClient:
             "language": language
         }
         
+    def receive(self, save_file: str = None) -> Dict:
+        """Receive data from the Mobile client, voice samples are not saved on mobile"""
+        user_input = self._wait_input()
+        return self._parse_input(user_input)
+        
     def start(self) -> Dict:
         """Start the client and wait for the client to initialize"""
         while True:
-            user_input = self.server.get_message()
+            user_input = self._wait_input()
+            observation = user_input.get("observation")
+            if observation:
+                break
             
-            if not user_input:
-                time.sleep(1)
-                continue
+        self.session_id = user_input.get("session_id")
+        
+        return {"observation": observation}
+    
+    def _wait_input(self, poll: float = 5.0) -> Dict:
+        """Wait for the next session data, raise SessionClosed once the client is gone for idle_timeout seconds"""
+        if self.idle_timeout is None:
+            return self.server.get_message(self.client_id)
+        
+        gone_since = None
+        while True:
+            user_input = self.server.get_message(self.client_id, timeout=poll)
+            if user_input is not None:
+                return user_input
             
+            if self.server.is_connected(self.client_id):
+                gone_since = None
+            elif gone_since is None:
+                gone_since = time.monotonic()
+            elif time.monotonic() - gone_since > self.idle_timeout:
+                raise SessionClosed(f"Client {self.client_id} did not come back in {self.idle_timeout}s.")
+
+    def speak(self, response: str, wait: bool = True) -> None:
+        """Send a single response to the Mobile client"""
+        self.send({"speech": response})
+        
+    def deactivate(self) -> None:
+        pass
+    
+    ##### Async mode, the graph and the server share one event loop #####
+    
+    async def asend_data(self, data_str: str) -> None:
+        """Send data to the Mobile client on the running loop"""
+        await self.server.send_message(data_str, self.client_id, coalesce=True)
+    
+    async def asend(self, data: Dict) -> None:
+        """Async version of send, the speech is generated in a worker thread"""
+        if not data:
+            logger.warning("No data is sent to client.")
+            return
+
+        # the sentences are delivered by the worker, the next messages wait for them to keep the order
+        if data.get("streamed"):
+            self._sentence_index = 0
+            await asyncio.to_thread(self._delivery.join)
+            return
+
+        speech_text = data["speech"]
+        audio_path = await asyncio.to_thread(self.speaker.get_audio, speech_text, data.get("language"))
+        await self.asend_data(self._speech_message(speech_text, audio_path))
+    
+    async def asend_over(self) -> None:
+        """Async version of send_over"""
+        data_json = {
+            "type": "over",
+            "content": self.generate_session_id(),
+        }
+        
+        await self.asend_data(dumps(data_json))
+        
+    async def areceive(self, save_file: str = None) -> Dict:
+        """Await the next complete session data from the Mobile client"""
+        user_input = await self.server.wait_message(self.client_id)
+        return self._parse_input(user_input)
+    
+    async def astart(self) -> Dict:
+        """Serve the FastAPI app on the running loop and wait for the client to initialize"""
+        self._server_task = asyncio.create_task(self.server.serve())
+        
+        while True:
+            user_input = await self.server.wait_message(self.client_id)
             observation = user_input.get("observation")
             if observation:
                 break
@@ -111,7 +263,16 @@ class MobileClient:
         self.session_id = user_input.get("session_id")
         
         return {"observation": observation}
-
+    
+    async def aspeak(self, response: str, wait: bool = True) -> None:
+        """Async version of speak"""
+        await self.asend({"speech": response})
+    
+    async def adeactivate(self) -> None:
+        """Stop serving the FastAPI app"""
+        if self._server_task:
+            self._server_task.cancel()
+            
     def generate_session_id(self) -> str:
         """Generate a session id for the client"""
         return secrets.token_urlsafe(16)
@@ -123,39 +284,40 @@ class MobileClient:
     def __repr__(self) -> str:
         return "MobileClient"
     
-    def load_html(self, template: str, **kwargs) -> str:
-        """Load the html from the html directory"""
+    def _html_messages(self, template: str, **params) -> List[Dict]:
+        """Reference an html template with its parameters, the template itself is pushed once per version"""
+        html, content_hash = get_template(f"{template}.html")
         
-        dir = os.path.dirname(__file__)
-        html_path = os.path.join(dir, "html", f"{template}.html")
-        
-        try:
-            with open(html_path, 'r') as f:
-                html = f.read().strip()
-
-        except FileNotFoundError:
-            raise FileNotFoundError(f"template file {html_path} not found.")
-
-        for key, value in kwargs.items():
-            html = html.replace(f"<{key}>", value)
-
-        return html
+        messages = []
+        if self._templates.get(template) != content_hash:
+            messages.append({
+                "type": "template",
+                "id": template,
+                "hash": content_hash,
+                "content": html
+            })
+            self._templates[template] = content_hash
+            
+        messages.append({
+            "session_id": self.session_id, 
+            "type": "html",
+            "template": template,
+            "hash": content_hash,
+            "params": params
+        })
+        return messages
     
-    def stream_music(self, mp3_url: str, cover_url: str, title: str) -> None:
+    def stream_music(self, url: str, cover_url: str, title: str) -> Dict:
         """Stream a music and cover image to mobile client"""
         try: 
-            page = self.load_html(template="music", image_url=cover_url, music_title=title)
             data_json = [{
                 "session_id": self.session_id, 
                 "type": "mp3",
-                "content": mp3_url,
+                "content": url,
             },
-            {
-                "type": "html",
-                "content": page
-            }]
+            *self._html_messages("music", image_url=cover_url, music_title=title)]
         
-            self.send_data(json.dumps(data_json))
+            self.send_data(dumps(data_json))
             return {"user_message": f"Media Player:: The song '{title}' is playing."}
         
         except Exception as e:
@@ -165,14 +327,8 @@ class MobileClient:
     def launch_youtube(self, id: str, title: str) -> bool:
         """Stream the youtube video to the client"""
         try:
-            page = self.load_html("youtube", video_id=id, video_title=title)
-            data_json = {
-                "session_id": self.session_id, 
-                "type": "html",
-                "content": page
-            }
-            
-            self.send_data(json.dumps(data_json))
+            data_json = self._html_messages("youtube", video_id=id, video_title=title)
+            self.send_data(dumps(data_json))
             return {"observation": "The video player is launched."}
         
         except Exception as e:
@@ -181,14 +337,8 @@ class MobileClient:
           
     def launch_epad(self, html: str) -> Dict:
         try:
-            page = self.load_html("blank", full_html=html)
-            data_json = {
-                "session_id": self.session_id, 
-                "type": "html",
-                "content": page
-            }
-            
-            self.send_data(json.dumps(data_json))
+            data_json = self._html_messages("blank", full_html=html)
+            self.send_data(dumps(data_json))
             return {"observation": "The epad is launched."}
         except Exception as e:
             logger.error(f"Error: Failed to launch epad to client: {str(e)}")
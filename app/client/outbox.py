@@ -0,0 +1,145 @@
+import asyncio
+from collections import deque
+from config import logger
+from typing_extensions import Deque, Optional, Tuple
+
+from fastapi import WebSocket
+
+
+class Outbox:
+    """
+    Outbound message queue of one websocket connection, owned by the server event loop.
+
+    Messages are queued without waiting for the client and a single writer task sends them in order.
+    Coalescable messages waiting together (speech, html, over...) are sent as one JSON array frame,
+    which the mobile client handles item by item. The queue is bounded: when a slow client lets it
+    fill up, the oldest droppable message (acknowledgements) is dropped. The conversation messages
+    (speech, html, over...) are never dropped: if the queue is full of them, or a send exceeds
+    send_timeout, the connection is closed so the client reconnects instead of missing a turn end.
+    Closing the outbox drains it: the queued messages are still sent, the new ones are ignored.
+
+    Attributes:
+        websocket: The connection the messages are written to.
+        max_messages (int): The maximum number of queued messages.
+        max_batch_bytes (int): The maximum size of a coalesced frame.
+        send_timeout (float): Seconds a single frame may take to be sent.
+        dropped (int): The number of droppable messages dropped so far.
+    Examples:
+        >>> outbox = Outbox(websocket)
+        >>> outbox.start()
+        >>> outbox.put(message, coalesce=True)
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_messages: int = 64,
+        max_batch_bytes: int = 256 * 1024,
+        send_timeout: float = 10.0
+    ) -> None:
+        self.websocket: WebSocket = websocket
+        self.max_messages: int = max_messages
+        self.max_batch_bytes: int = max_batch_bytes
+        self.send_timeout: float = send_timeout
+        self.dropped: int = 0
+
+        self._queue: Deque[Tuple[str, bool, bool]] = deque() # (message, coalesce, droppable)
+        self._overflow: bool = False
+        self._closing: bool = False
+        self._ready: asyncio.Event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """ Start the writer task on the running loop """
+        self._task = asyncio.create_task(self._write())
+
+    def close(self) -> None:
+        """ Stop accepting messages, the writer task sends the queued ones and exits """
+        self._closing = True
+        self._ready.set()
+
+    def put(self, message: str, coalesce: bool = False, droppable: bool = False) -> None:
+        """ Queue a message, must be called on the server loop """
+        if self._overflow or self._closing:
+            return
+        
+        if len(self._queue) >= self.max_messages and not self._drop_one():
+            if droppable:
+                self.dropped += 1
+                return
+            
+            # only conversation messages are waiting, losing one would stall the client
+            logger.warning("Outbox: Client is too slow, closing the connection.")
+            self._overflow = True
+            self._ready.set()
+            return
+
+        self._queue.append((message, coalesce, droppable))
+        self._ready.set()
+        
+    def _drop_one(self) -> bool:
+        """ Drop the oldest droppable message, False if there is none """
+        for index, (_, _, droppable) in enumerate(self._queue):
+            if droppable:
+                del self._queue[index]
+                self.dropped += 1
+                logger.warning(f"Outbox: Client is too slow, dropped an acknowledgement ({self.dropped} so far).")
+                return True
+            
+        return False
+
+    @staticmethod
+    def _unwrap(message: str) -> str:
+        """ Return the items of a JSON array message, or the message itself """
+        message = message.strip()
+        return message[1:-1].strip() if message.startswith("[") else message
+
+    def _next_frame(self) -> str:
+        """ Pop the next frame, coalescing the following coalescable messages """
+        message, coalesce, _ = self._queue.popleft()
+        if not coalesce or not self._queue or not self._queue[0][1]:
+            return message
+
+        items = [self._unwrap(message)]
+        size = len(message)
+        while self._queue and self._queue[0][1] and size + len(self._queue[0][0]) <= self.max_batch_bytes:
+            message, _, _ = self._queue.popleft()
+            items.append(self._unwrap(message))
+            size += len(message)
+
+        return "[" + ",".join(item for item in items if item) + "]"
+
+    async def _write(self) -> None:
+        """ Send the queued messages in order """
+        while True:
+            if self._overflow:
+                await self._close()
+                break
+            
+            if not self._queue:
+                if self._closing:
+                    break
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            frame = self._next_frame()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+
+            except asyncio.TimeoutError:
+                logger.warning(f"Outbox: Client did not receive within {self.send_timeout}s, closing the connection.")
+                await self._close()
+                break
+
+            except Exception as e:
+                if not self._closing: # a client that disconnected cannot be drained
+                    logger.error(f"Outbox: Failed to send message: {str(e)}")
+                break
+
+    async def _close(self) -> None:
+        """ Close the connection, the client reconnects and the conversation goes on """
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1011), 1.0)
+        except Exception:
+            pass
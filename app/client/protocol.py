@@ -0,0 +1,74 @@
+import struct
+from typing_extensions import Any, NamedTuple
+
+import orjson
+
+##### Mobile websocket protocol #####
+# Control messages are JSON text frames, serialized with orjson.
+# Clients connecting with ?protocol=binary may send their media as binary frames:
+#
+#   | version (1) | type (1) | session id length (1) | reserved (1) | sequence (4) | session id | payload |
+#
+# The header is big endian, the payload is the raw mp3 / jpeg bytes without base64.
+# audioChunk frames stream the utterance while recording, 16-bit little endian mono PCM at 16kHz,
+# their JSON counterpart may set "sample_rate" when the recorder runs at another rate.
+# Clients that do not ask for it keep using the JSON format with base64 content.
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("!BBBxI")
+
+FRAME_TYPES = {
+    1: "audio",
+    2: "frontImage",
+    3: "backImage",
+    4: "over",
+    5: "audioChunk",
+}
+FRAME_CODES = {name: code for code, name in FRAME_TYPES.items()}
+
+
+class Frame(NamedTuple):
+    """ A decoded binary frame, the payload is a view on the received bytes """
+    type: str
+    session_id: str
+    sequence: int
+    payload: memoryview
+
+
+def decode_frame(data: bytes) -> Frame:
+    """ Decode a binary frame without copying the payload """
+
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ValueError(f"Binary frame too short: {len(view)} bytes")
+
+    version, code, id_length, sequence = HEADER.unpack_from(view)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version: {version}")
+    if code not in FRAME_TYPES:
+        raise ValueError(f"Unsupported frame type: {code}")
+
+    start = HEADER.size + id_length
+    if len(view) < start:
+        raise ValueError(f"Binary frame truncated: {len(view)} bytes for a {id_length} bytes session id")
+    session_id = bytes(view[HEADER.size:start]).decode("utf-8")
+
+    return Frame(FRAME_TYPES[code], session_id, sequence, view[start:])
+
+
+def encode_frame(frame_type: str, session_id: str, sequence: int, payload: bytes) -> bytes:
+    """ Encode a binary frame, the counterpart of decode_frame """
+
+    session = session_id.encode("utf-8")
+    header = HEADER.pack(PROTOCOL_VERSION, FRAME_CODES[frame_type], len(session), sequence)
+    return b"".join((header, session, payload))
+
+
+def dumps(message: Any) -> str:
+    """ Serialize a control message to a JSON text frame """
+    return orjson.dumps(message).decode("utf-8")
+
+
+def loads(message: str | bytes) -> Any:
+    """ Parse a JSON control message """
+    return orjson.loads(message)
@@ -1,13 +1,18 @@
 import os
-from config import logger
-from typing_extensions import Dict, List, Optional
+import asyncio
+from threading import Event
+from config import logger, tracer
+from typing_extensions import Dict, List, Optional, TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 
-from utils.tts import Speaker, AudioPlayer
-from utils.vision import Watcher
-from utils.stt import PCListener
-from utils.extension import Window
 from utils.extension.html import load_html
 
+# the desktop devices load mpv, sounddevice, cv2 and the speech libraries, import them only when used
+if TYPE_CHECKING:
+    from utils.tts import Speaker
+    from utils.vision import Watcher
+    from utils.stt import PCListener, VoiceMonitor
+
 class WSLClient:
     """
     Class for eva to interact with the desktop client.
@@ -17,36 +22,86 @@ class WSLClient:
         listener: The listener object to listen to the client.
         player: The audio player object to stream the music to the client.
         window: The window object to launch the html to the client.
+        glance_timeout: Seconds to wait for the observation after the user finished speaking.
+        monitor: The voice monitor listening while EVA speaks, only with barge-in.
+        interrupted: Set when the user interrupted EVA, until the next input is received.
 
     """
-    def __init__(self):
+    def __init__(self, barge_in: bool = False):
+        from utils.tts import AudioPlayer
+        from utils.extension import Window
+        
         self.player = AudioPlayer()
         self.window = Window()
+        self.glance_timeout: float = 3.0
+        self.barge_in: bool = barge_in
+        self._executor = ThreadPoolExecutor(max_workers=1) # vision runs beside the listener
         
-        self.speaker: Optional[Speaker] = None
-        self.watcher: Optional[Watcher] = None
-        self.listener: Optional[PCListener] = None
+        self.speaker: Optional["Speaker"] = None
+        self.watcher: Optional["Watcher"] = None
+        self.listener: Optional["PCListener"] = None
+        self.monitor: Optional["VoiceMonitor"] = None
+        self.interrupted: Event = Event()
                 
-    def initialize_modules(self, stt_model: PCListener, vision_model: Watcher, tts_model: Speaker) -> None:
+    def initialize_modules(self, stt_model: "PCListener", vision_model: "Watcher", tts_model: "Speaker") -> None:
         """ Initialize the modules for the client """
         self.speaker = tts_model
         self.watcher = vision_model
         self.listener = stt_model
+        
+        if self.barge_in:
+            from utils.stt import VoiceMonitor
+            
+            self.monitor = VoiceMonitor(stt_model.microphone)
+            self.interrupted = self.monitor.interrupted
+            
+    def _monitor_voice(self) -> None:
+        """ Listen for the user while EVA speaks, the speech stops as soon as the user talks """
+        if self.monitor:
+            self.monitor.start(on_speech=self.speaker.interrupt)
     
     def send(self, data: Dict[str, str]) -> None:
         """ Send the data to the client """
+        
+        # the speech was already spoken sentence by sentence, wait for it if needed
+        if data.get("streamed"):
+            if data.get("wait"):
+                self.speaker.wait_stream()
+            return
 
+        self._monitor_voice()
         self.speaker.speak(
             data.get("speech"), 
             data.get("language"), 
             data.get("wait")
         )
         
+    def send_sentence(self, sentence: str, language: Optional[str]) -> None:
+        """ Speak a single sentence of a streamed response as soon as it is generated """
+        
+        if self.interrupted.is_set(): # the user is talking, the rest of the response is dropped
+            return
+        
+        self._monitor_voice()
+        self.speaker.speak_stream(sentence, language)
+        
     def receive(self, save_file: str=None) -> Dict:
-        """ Receive the data from the client """
+        """ Receive the data from the client, glance at the scene while listening """
         
-        observation = self.watcher.glance()
-        message, language = self.listener.listen(save_file)
+        # the user may have started talking while EVA was speaking
+        interruption = self.monitor.stop() if self.monitor else None
+        self.interrupted.clear()
+        self.speaker.resume() # the interruption lasts until the next response, not the next sentence
+        
+        glance = self._executor.submit(tracer.bind(self.watcher.glance))
+        message, language = self.listener.listen(save_file, interruption)
+        
+        # drop the observation if the vision model misses the deadline
+        try:
+            observation = glance.result(timeout=self.glance_timeout)
+        except TimeoutError:
+            logger.warning(f"Observation was not ready within {self.glance_timeout}s, dropped.")
+            observation = None
         
         return {
             "user_message": message,
@@ -118,8 +173,31 @@ class WSLClient:
             return "Client Error: The images could not be displayed."
         
     def deactivate(self) -> None:
+        if self.monitor:
+            self.monitor.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
         self.watcher.deactivate()
             
     def send_over(self) -> None:
         pass
     
+    ##### Async mode, the blocking devices are used from worker threads #####
+    
+    async def asend(self, data: Dict[str, str]) -> None:
+        await asyncio.to_thread(self.send, data)
+    
+    async def asend_over(self) -> None:
+        pass
+    
+    async def areceive(self, save_file: str=None) -> Dict:
+        return await asyncio.to_thread(self.receive, save_file)
+    
+    async def astart(self) -> Dict:
+        return await asyncio.to_thread(self.start)
+    
+    async def aspeak(self, response: str, wait: bool= True) -> None:
+        await asyncio.to_thread(self.speak, response, wait)
+    
+    async def adeactivate(self) -> None:
+        await asyncio.to_thread(self.deactivate)
+    
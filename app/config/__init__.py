@@ -1,3 +1,4 @@
 from .log import logger
 from .config import eva_configuration
-from .language import validate_language
\ No newline at end of file
+from .language import validate_language
+from .tracer import tracer
\ No newline at end of file
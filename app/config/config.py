@@ -42,6 +42,58 @@
 #   Options: "Groq", "llama", "Chatgpt", "Claude"
 #   Factory: Groq-llama3.1-8b, OpenAI-ChatGPT-4o-mini, Anthropic-claude-3-haiku, ollama-llama3.1-8b
 #
+# STREAM_RESPONSE:
+#   Stream the reply from the chat model and speak each sentence as soon as it is generated.
+#   Options: True, False
+#   Mobile clients receive the audio of each sentence as soon as it is synthesized.
+#
+# BARGE_IN:
+#   Listen while EVA is speaking, she stops talking and generating as soon as the user talks.
+#   Options: True, False
+#   Desktop only, use headphones or a microphone with echo cancellation.
+#
+# ASYNC_MODE:
+#   Run the graph nodes as coroutines on one asyncio event loop.
+#   Options: True, False
+#   The mobile server is served on the same loop and client data is awaited instead of polled.
+#
+# MULTI_SESSION:
+#   Serve one independent conversation per connected mobile client, the models are shared.
+#   Options: True, False
+#   Only for the mobile device, the sessions always run the threaded graph.
+#
+# MODEL_CONCURRENCY:
+#   The maximum number of sessions calling the same model at once in multi-session mode.
+#   Options: 1 or more, keep it low for local models.
+#
+# SESSION_TIMEOUT:
+#   Seconds a session waits for its disconnected client to come back, in multi-session mode.
+#   The session, its memory and its data manager are released afterwards.
+#
+# SERVER_PROCESS:
+#   Serve the mobile websockets and downloads from a separate process, the models never stall them.
+#   Options: True, False
+#   The processes exchange the messages through queues and the media payloads through shared memory.
+#   The media files are evicted by the server process, which serves them.
+#
+# STT_WORKERS / VISION_WORKERS:
+#   Number of worker threads transcribing the audio and describing the images of the mobile clients.
+#   The server keeps answering while the models run, raise them for more concurrent clients.
+#
+# CHECKPOINT:
+#   Save the conversation state and session memory to the database every turn.
+#   Options: True, False
+#   A restarted EVA resumes the last conversation without summarizing it again.
+#
+# MEDIA_MAX_SIZE / MEDIA_MAX_AGE:
+#   Budgets of data/media, where the speech, images and html pages are kept, in MB and in hours.
+#   A janitor deletes the expired files, then the least recently used ones over the size.
+#
+# TRACE:
+#   Record latency spans of every turn (graph nodes, model calls, tools, memory) to data/traces.
+#   Options: None, "jsonl", "chrome"
+#   Summarize a trace with: python -m config.tracer data/traces/<file>
+#
 #
 ################################################################################################
 
@@ -53,5 +105,18 @@ eva_configuration = {
     "VISION_MODEL": "groq",
     "STT_MODEL": "whisper",
     "TTS_MODEL": "elevenlabs",
-    "SUMMARIZE_MODEL": "chatgpt"
+    "SUMMARIZE_MODEL": "chatgpt",
+    "STREAM_RESPONSE": False,
+    "BARGE_IN": False,
+    "ASYNC_MODE": False,
+    "MULTI_SESSION": False,
+    "MODEL_CONCURRENCY": 2,
+    "SESSION_TIMEOUT": 600,
+    "SERVER_PROCESS": False,
+    "STT_WORKERS": 2,
+    "VISION_WORKERS": 2,
+    "CHECKPOINT": False,
+    "MEDIA_MAX_SIZE": 512,
+    "MEDIA_MAX_AGE": 24,
+    "TRACE": None
 }
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import secrets
+import inspect
+import threading
+import functools
+import contextvars
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .config import eva_configuration
+from .log import logger
+
+class Tracer:
+    """
+    Span based latency tracer, one trace per conversation turn.
+    
+    Every span records its name, start time, duration, thread and the trace id of the current turn.
+    Spans are exported to a local JSONL file, or to a Chrome trace file that can be opened
+    in chrome://tracing or Perfetto. When tracing is disabled every method is a no-op.
+    
+    Attributes:
+        format (str | None): Export format, "jsonl" or "chrome". None disables tracing.
+        path (Path | None): The trace file, created under data/traces.
+        
+    Examples:
+        >>> tracer.new_trace()
+        >>> with tracer.span("stt", model="whisper"):
+        ...     transcriber.transcribe(audio)
+        >>> Thread(target=tracer.bind(memory.save, entry)).start()
+        >>> @tracer.node("eva_converse")   # runs in the trace kept in state["trace_id"]
+        ... def eva_converse(state): ...
+    """
+    
+    def __init__(self, format: Optional[str] = None):
+        self.format: Optional[str] = format.lower() if format else None
+        self.path: Optional[Path] = self._get_trace_path() if self.enabled else None
+        
+        self._file = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._trace_id = contextvars.ContextVar("trace_id", default=None) # per session thread or task
+    
+    @property
+    def enabled(self) -> bool:
+        return self.format in ("jsonl", "chrome")
+    
+    def _get_trace_path(self) -> Path:
+        """ Return the trace file path for this run """
+        trace_dir = Path(__file__).resolve().parents[1] / 'data' / 'traces'
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        
+        suffix = "json" if self.format == "chrome" else "jsonl"
+        return trace_dir / f"trace_{datetime.now().strftime('%Y%m%d-%H%M%S')}.{suffix}"
+    
+    def new_trace(self) -> Optional[str]:
+        """ Start a new trace for a conversation turn """
+        if not self.enabled:
+            return None
+        
+        trace_id = secrets.token_hex(8)
+        self._trace_id.set(trace_id)
+        return trace_id
+    
+    @property
+    def trace_id(self) -> Optional[str]:
+        return self._trace_id.get()
+    
+    @contextmanager
+    def use(self, trace_id: Optional[str]) -> Iterator[None]:
+        """ Run the enclosed block in the given trace, the previous one is restored afterwards """
+        token = self._trace_id.set(trace_id)
+        try:
+            yield
+        finally:
+            self._trace_id.reset(token)
+    
+    def bind(self, func: Callable, *args: Any, trace_id: Optional[str] = None) -> Callable:
+        """ Bind a function to a copy of the current context, for threads and executors that do not inherit it """
+        context = contextvars.copy_context()
+        if trace_id is not None:
+            context.run(self._trace_id.set, trace_id)
+            
+        return functools.partial(context.run, func, *args)
+    
+    def _write(self, event: Dict) -> None:
+        """ Append a single event to the trace file """
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                if self.format == "chrome":
+                    self._file.write("[\n") # the trace viewer accepts an unterminated array
+                    
+            self._file.write(json.dumps(event, default=str) + (",\n" if self.format == "chrome" else "\n"))
+            self._file.flush()
+    
+    def record(self, name: str, start: float, end: float, **attributes: Any) -> None:
+        """ Record a finished span, start and end are time.time() seconds """
+        if not self.enabled:
+            return
+        
+        trace_id = self.trace_id
+        thread = threading.current_thread()
+        
+        if self.format == "chrome":
+            event = {
+                "name": name,
+                "cat": "eva",
+                "ph": "X",
+                "ts": int(start * 1e6),
+                "dur": int((end - start) * 1e6),
+                "pid": self._pid,
+                "tid": thread.ident,
+                "args": {"trace_id": trace_id, **attributes}
+            }
+        else:
+            event = {
+                "trace_id": trace_id,
+                "name": name,
+                "start": start,
+                "duration_ms": round((end - start) * 1000, 3),
+                "thread": thread.name,
+                **attributes
+            }
+            
+        try:
+            self._write(event)
+        except Exception as e:
+            self.format = None # never let tracing break the conversation
+            logger.warning(f"Tracer: Failed to write trace, tracing disabled: {str(e)}")
+    
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[None]:
+        """ Measure the enclosed block as a span """
+        if not self.enabled:
+            yield
+            return
+        
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.time(), **attributes)
+    
+    def trace(self, name: str) -> Callable:
+        """ Decorator measuring every call of a function or coroutine as a span """
+        
+        def decorator(func: Callable) -> Callable:
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+            
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        
+        return decorator
+    
+    def node(self, name: str) -> Callable:
+        """ Decorator for the graph nodes, the span runs in the trace of the turn kept in the state """
+        
+        # the graph runs every node in a copied context, the trace id travels in the state instead
+        def decorator(func: Callable) -> Callable:
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(state: Dict[str, Any], *args, **kwargs):
+                    with self.use(state.get("trace_id")), self.span(name):
+                        return await func(state, *args, **kwargs)
+                return async_wrapper
+            
+            @functools.wraps(func)
+            def wrapper(state: Dict[str, Any], *args, **kwargs):
+                with self.use(state.get("trace_id")), self.span(name):
+                    return func(state, *args, **kwargs)
+            return wrapper
+        
+        return decorator
+    
+    def first_item(self, name: str, iterable: Iterable, **attributes: Any) -> Iterator:
+        """ Pass through an iterable, recording the time until its first item as a span """
+        start = time.time()
+        first = True
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if first:
+                    self.record(name, start, time.time(), **attributes)
+                    first = False
+                yield item
+        finally:
+            # closing the wrapper closes the wrapped stream as well
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+def load_spans(path: str) -> List[Dict]:
+    """ Load the spans of a JSONL or Chrome trace file, durations in milliseconds """
+    
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    
+    if content.startswith("["):
+        events = json.loads(content.rstrip(",") + ("]" if not content.endswith("]") else ""))
+        return [{"name": e["name"], "duration_ms": e["dur"] / 1000, **e.get("args", {})} for e in events]
+    
+    return [json.loads(line) for line in content.splitlines() if line]
+
+def summarize(path: str) -> Dict[str, Dict[str, float]]:
+    """ Return the count, p50 and p95 duration of every span name in a trace file """
+    
+    durations: Dict[str, List[float]] = {}
+    for span in load_spans(path):
+        durations.setdefault(span["name"], []).append(span["duration_ms"])
+    
+    def percentile(values: List[float], p: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+    
+    return {
+        name: {"count": len(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+        for name, values in durations.items()
+    }
+
+tracer = Tracer(eva_configuration.get("TRACE"))
+
+if __name__ == "__main__":
+    # python -m config.tracer data/traces/<trace file>
+    for name, stats in sorted(summarize(sys.argv[1]).items()):
+        print(f"{name:<20} n={stats['count']:<6} p50={stats['p50']:10.1f}ms  p95={stats['p95']:10.1f}ms")
@@ -1,11 +1,13 @@
-from typing import TypedDict, Dict, List, Any
+from typing import TypedDict, Dict, List, Any, Optional, TYPE_CHECKING
 from enum import Enum
 
-from client import WSLClient, MobileClient
 from utils.agent import ChatAgent 
 from utils.memory import Memory
 from tools import ToolManager
 
+if TYPE_CHECKING:
+    from client import WSLClient, MobileClient
+
 class EvaStatus(Enum):
     """EVA operational status."""
     THINKING = "thinking" # EVA is thinking
@@ -20,10 +22,11 @@ class EvaState(TypedDict):
     status: EvaStatus
     agent: ChatAgent 
     toolbox: ToolManager 
-    client: WSLClient | MobileClient
+    client: "WSLClient | MobileClient"
     memory : Memory
     sense : Dict | None
     action : List[Dict[str, Any]]
     action_results: List[Dict[str, Any]]
     num_conv: int
+    trace_id: Optional[str] # the trace of the current turn, set by eva_sense
 
@@ -1,7 +1,10 @@
+import asyncio
 from langgraph.graph import StateGraph, END, START
 from dotenv import load_dotenv
 
+from config import eva_configuration
 from core.classes import EvaState
+from core.session import SessionManager
 from core.nodes import (
     eva_initialize, 
     eva_end, 
@@ -13,9 +16,17 @@ from core.nodes import (
     router_action_results,
     router_initialize,
 )
+from core.nodes_async import (
+    aeva_initialize,
+    aeva_end,
+    aeva_converse,
+    aeva_sense,
+    aeva_action,
+)
 
 from core.nodes_setup import (
     eva_setup,
+    aeva_setup,
     router_setup
 )
 
@@ -30,22 +41,43 @@ class EVA:
         - converse: Main execution node.
         - action: Use tools to perform actions.
         - end: End the session.
+    In async mode the nodes are coroutines and the graph runs with ainvoke on one event loop.
+    In multi-session mode the mobile server runs one graph per connected client.
     """
     
     def __init__(self) -> None:
+        self.multi_session: bool = (
+            eva_configuration.get("MULTI_SESSION", False) and eva_configuration.get("DEVICE").upper() == "MOBILE"
+        )
+        self.async_mode: bool = eva_configuration.get("ASYNC_MODE", False) and not self.multi_session
         self.workflow = self._initialize_graph()
         self.app = self.workflow.compile()
-        self.app.invoke({"status": "initialize"}, {"recursion_limit": 100000})
+        
+        if self.multi_session:
+            SessionManager(self.app, eva_configuration).run()
+        elif self.async_mode:
+            asyncio.run(self.app.ainvoke({"status": "initialize"}, {"recursion_limit": 100000}))
+        else:
+            self.app.invoke({"status": "initialize"}, {"recursion_limit": 100000})
 
     def _initialize_graph(self)-> StateGraph:
         """ Initialize the graph """
         
+        if self.async_mode:
+            initialize, sense, converse, action, end, setup = (
+                aeva_initialize, aeva_sense, aeva_converse, aeva_action, aeva_end, aeva_setup
+            )
+        else:
+            initialize, sense, converse, action, end, setup = (
+                eva_initialize, eva_sense, eva_converse, eva_action, eva_end, eva_setup
+            )
+        
         workflow = StateGraph(EvaState)
-        workflow.add_node("node_initialize", eva_initialize)
-        workflow.add_node("node_sense", eva_sense)
-        workflow.add_node("node_converse", eva_converse)
-        workflow.add_node("node_action", eva_action)
-        workflow.add_node("node_end", eva_end)
+        workflow.add_node("node_initialize", initialize)
+        workflow.add_node("node_sense", sense)
+        workflow.add_node("node_converse", converse)
+        workflow.add_node("node_action", action)
+        workflow.add_node("node_end", end)
         
         workflow.add_edge(START, "node_initialize")
         workflow.add_conditional_edges("node_initialize", router_initialize)
@@ -54,11 +86,10 @@ class EVA:
         workflow.add_conditional_edges("node_sense", router_sense)
         
         # Setup nodes
-        workflow.add_node("node_setup", eva_setup)
+        workflow.add_node("node_setup", setup)
         workflow.add_conditional_edges("node_setup", router_setup)
         
         # End Node
         workflow.add_edge("node_end", END)
         
         return workflow
-
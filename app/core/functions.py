@@ -1,28 +1,89 @@
+import time
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from config import logger
-from tqdm import tqdm
 from config import validate_language
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Tuple
 
-from client import WSLClient, MobileClient
 from utils.agent import ChatAgent
 from utils.memory import Memory
+from utils.memory.checkpoint import checkpointer
+from core.classes import EvaStatus
 from tools import ToolManager
 from utils.tts.speaker import Speaker
 
 
-def load_classes(class_dict)-> Dict:
-    """ Load the classes from the dictionary, using tqdm to show progress """
+def _print_timing_report(timings: Dict[str, float], total: float) -> None:
+    """ Print the loading time of each module, slowest first """
+    
+    width = max(len(name) for name in timings) + 2
+    print(f"EVA initialized in {total:.2f}s")
+    for name, elapsed in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {name:<{width}}{elapsed:6.2f}s")
+        
+    logger.info(f"Module timings: {timings}, total: {total:.2f}s")
+
+def load_classes(
+    class_dict: Dict[str, Callable], 
+    wiring: Dict[str, Tuple[Tuple[str, ...], Callable[[Dict], None]]] = {}
+) -> Dict:
+    """ 
+    Load the classes from the dictionary concurrently on a thread pool.
+    Each wiring step waits only on the modules it requires and runs as soon as they are ready.
+    A timing report of every module is printed at the end.
+    """
     print("Initializing EVA...")
-    instances = {}
-    with tqdm(total=len(class_dict)) as pbar:
-        for name, class_init in class_dict.items():
-            pbar.set_description(f"Loading {name} module")
-            instances[name] = class_init()
-            pbar.update(1)
+    timings = {}
+    start = time.perf_counter()
+    
+    def timed(name: str, func: Callable) -> Any:
+        begin = time.perf_counter()
+        result = func()
+        timings[name] = time.perf_counter() - begin
+        return result
+    
+    # one worker per task, so a waiting wiring step never blocks a module from loading
+    with ThreadPoolExecutor(max_workers=len(class_dict) + len(wiring)) as executor:
+        futures = {name: executor.submit(timed, name, class_init) for name, class_init in class_dict.items()}
+        
+        def wire(name: str, requires: Tuple[str, ...], connect: Callable[[Dict], None]) -> None:
+            modules = {module: futures[module].result() for module in requires}
+            timed(name, partial(connect, modules))
             
+        wire_futures = [executor.submit(wire, name, requires, connect) for name, (requires, connect) in wiring.items()]
+        
+        # raise the first loading error, if any
+        instances = {name: future.result() for name, future in futures.items()}
+        for future in wire_futures:
+            future.result()
+    
+    _print_timing_report(timings, time.perf_counter() - start)
     return instances
 
+def resume_checkpoint(memory: Memory) -> Dict[str, Any]:
+    """ 
+    Restore the session memory from the last checkpoint and return the state to resume with.
+    The pending input is only resumed if it was not answered before the checkpoint.
+    """
+    checkpoint = checkpointer.load(memory.session_id)
+    if not checkpoint:
+        return {}
+    
+    memory.restore_session(checkpoint["session_memory"])
+    logger.info(f"Resumed session {memory.session_id} after {checkpoint['num_conv']} conversations.")
+    
+    # eva_sense saves the new input as "thinking", eva_converse saves "waiting" once it is answered
+    resumed = {"num_conv": checkpoint["num_conv"]}
+    if checkpoint["status"] == EvaStatus.THINKING.value:
+        resumed.update(sense=checkpoint["sense"], action_results=checkpoint["action_results"])
+        
+    return resumed
+
+def save_checkpoint(memory: Memory, state: Dict[str, Any]) -> None:
+    """ Checkpoint the serializable state and the session memory, if checkpointing is enabled """
+    if checkpointer.enabled:
+        checkpointer.save(memory.session_id, state, memory.export_session())
+
 def initialize_modules(config : Dict[str, str]) -> Dict[str, Any]:
     """ Initialize the modules for EVA """
     
@@ -34,6 +95,10 @@ def initialize_modules(config : Dict[str, str]) -> Dict[str, Any]:
     stt_model = config.get("STT_MODEL")
     vision_model = config.get("VISION_MODEL")
     tts_model = config.get("TTS_MODEL")
+    async_mode = config.get("ASYNC_MODE", False)
+    multi_session = config.get("MULTI_SESSION", False)
+    server_process = config.get("SERVER_PROCESS", False)
+    barge_in = config.get("BARGE_IN", False)
     
     # Validate the language
     if not (full_lang := validate_language(language)):
@@ -51,21 +116,23 @@ def initialize_modules(config : Dict[str, str]) -> Dict[str, Any]:
     # Client-specific initialization
     match client_type:
         case "DESKTOP":
+            from client import WSLClient
             from utils.stt import PCListener
             from utils.vision import Watcher
             
             module_list.update({
-                "client": WSLClient,
+                "client": partial(WSLClient, barge_in),
                 "stt_model": partial(PCListener, stt_model, language),
                 "vision_model": partial(Watcher, vision_model, base_url),
             })
 
         case "MOBILE":
+            from client import MobileClient
             from utils.stt.transcriber import Transcriber
             from utils.vision.describer import Describer
 
             module_list.update({
-                "client": MobileClient,
+                "client": partial(MobileClient, async_mode, multi_session, server_process=server_process),
                 "stt_model": partial(Transcriber, stt_model),
                 "vision_model": partial(Describer, vision_model, base_url),
             })
@@ -73,9 +140,17 @@ def initialize_modules(config : Dict[str, str]) -> Dict[str, Any]:
         case _:
             raise ValueError(f"Client type {client_type} not supported.")
 
-    # Load the modules
-    modules = load_classes(module_list)
-    modules["client"].initialize_modules(modules["stt_model"], modules["vision_model"], modules["tts_model"])    
-    modules["agent"].set_tools(modules["toolbox"].get_tools_info())
+    # Connect the modules once the ones they depend on are loaded
+    wiring = {
+        "client wiring": (
+            ("client", "stt_model", "vision_model", "tts_model"),
+            lambda m: m["client"].initialize_modules(m["stt_model"], m["vision_model"], m["tts_model"])
+        ),
+        "agent tools": (
+            ("agent", "toolbox"),
+            lambda m: m["agent"].set_tools(m["toolbox"].get_tools_info())
+        ),
+    }
     
-    return modules
\ No newline at end of file
+    # Load the modules
+    return load_classes(module_list, wiring)
\ No newline at end of file
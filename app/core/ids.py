@@ -1,25 +1,39 @@
 import sqlite3
+import threading
 from config import logger
 from pathlib import Path
 from typing import Dict
 
 class IDManager:
-    """ Manage the ID of the EVA """
+    """ Manage the ID of the EVA, the database is opened on first use """
     
     def __init__(self):
-        self._db_path = self._get_database_path()
-        self._pid_list, self._void_list, self._id_list = self.initialize_database()
+        self._db_path: Path | None = None
+        self._pid_list: Dict | None = None
+        self._void_list: Dict | None = None
+        self._id_list: Dict | None = None
+        self._lock = threading.Lock() # modules are loaded concurrently
+    
+    def _load(self) -> None:
+        """ Load the ids from the database if not loaded yet """
+        with self._lock:
+            if self._id_list is None:
+                self._db_path = self._get_database_path()
+                self._pid_list, self._void_list, self._id_list = self.initialize_database()
     
     def get_pid_list(self) -> Dict:
         """ Get the pid list """
+        self._load()
         return self._pid_list
             
     def get_void_list(self) -> Dict:
         """ Get the void list """
+        self._load()
         return self._void_list
     
     def is_empty(self) -> bool:
         """ Check if the ID manager is empty """
+        self._load()
         return len(self._id_list) == 0
     
     def initialize_database(self):
@@ -73,6 +87,8 @@ class IDManager:
 
     def add_user(self, user_name: str, void: str = None, pid: str = None) -> bool:
         """ Add a new user with optional void and pid"""
+        self._load()
+        
         # Check for unique void and pid
         if void and void in self._void_list:
             logger.warning(f"Voice ID {void} already exists")
@@ -108,6 +124,7 @@ class IDManager:
 
     def update_user(self, user_name: str, void: str = None, pid: str = None) -> bool:
         """ Update an existing user's void or pid"""
+        self._load()
         
         # Check if user exists
         if user_name not in self._id_list:
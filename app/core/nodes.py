@@ -1,12 +1,13 @@
-from config import logger, eva_configuration
+from config import logger, eva_configuration, tracer
 from datetime import datetime
 from typing import Dict, Any
 
 from core.classes import EvaStatus 
-from core.functions import initialize_modules
+from core.functions import initialize_modules, resume_checkpoint, save_checkpoint
 from core.ids import id_manager
 
 
+@tracer.node("eva_initialize")
 def eva_initialize(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Initialize Eva's core modules and determine initial status.
@@ -14,11 +15,13 @@ def eva_initialize(state: Dict[str, Any]) -> Dict[str, Any]:
     This function loads all required modules from the configuration and sets the initial
     status based on whether any users are registered. The modules include the agent,
     client interface, memory system, and toolbox.
+    The sessions of the multi-session server start with their modules already loaded.
     
     """
 
-    modules = initialize_modules(eva_configuration) 
+    modules = state if state.get("client") else initialize_modules(eva_configuration) 
     status = EvaStatus.SETUP if id_manager.is_empty() else EvaStatus.THINKING
+    resumed = resume_checkpoint(modules["memory"])
     
     return {
         "status": status, 
@@ -26,12 +29,13 @@ def eva_initialize(state: Dict[str, Any]) -> Dict[str, Any]:
         "client": modules["client"],
         "memory": modules["memory"],
         "toolbox": modules["toolbox"],
-        "sense": modules["client"].start(),
+        "sense": {**resumed.get("sense", {}), **modules["client"].start()},
         "action": [],
-        "action_results": [],
-        "num_conv": 0
+        "action_results": resumed.get("action_results", []),
+        "num_conv": resumed.get("num_conv", 0)
     }
 
+@tracer.node("eva_converse")
 def eva_converse(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Main conversation processing node for Eva's interaction pipeline.
@@ -51,19 +55,42 @@ def eva_converse(state: Dict[str, Any]) -> Dict[str, Any]:
     agent = state["agent"]
     action_results = state["action_results"]
 
+    client = state["client"]
+    streaming = eva_configuration.get("STREAM_RESPONSE", False)
+
     history = memory.recall_conversation()
     timestamp = datetime.now()
     
     # get response from the LLM agent, use default template.
-    response = agent.respond( 
-        timestamp=timestamp,
-        sense=sense,
-        history=history,
-        action_results=action_results,
-        language=language
-    )
+    if streaming:
+        # the verbal response is sent to the client sentence by sentence while the model is still generating
+        response = agent.stream_respond(
+            on_sentence=lambda sentence: client.send_sentence(sentence, language),
+            timestamp=timestamp,
+            sense=sense,
+            history=history,
+            action_results=action_results,
+            language=language,
+            cancel=client.interrupted # the user barged in, stop generating
+        )
+    else:
+        response = agent.respond( 
+            timestamp=timestamp,
+            sense=sense,
+            history=history,
+            action_results=action_results,
+            language=language
+        )
      
     memory.create_memory(timestamp=timestamp, user_response=sense, response=response)
+    
+    # the turn is answered, a restarted EVA must not replay it
+    save_checkpoint(memory, {"status": EvaStatus.WAITING, "num_conv": state["num_conv"]})
+    
+    # the user interrupted EVA, listen to what they are saying
+    if client.interrupted.is_set():
+        return {"status": EvaStatus.WAITING}
+    
     action = response.get("action", [])
     speech = response.get("response")
     
@@ -71,15 +98,17 @@ def eva_converse(state: Dict[str, Any]) -> Dict[str, Any]:
     eva_response = {
         "speech": speech,
         "language": language,
-        "wait": False if any(action) else True # determine if waiting for user, only for desktop client
+        "wait": False if any(action) else True, # determine if waiting for user, only for desktop client
+        "streamed": streaming
     }
-    state["client"].send(eva_response)
+    client.send(eva_response)
     
-    if any(action):
+    if any(action) and not client.interrupted.is_set():
         return {"status": EvaStatus.ACTION, "action": action}
     else:
         return {"status": EvaStatus.WAITING}
 
+@tracer.node("eva_action")
 def eva_action(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Execute actions from the toolbox and return intermediate results.
@@ -99,6 +128,7 @@ def eva_action(state: Dict[str, Any]) -> Dict[str, Any]:
     else:
         return {"status": EvaStatus.WAITING, "action": [], "sense": {}}
     
+@tracer.node("eva_sense")
 def eva_sense(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Receive and process input from the client device.
@@ -109,6 +139,7 @@ def eva_sense(state: Dict[str, Any]) -> Dict[str, Any]:
 
     """
     
+    trace_id = tracer.new_trace() # every turn starts when EVA listens to the user, the next nodes run in its trace
     num = state["num_conv"]
     client = state["client"]
     client.send_over()
@@ -117,9 +148,14 @@ def eva_sense(state: Dict[str, Any]) -> Dict[str, Any]:
     # check if the user wants to exit
     user_message = client_feedback.get("user_message")
     if user_message and any(word in user_message.lower() for word in ['bye', 'exit']):
-        return {"status": EvaStatus.END}
-    else:
-        return {"status": EvaStatus.THINKING, "num_conv": num + 1, "sense": client_feedback, "action_results": [] }
+        save_checkpoint(state["memory"], {"status": EvaStatus.END, "num_conv": num})
+        return {"status": EvaStatus.END, "trace_id": trace_id}
+    
+    # checkpoint the turn, a restarted EVA resumes from here
+    turn = {"status": EvaStatus.THINKING, "num_conv": num + 1, "sense": client_feedback, "action_results": [] }
+    save_checkpoint(state["memory"], turn)
+    
+    return {**turn, "trace_id": trace_id}
 
 
 def eva_end(state: Dict[str, Any]) -> Dict[str, Any]:
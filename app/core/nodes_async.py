@@ -0,0 +1,138 @@
+import asyncio
+from config import logger, eva_configuration, tracer
+from datetime import datetime
+from typing import Dict, Any
+
+from core.classes import EvaStatus 
+from core.functions import initialize_modules, resume_checkpoint, save_checkpoint
+from core.ids import id_manager
+
+##### Async nodes, used when ASYNC_MODE is enabled #####
+# Same flow as core.nodes, the graph runs with ainvoke on one event loop.
+# Blocking work (model loading, tools, memory) is moved to worker threads.
+
+@tracer.node("eva_initialize")
+async def aeva_initialize(state: Dict[str, Any]) -> Dict[str, Any]:
+    """ Async version of eva_initialize, the client is started on the running loop. """
+
+    modules = state if state.get("client") else await asyncio.to_thread(initialize_modules, eva_configuration)
+    status = EvaStatus.SETUP if id_manager.is_empty() else EvaStatus.THINKING
+    resumed = await asyncio.to_thread(resume_checkpoint, modules["memory"])
+    
+    return {
+        "status": status, 
+        "agent": modules["agent"],
+        "client": modules["client"],
+        "memory": modules["memory"],
+        "toolbox": modules["toolbox"],
+        "sense": {**resumed.get("sense", {}), **await modules["client"].astart()},
+        "action": [],
+        "action_results": resumed.get("action_results", []),
+        "num_conv": resumed.get("num_conv", 0)
+    }
+
+@tracer.node("eva_converse")
+async def aeva_converse(state: Dict[str, Any]) -> Dict[str, Any]:
+    """ Async version of eva_converse, the language model is awaited on the running loop. """
+    
+    sense = state["sense"]
+    language = sense.get("language")
+    memory = state["memory"]
+    agent = state["agent"]
+    action_results = state["action_results"]
+    client = state["client"]
+    streaming = eva_configuration.get("STREAM_RESPONSE", False)
+
+    history = memory.recall_conversation()
+    timestamp = datetime.now()
+    
+    if streaming:
+        # the sentence callback feeds the speaker queue, so the stream is consumed in a worker thread
+        response = await asyncio.to_thread(
+            agent.stream_respond,
+            on_sentence=lambda sentence: client.send_sentence(sentence, language),
+            timestamp=timestamp,
+            sense=sense,
+            history=history,
+            action_results=action_results,
+            language=language,
+            cancel=client.interrupted
+        )
+    else:
+        response = await agent.arespond(
+            timestamp=timestamp,
+            sense=sense,
+            history=history,
+            action_results=action_results,
+            language=language
+        )
+     
+    await asyncio.to_thread(memory.create_memory, timestamp=timestamp, user_response=sense, response=response)
+    
+    # the turn is answered, a restarted EVA must not replay it
+    await asyncio.to_thread(save_checkpoint, memory, {"status": EvaStatus.WAITING, "num_conv": state["num_conv"]})
+    
+    if client.interrupted.is_set():
+        return {"status": EvaStatus.WAITING}
+    
+    action = response.get("action", [])
+    speech = response.get("response")
+    
+    eva_response = {
+        "speech": speech,
+        "language": language,
+        "wait": False if any(action) else True,
+        "streamed": streaming
+    }
+    await client.asend(eva_response)
+    
+    if any(action) and not client.interrupted.is_set():
+        return {"status": EvaStatus.ACTION, "action": action}
+    else:
+        return {"status": EvaStatus.WAITING}
+
+@tracer.node("eva_action")
+async def aeva_action(state: Dict[str, Any]) -> Dict[str, Any]:
+    """ Async version of eva_action, the tools run in a worker thread. """
+    
+    actions = state["action"]
+    toolbox = state["toolbox"]
+    client = state["client"]
+    
+    action_results = await asyncio.to_thread(toolbox.execute, client, actions)
+    if any(action_results):
+        return {"status": EvaStatus.THINKING, "action_results": action_results, "action": [], "sense": {}}
+    else:
+        return {"status": EvaStatus.WAITING, "action": [], "sense": {}}
+    
+@tracer.node("eva_sense")
+async def aeva_sense(state: Dict[str, Any]) -> Dict[str, Any]:
+    """ Async version of eva_sense, the client input is awaited instead of polled. """
+    
+    trace_id = tracer.new_trace()
+    num = state["num_conv"]
+    client = state["client"]
+    await client.asend_over()
+    client_feedback = await client.areceive()
+
+    user_message = client_feedback.get("user_message")
+    if user_message and any(word in user_message.lower() for word in ['bye', 'exit']):
+        await asyncio.to_thread(save_checkpoint, state["memory"], {"status": EvaStatus.END, "num_conv": num})
+        return {"status": EvaStatus.END, "trace_id": trace_id}
+    
+    turn = {"status": EvaStatus.THINKING, "num_conv": num + 1, "sense": client_feedback, "action_results": [] }
+    await asyncio.to_thread(save_checkpoint, state["memory"], turn)
+    
+    return {**turn, "trace_id": trace_id}
+
+async def aeva_end(state: Dict[str, Any]) -> Dict[str, Any]:
+    """ Async version of eva_end. """
+    
+    client = state["client"]
+    num = state["num_conv"]
+    
+    await client.aspeak("Now exiting E.V.A.")
+    logger.info(f"EVA is shutting down after {num} conversations.")
+    await client.adeactivate()
+    
+    return {"status": EvaStatus.END}
@@ -1,18 +1,52 @@
+import asyncio
 from config import logger
-from typing import Dict, Any
+from typing import Dict, Any, Type
 from datetime import datetime
+from pydantic import BaseModel
 
 from core.classes import EvaStatus
 from utils.agent.classes import SetupNameOutput, SetupDesireOutput
 from core.ids import id_manager
 from utils.prompt import load_prompt, update_prompt
 
+def _setup_template(status: EvaStatus | str) -> tuple[str, Type[BaseModel]]:
+    """ Get the prompt template and output format of the setup step """
+    
+    if status == EvaStatus.SETUP:
+        return "setup_one", SetupNameOutput
+    elif status == "STEP2":
+        return "setup_two", SetupDesireOutput
+
+def _advance_setup(status: EvaStatus | str, response: Dict, client: Any) -> EvaStatus | str:
+    """ Register the user information from the response and return the next setup status """
+    
+    if status == EvaStatus.SETUP:
+        name = response.get("name")
+        confidence = float(response.get("confidence"))
+        
+        if name is not None and confidence >= 0.8:
+            client.watcher.capture(save_file="P00001")
+            id_manager.add_user(name, void="V00001", pid="P00001")
+            client.watcher.describer.identifier.initialize_ids()
+            client.listener.transcriber.identifier.initialize_recognizer()
+            status = "STEP2"
+
+    elif status == "STEP2":
+        name = id_manager.get_void_list()["V00001"]
+        desire = response.get("desire")
+        confidence = float(response.get("confidence"))
+        if desire is not None and confidence >= 0.7:
+            prompt = load_prompt("persona") + f"\nMy most important goal is to help {name} to achieve {desire}."
+            update_prompt("persona", prompt)
+            status = EvaStatus.THINKING
+    
+    return status
+
 def eva_setup(state: Dict[str, Any]) -> Dict[str, Any]:
     """ Setup the User Name """
     
     status = state["status"]
     agent = state["agent"]
-    agent.set_tools([]) # disable tools for setup
     
     sense = state["sense"]
     language = sense.get("language")
@@ -20,13 +54,7 @@ def eva_setup(state: Dict[str, Any]) -> Dict[str, Any]:
 
     history = memory.recall_conversation()
     timestamp = datetime.now()
-    
-    if status == EvaStatus.SETUP:
-        prompt_template = "setup_one"
-        output_format = SetupNameOutput
-    elif status == "STEP2":
-        prompt_template = "setup_two"
-        output_format = SetupDesireOutput
+    prompt_template, output_format = _setup_template(status)
         
     # get response from the LLM agent
     response = agent.respond(
@@ -35,7 +63,8 @@ def eva_setup(state: Dict[str, Any]) -> Dict[str, Any]:
         sense=sense,
         history=history,
         language=language,
-        output_format=output_format
+        output_format=output_format,
+        tools=False # no tools during setup
     )
     
     memory.create_memory(timestamp=timestamp, user_response=sense, response=response)
@@ -51,26 +80,7 @@ def eva_setup(state: Dict[str, Any]) -> Dict[str, Any]:
     
     client = state["client"]
     client.send(eva_response)
-    
-    if status == EvaStatus.SETUP:
-        name = response.get("name")
-        confidence = float(response.get("confidence"))
-        
-        if name is not None and confidence >= 0.8:
-            client.watcher.capture(save_file="P00001")
-            id_manager.add_user(name, void="V00001", pid="P00001")
-            client.watcher.describer.identifier.initialize_ids()
-            client.listener.transcriber.identifier.initialize_recognizer()
-            status = "STEP2"
-
-    elif status == "STEP2":
-        name = id_manager._void_list["V00001"]
-        desire = response.get("desire")
-        confidence = float(response.get("confidence"))
-        if desire is not None and confidence >= 0.7:
-            prompt = load_prompt("persona") + f"\nMy most important goal is to help {name} to achieve {desire}."
-            update_prompt("persona", prompt)
-            status = EvaStatus.THINKING
+    status = _advance_setup(status, response, client)
 
     # send the response to the client device
     num = state["num_conv"]
@@ -84,6 +94,53 @@ def eva_setup(state: Dict[str, Any]) -> Dict[str, Any]:
     else:
         return {"status": status, "num_conv": num + 1, "sense": client_feedback}
 
+async def aeva_setup(state: Dict[str, Any]) -> Dict[str, Any]:
+    """ Async version of eva_setup """
+    
+    status = state["status"]
+    agent = state["agent"]
+    
+    sense = state["sense"]
+    language = sense.get("language")
+    memory = state["memory"]
+    client = state["client"]
+
+    history = memory.recall_conversation()
+    timestamp = datetime.now()
+    prompt_template, output_format = _setup_template(status)
+        
+    response = await agent.arespond(
+        template=prompt_template,
+        timestamp=timestamp,
+        sense=sense,
+        history=history,
+        language=language,
+        output_format=output_format,
+        tools=False # no tools during setup
+    )
+    
+    await asyncio.to_thread(memory.create_memory, timestamp=timestamp, user_response=sense, response=response)
+    action = response.get("action", [])
+    
+    eva_response = {
+        "speech": response.get("response"),
+        "language": language,
+        "wait": True if not action else False
+    }
+    
+    await client.asend(eva_response)
+    status = await asyncio.to_thread(_advance_setup, status, response, client)
+
+    num = state["num_conv"]
+    await client.asend_over()
+    client_feedback = await client.areceive(save_file="V00001")
+
+    user_message = client_feedback.get("user_message")
+    if user_message and any(word in user_message.lower() for word in ['bye', 'exit']):
+        return {"status": EvaStatus.END}
+    else:
+        return {"status": status, "num_conv": num + 1, "sense": client_feedback}
+
 
 def router_setup(state: Dict[str, Any]) -> str:
     """ Determine the next node based on the user input """
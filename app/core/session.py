@@ -0,0 +1,95 @@
+import threading
+from functools import partial
+from typing import Dict, Any, Optional
+from config import logger
+
+from core.functions import initialize_modules
+from core.shared import SharedModel
+from client.mobile import SessionClosed
+from utils.memory import Memory
+
+
+class SessionManager:
+    """
+    Serve one independent EVA conversation per connected mobile client.
+
+    Every client id gets its own graph run in a session thread, with its own memory,
+    conversation state and a MobileClient bound to its connection. The agent, toolbox and
+    the STT, vision and TTS models are loaded once and shared between the sessions through
+    SharedModel, which bounds the number of concurrent calls on each of them.
+    A session survives a reconnection of its client and ends when the user says goodbye, or when
+    the client stays disconnected for SESSION_TIMEOUT seconds. Its data manager is dropped then.
+
+    Args:
+        graph: The compiled EVA graph, run once per session.
+        config (Dict): The EVA configuration.
+    Examples:
+        >>> SessionManager(workflow.compile(), eva_configuration).run()
+    """
+
+    def __init__(self, graph: Any, config: Dict[str, Any]) -> None:
+        self.graph = graph
+        self.sessions: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+        concurrency = config.get("MODEL_CONCURRENCY", 1)
+        self.session_timeout: Optional[float] = config.get("SESSION_TIMEOUT", 600)
+        self._memory_factory = partial(Memory, config.get("SUMMARIZE_MODEL"), config.get("BASE_URL"))
+
+        # sessions run the threaded graph, the server is started by run
+        self.modules = initialize_modules({**config, "ASYNC_MODE": False, "MULTI_SESSION": True})
+
+        client = self.modules["client"]
+        client.server.stt_model = SharedModel(client.server.stt_model, concurrency)
+        client.server.vision_model = SharedModel(client.server.vision_model, concurrency)
+        client.speaker = SharedModel(client.speaker, concurrency)
+        self.agent = SharedModel(self.modules["agent"], concurrency)
+
+    def open_session(self, client_id: str) -> None:
+        """ Start the session of the client, unless it is still running """
+
+        with self._lock:
+            session = self.sessions.get(client_id)
+            if session and session.is_alive():
+                logger.info(f"SessionManager: Client {client_id} reconnected to its session.")
+                return
+
+            session = threading.Thread(target=self._run_session, args=(client_id,), name=f"session-{client_id}", daemon=True)
+            self.sessions[client_id] = session
+            session.start()
+
+        logger.info(f"SessionManager: Session started for client {client_id}, {len(self.sessions)} active.")
+
+    def _run_session(self, client_id: str) -> None:
+        """ Run the EVA graph for a single client """
+
+        client = self.modules["client"].bind(client_id)
+        client.idle_timeout = self.session_timeout
+        state = {
+            "status": "initialize",
+            "agent": self.agent,
+            "toolbox": self.modules["toolbox"],
+            "client": client,
+            "memory": self._memory_factory(session_id=client_id),
+        }
+
+        try:
+            self.graph.invoke(state, {"recursion_limit": 100000})
+        except SessionClosed as e:
+            logger.info(f"SessionManager: {str(e)}")
+        except Exception as e:
+            logger.error(f"SessionManager: Session of client {client_id} failed: {str(e)}")
+        finally:
+            with self._lock:
+                if self.sessions.get(client_id) is threading.current_thread():
+                    self.sessions.pop(client_id)
+                    client.server.release_client(client_id)
+
+        logger.info(f"SessionManager: Session of client {client_id} ended.")
+
+    def run(self) -> None:
+        """ Serve the mobile clients, a session is opened for every client that connects """
+
+        server = self.modules["client"].server
+        server.on_connect = self.open_session
+        server.run_server()
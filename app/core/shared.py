@@ -0,0 +1,51 @@
+import asyncio
+import inspect
+import threading
+import functools
+from typing import Any
+
+
+class SharedModel:
+    """
+    Thread-safe proxy sharing one heavy model instance between conversation sessions.
+
+    Every method call goes through a bounded semaphore, so at most `concurrency` calls
+    run on the model at the same time and the other sessions wait for their turn.
+    Plain attributes are read through from the model.
+
+    Args:
+        model: The model instance to share (agent, transcriber, describer, speaker).
+        concurrency (int): The maximum number of concurrent calls. Default is 1.
+    Examples:
+        >>> transcriber = SharedModel(Transcriber("faster-whisper"), concurrency=2)
+        >>> transcription, language = transcriber.transcribe(audioclip)
+    """
+
+    def __init__(self, model: Any, concurrency: int = 1) -> None:
+        self._model = model
+        self._semaphore = threading.BoundedSemaphore(max(1, concurrency))
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._model, name)
+        if not callable(attribute):
+            return attribute
+
+        if inspect.iscoroutinefunction(attribute):
+            @functools.wraps(attribute)
+            async def async_call(*args, **kwargs):
+                # wait for a slot without blocking the event loop
+                await asyncio.to_thread(self._semaphore.acquire)
+                try:
+                    return await attribute(*args, **kwargs)
+                finally:
+                    self._semaphore.release()
+            return async_call
+
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            with self._semaphore:
+                return attribute(*args, **kwargs)
+        return call
+
+    def __repr__(self) -> str:
+        return f"SharedModel({self._model!r})"
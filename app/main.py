@@ -1,3 +1,4 @@
 from core import EVA
 
-EVA()
\ No newline at end of file
+if __name__ == "__main__":
+    EVA()
\ No newline at end of file
@@ -1,5 +1,5 @@
 import os
-from config import logger
+from config import logger, tracer
 import importlib
 import inspect
 import json
@@ -100,7 +100,8 @@ class ToolManager:
             tool = self.tool_map.get(tool_name)
             
             try:
-                result = tool.run(args)                      
+                with tracer.span("tool", tool=tool_name):
+                    result = tool.run(args)
             except Exception as e:
                 logger.error(f"Failed to execute tool {tool_name}: {str(e)}")
                 return {"error": f"Error executing {tool_name}: {str(e)}"}
@@ -113,7 +114,8 @@ class ToolManager:
             return {"result": result}
         
         with ThreadPoolExecutor() as executor:
-            return list(executor.map(execute_tool, actions))
+            futures = [executor.submit(tracer.bind(execute_tool, action)) for action in actions]
+            return [future.result() for future in futures]
         
 
 
@@ -4,8 +4,6 @@ import subprocess
 import platform
 from typing import Dict, Type
 
-import cv2
-import pyautogui
 from pydantic import BaseModel, Field
 from langchain_community.tools import BaseTool
 from utils.vision import Describer
@@ -27,6 +25,9 @@ class Screenshot(BaseTool):
         self,
         query: str,
     ) -> Dict:
+        import cv2
+        import pyautogui # needs a display, loaded only when the tool runs
+        
         filename = f"screenshot.jpg"
         full_path = os.path.join(os.path.dirname(__file__), "temp", filename)
         
@@ -1,16 +1,21 @@
-from config import logger
+from config import logger, tracer
+import re
 import json
+import time
 from functools import partial
+from threading import Event
 from typing import Callable, Dict, Any, List
 from pydantic import BaseModel
 from datetime import datetime
 
-from langchain_core.prompts import PromptTemplate
+from langchain_core.messages import BaseMessage, SystemMessage
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import Runnable
 
 from utils.agent.classes import AgentOutput
 from utils.agent.constructor import PromptConstructor
+from utils.agent.usage import PromptCacheUsage
 from utils.agent.models import (
     create_groq_model,
     create_ollama_model,
@@ -37,6 +42,12 @@ class ChatAgent:
         constructor (PromptConstructor): Handles the construction of prompts for the LLM.
         llm (BaseLanguageModel): The initialized language model instance.
         tool_info (List[Dict[str, Any]]): Available tools and their configurations.
+        usage (PromptCacheUsage): Reports the cached and uncached input tokens of every call.
+    
+    The parser, its format instructions, the system message and the chain only depend on the
+    template, the output format, the language and whether the tools are offered, they are compiled
+    once per combination. The tools are chosen per call, the agent is shared between sessions.
+    A turn only builds its own message and invokes the chain.
     
     Example:
         >>> agent = ChatAgent(model_name="llama", base_url="http://localhost:11434", language="english")
@@ -44,6 +55,13 @@ class ChatAgent:
         
     """
     
+    # end of a sentence: punctuation followed by a space, or a CJK full stop
+    _sentence_end = re.compile(r"[.!?]+[\"')\]]*\s+|[。！？]+")
+    
+    # providers that only cache the prompt prefixes marked with cache_control,
+    # the OpenAI compatible ones cache the stable prefix automatically and Ollama keeps it loaded with keep_alive
+    _explicit_cache = ("CLAUDE",)
+    
     def __init__(
         self, 
         model_name: str = "llama", 
@@ -58,6 +76,8 @@ class ChatAgent:
         self.constructor = PromptConstructor()
         self.llm: BaseLanguageModel = self._initialize_model()
         self.tool_info: str | None = None
+        self.usage = PromptCacheUsage(self.model_selection)
+        self._compiled: Dict[tuple, tuple[Runnable, SystemMessage]] = {} # (template, output format, language, tools) -> (chain, system message)
         
         logger.info(f"Agent: {self.model_selection} is ready.")
 
@@ -90,6 +110,7 @@ class ChatAgent:
         """ Set the tool information for the agent """
   
         self.tool_info = json.dumps(tool_info)
+        self._compiled.clear() # the tools are part of the system prompt
     
     @staticmethod
     def _format_response(response: Dict[str, Any]) -> Dict[str, Any]:
@@ -107,6 +128,60 @@ class ChatAgent:
             
         return response
     
+    @staticmethod
+    def _split_sentences(text: str, start: int = 0) -> tuple[List[str], int]:
+        """ Split the finished sentences from a growing text, return them and the position of the unfinished rest """
+        
+        sentences = []
+        for match in ChatAgent._sentence_end.finditer(text, start):
+            sentence = text[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+            
+        return sentences, start
+    
+    def _compile(
+        self, 
+        template: str | None, 
+        language: str | None, 
+        output_format: BaseModel | None, 
+        tools: bool = True
+    ) -> tuple[Runnable, SystemMessage]:
+        """ Return the chain and the system message of a template, output format and language, built on first use """
+        
+        key = (template, output_format, language, tools)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            parser = JsonOutputParser(pydantic_object=output_format or AgentOutput.with_language(self.language, language))
+            system_message = self.constructor.build_system_message(
+                template=template,
+                tools=self.tool_info if tools else "[]",
+                format_instructions=parser.get_format_instructions(),
+                cache_prefix=self.model_selection in self._explicit_cache
+            )
+            compiled = self._compiled[key] = (self.llm | parser, system_message)
+            
+        return compiled
+    
+    def _build_chain(
+        self,
+        template: str | None,
+        timestamp : str, 
+        sense: Dict, 
+        history: List[Dict], 
+        action_results: List[Dict], 
+        language: str | None,
+        output_format: BaseModel | None,
+        tools: bool = True
+    ) -> tuple[Runnable, List[BaseMessage]]:
+        """ Get the compiled chain, only the message of the turn is built """
+        
+        chain, system_message = self._compile(template, language, output_format, tools)
+        turn_message = self.constructor.build_turn_message(timestamp, sense, history, action_results)
+            
+        return chain, [system_message, turn_message]
+    
     def respond(
         self,
         template: str | None = None,
@@ -115,34 +190,42 @@ class ChatAgent:
         history: List[Dict] = [], 
         action_results: List[Dict] = [], 
         language: str | None = "english",
-        output_format: BaseModel | None = None
+        output_format: BaseModel | None = None,
+        tools: bool = True
     ) -> Dict:
         """Main response function that build the prompt and get response from the language model"""
         
-        prompt = self.constructor.build_prompt(
-            template=template,
-            timestamp=timestamp, 
-            sense=sense, 
-            history=history, 
-            action_results=action_results
-        )
-        
-        parser = (
-            JsonOutputParser(pydantic_object=output_format)
-            if output_format is not None
-            else JsonOutputParser(pydantic_object=AgentOutput.with_language(self.language, language))
-        )
+        chain, messages = self._build_chain(template, timestamp, sense, history, action_results, language, output_format, tools)
         
-        prompt_template = PromptTemplate(
-            input_variables=["tools"],
-            template = prompt,
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
+        try: 
+            with tracer.span("llm", model=self.model_selection):
+                response = chain.invoke(messages, config={"callbacks": [self.usage]})
+            logger.debug(json.dumps(response, indent=2))
+            response = self._format_response(response)
+            
+        except Exception as e:
+            raise Exception(f"ChatAgent: Failed to get response from model: {str(e)}")
             
-        chain = prompt_template | self.llm | parser
+        return response
+
+    async def arespond(
+        self,
+        template: str | None = None,
+        timestamp : str = datetime.now(), 
+        sense: Dict = {}, 
+        history: List[Dict] = [], 
+        action_results: List[Dict] = [], 
+        language: str | None = "english",
+        output_format: BaseModel | None = None,
+        tools: bool = True
+    ) -> Dict:
+        """Async version of respond, awaits the language model on the running loop"""
+        
+        chain, messages = self._build_chain(template, timestamp, sense, history, action_results, language, output_format, tools)
         
         try: 
-            response = chain.invoke({"tools": self.tool_info})
+            with tracer.span("llm", model=self.model_selection):
+                response = await chain.ainvoke(messages, config={"callbacks": [self.usage]})
             logger.debug(json.dumps(response, indent=2))
             response = self._format_response(response)
             
@@ -150,3 +233,119 @@ class ChatAgent:
             raise Exception(f"ChatAgent: Failed to get response from model: {str(e)}")
             
         return response
+
+    def stream_respond(
+        self,
+        on_sentence: Callable[[str], None],
+        template: str | None = None,
+        timestamp : str = datetime.now(), 
+        sense: Dict = {}, 
+        history: List[Dict] = [], 
+        action_results: List[Dict] = [], 
+        language: str | None = "english",
+        output_format: BaseModel | None = None,
+        cancel: Event | None = None,
+        tools: bool = True
+    ) -> Dict:
+        """
+        Streaming version of respond. The partial Json output is parsed while the model is generating,
+        every finished sentence of the verbal response is passed to on_sentence right away,
+        the full formatted response is returned once the model is done.
+        If cancel is set during the generation, the model call is closed and the partial response
+        is returned without actions.
+        """
+        
+        chain, messages = self._build_chain(template, timestamp, sense, history, action_results, language, output_format, tools)
+        
+        response = {}
+        spoken = 0
+        start = time.time()
+        try: 
+            stream = tracer.first_item("llm_first_token", chain.stream(messages, config={"callbacks": [self.usage]}), model=self.model_selection)
+            for response in stream:
+                if cancel is not None and cancel.is_set():
+                    stream.close() # stop the generation on the model side
+                    logger.info("ChatAgent: Response cancelled by the user.")
+                    response = self._format_response(response if isinstance(response, dict) else {})
+                    speech = response.get("response")
+                    
+                    # keep only what was spoken, the actions are dropped
+                    return {**response, "response": speech[:spoken] if isinstance(speech, str) else None, "action": []}
+                
+                if not isinstance(response, dict):
+                    continue
+                
+                speech = response.get("properties", response).get("response")
+                if not isinstance(speech, str):
+                    continue
+                
+                sentences, spoken = self._split_sentences(speech, spoken)
+                for sentence in sentences:
+                    on_sentence(sentence)
+            
+            # flush the last unfinished sentence
+            speech = response.get("properties", response).get("response")
+            if isinstance(speech, str) and (rest := speech[spoken:].strip()):
+                on_sentence(rest)
+            
+            tracer.record("llm", start, time.time(), model=self.model_selection, streamed=True)
+            logger.debug(json.dumps(response, indent=2))
+            response = self._format_response(response)
+            
+        except Exception as e:
+            raise Exception(f"ChatAgent: Failed to stream response from model: {str(e)}")
+            
+        return response
+
+
+if __name__ == "__main__":
+    # python -m utils.agent.chatagent [turns]
+    # per-turn Python overhead of the chain, before and after the compilation cache, with a fake model answering instantly
+    import sys
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    
+    class BenchmarkAgent(ChatAgent):
+        def _initialize_model(self) -> BaseLanguageModel:
+            answer = json.dumps({"analysis": "", "strategy": "", "response": "Hello there.", "premeditation": "", "action": []})
+            return FakeListChatModel(responses=[answer])
+    
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    agent = BenchmarkAgent(model_name="benchmark")
+    agent.set_tools([{"name": f"tool_{i}", "description": "A tool of the benchmark.", "args": {"query": "string"}} for i in range(8)])
+    
+    timestamp = datetime.now().strftime("%A, %B %d, %Y at %I:%M %p")
+    sense = {"user_message": "What do you think about the weather today?", "observation": "A person sitting at a desk."}
+    history = [{"user_message": f"Message {i}", "eva_message": f"Answer {i}"} for i in range(10)]
+    
+    def uncompiled() -> tuple[Runnable, Any]:
+        """ The previous path: a new parser, format instructions, prompt template and chain on every turn """
+        parser = JsonOutputParser(pydantic_object=AgentOutput.with_language(agent.language, "english"))
+        prompt = "\n".join([
+            agent.constructor.build_system_prompt(None, "{tools}", "{format_instructions}"),
+            agent.constructor.build_context_prompt(timestamp, sense, history, []),
+        ])
+        prompt_template = PromptTemplate(
+            input_variables=["tools"],
+            template=prompt,
+            partial_variables={"format_instructions": parser.get_format_instructions()},
+        )
+        return prompt_template | agent.llm | parser, {"tools": agent.tool_info}
+    
+    def compiled() -> tuple[Runnable, Any]:
+        return agent._build_chain(None, timestamp, sense, history, [], "english", None)
+    
+    for name, build in (("before", uncompiled), ("after", compiled)):
+        build() # warm up
+        start = time.perf_counter()
+        for _ in range(turns):
+            build()
+        built = (time.perf_counter() - start) / turns
+        
+        start = time.perf_counter()
+        for _ in range(turns):
+            chain, inputs = build()
+            chain.invoke(inputs)
+        invoked = (time.perf_counter() - start) / turns
+        
+        print(f"{name:<7} build {built * 1e6:8.1f}us per turn, build and invoke {invoked * 1e6:8.1f}us per turn")
@@ -1,6 +1,7 @@
 from config import logger
 from typing import List, Dict, Any
 from pydantic import BaseModel, Field
+from langchain_core.messages import HumanMessage, SystemMessage
 from utils.prompt import load_prompt
 
 class PromptConstructor:
@@ -16,6 +17,10 @@ class PromptConstructor:
     The prompt structure uses XML tags to clearly separate different input sections,
     making it easier for LLMs to parse and understand the context. Each section is
     formatted consistently to maintain a standardized prompt format.
+    
+    The prompt is sent as two chat messages: a system message with everything that is stable
+    across turns (persona, tools, instructions, output format), then a user message with the
+    history and the context of the turn. The providers reuse the cached prefix.
     """
     
     def __init__(self):
@@ -93,64 +98,102 @@ class PromptConstructor:
         action_results.append("</action_results>")
         return "\n".join(action_results)
 
-    def build_prompt(
+    def build_system_prompt(self, template: str | None, tools: str | None, format_instructions: str) -> str:
+        """
+        Builds the stable prefix of the prompt: persona, tools, instructions and output format.
+        It only changes with the template, the tools or the response language, so the provider
+        can cache it across turns.
+        """
+        instructions = self.instruction_prompt if template is None else load_prompt(template)
+        system_prompt = "\n".join([
+            "<PERSONA>",
+            self.persona_prompt,
+            "</PERSONA>",
+            "",
+            "<TOOLS>",
+            "I have the following tools available for action:",
+            str(tools),
+            "</TOOLS>",
+            "",
+            "<INSTRUCTIONS>",
+            instructions,
+            "</INSTRUCTIONS>",
+            "",
+            "Based on the context and instructions, craft appropriate output with the following Json format.",
+            "",
+            "<FORMATTING>",
+            format_instructions,
+            "</FORMATTING>",
+        ])
+        
+        return system_prompt
+    
+    def build_context_prompt(
         self,
-        template: str | None,
         timestamp : str, 
         sense: Dict, 
         history: List[Dict[str, str]], 
         action_results: List[Dict[str, Any]]
     ) -> str:
+        """ Builds the variable part of the prompt: history and context of the turn """
+        
+        sections = [
+            self._format_history(history),
+            "<CONTEXT>",
+            f"<current_time>{timestamp}</current_time>",
+            self._format_observation(sense.get("observation")),
+            self._format_message(sense.get("user_message")),
+            self._format_action_results(action_results),
+            "</CONTEXT>",
+        ]
+        return "\n".join(section for section in sections if section)
+
+    def build_system_message(
+        self,
+        template: str | None,
+        tools: str | None,
+        format_instructions: str,
+        cache_prefix: bool = False
+    ) -> SystemMessage:
         """
-        Builds the prompt for LLM.
+        Builds the system message of the stable prefix, once per template, tools and output format.
         Args:
             template (str | None): Name of the system prompt template file to load. If None, uses default system prompt.
+            tools (str | None): The tool schemas, in Json.
+            format_instructions (str): The output format instructions of the parser.
+            cache_prefix (bool): Mark the prefix as cacheable, for the providers with explicit caching (Anthropic).
+        Returns:
+            SystemMessage: The system message for the language model.
+        """
+        
+        system_prompt = self.build_system_prompt(template, tools, format_instructions)
+        logger.debug(system_prompt)
+        
+        if cache_prefix:
+            return SystemMessage(content=[
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ])
+        return SystemMessage(content=system_prompt)
+    
+    def build_turn_message(
+        self,
+        timestamp : str, 
+        sense: Dict, 
+        history: List[Dict[str, str]], 
+        action_results: List[Dict[str, Any]]
+    ) -> HumanMessage:
+        """
+        Builds the user message of the turn, sent after the system message.
+        Args:
             timestamp (str): Current timestamp for context.
             sense (Dict): Dictionary containing sensory information like user messages and observations.
             history (List[Dict[str, str]]): List of conversation history entries.
             action_results (List[Dict[str, Any]]): Results from previous actions taken by the agent.
         Returns:
-            str: The fully constructed prompt string for the language model.
-    
+            HumanMessage: The user message for the language model.
         """
         
-        instructions = self.instruction_prompt if template is None else load_prompt(template)
-        user_message = self._format_message(sense.get("user_message"))
-        observation = self._format_observation(sense.get("observation"))
-        action_results = self._format_action_results(action_results)
-        history_prompt = self._format_history(history)
+        context_prompt = self.build_context_prompt(timestamp, sense, history, action_results)
+        logger.debug(context_prompt)
         
-        PROMPT_TEMPLATE = f"""  
-            <PERSONA>
-            {self.persona_prompt}
-            </PERSONA>
-            
-            <TOOLS>
-            I have the following tools available for action:
-            {{tools}}
-            </TOOLS>
-            
-            {history_prompt}
-            
-            <CONTEXT>
-            <current_time>{timestamp}</current_time>
-            {observation} 
-            {user_message} 
-            {action_results}
-            </CONTEXT>
-
-            <INSTRUCTIONS>
-            {instructions}
-            </INSTRUCTIONS>
-            
-            Based on the above context and instructions, craft appropriate output with the following Json format.
-            
-            <FORMATTING>
-            {{format_instructions}}
-            </FORMATTING>
-    
-            <ASSISTANT>
-        """
-    
-        logger.debug(PROMPT_TEMPLATE) 
-        return PROMPT_TEMPLATE
+        return HumanMessage(content=context_prompt)
@@ -48,7 +48,7 @@ def create_openai_model(
     from langchain_openai import ChatOpenAI
     
     try:
-        return ChatOpenAI(model_name=model_name, temperature=temperature)
+        return ChatOpenAI(model_name=model_name, temperature=temperature, stream_usage=True)
         
     except Exception as e:
         raise Exception(f"Error: Failed to initialize Openai model: {str(e)}")
@@ -108,7 +108,8 @@ def create_grok_model(
             base_url=base_url, 
             model_name=model_name, 
             temperature=temperature,
-            max_retries=3
+            max_retries=3,
+            stream_usage=True # report the cached prompt tokens when streaming
         )
         
     except Exception as e:
@@ -129,7 +130,8 @@ def create_deepseek_model(
             base_url=base_url, 
             model_name=model_name, 
             temperature=temperature,
-            max_retries=3
+            max_retries=3,
+            stream_usage=True # report the cached prompt tokens when streaming
         )
         
     except Exception as e:
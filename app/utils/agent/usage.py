@@ -0,0 +1,84 @@
+from config import logger, tracer
+import time
+import threading
+from typing import Any, Dict
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+class PromptCacheUsage(BaseCallbackHandler):
+    """
+    Callback reporting the cached and uncached input tokens of every model call.
+
+    The counts come from the usage metadata of the response: Anthropic and OpenAI compatible
+    models report the tokens read from their prompt cache, Ollama only reports the prompt size.
+    Every call is logged and recorded as an "llm_tokens" event in the trace, the totals are kept
+    to follow the cache hit rate of the session.
+
+    Attributes:
+        model (str): The model selection, for the logs and the trace.
+        calls (int): The number of model calls reported.
+        input_tokens (int): Total input tokens.
+        cached_tokens (int): Total input tokens read from the provider cache.
+    Examples:
+        >>> usage = PromptCacheUsage("CLAUDE")
+        >>> chain.invoke(messages, config={"callbacks": [usage]})
+        >>> usage.hit_rate
+    """
+
+    def __init__(self, model: str):
+        self.model: str = model
+        self.calls: int = 0
+        self.input_tokens: int = 0
+        self.cached_tokens: int = 0
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    @staticmethod
+    def _usage(response: LLMResult) -> Dict[str, int]:
+        """ Return the input, cache read and cache write tokens of a response """
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    details = usage.get("input_token_details") or {}
+                    return {
+                        "input": usage.get("input_tokens", 0),
+                        "cache_read": details.get("cache_read") or 0,
+                        "cache_creation": details.get("cache_creation") or 0,
+                    }
+
+                # ollama reports the prompt size in its response metadata
+                metadata = getattr(message, "response_metadata", None) or {}
+                if "prompt_eval_count" in metadata:
+                    return {"input": metadata["prompt_eval_count"], "cache_read": 0, "cache_creation": 0}
+
+        return {}
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        usage = self._usage(response)
+        if not usage:
+            return
+
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += usage["input"]
+            self.cached_tokens += usage["cache_read"]
+
+        uncached = usage["input"] - usage["cache_read"]
+        logger.debug(f"ChatAgent: {usage['input']} input tokens, {usage['cache_read']} cached, {uncached} uncached, "
+                     f"{usage['cache_creation']} written to the cache, {self.hit_rate:.0%} cached in the session.")
+
+        now = time.time()
+        tracer.record(
+            "llm_tokens", now, now,
+            model=self.model,
+            input_tokens=usage["input"],
+            cached_tokens=usage["cache_read"],
+            uncached_tokens=uncached,
+            cache_creation_tokens=usage["cache_creation"]
+        )
@@ -1,2 +1,6 @@
-from .window import Window
-from .discord import MidjourneyServer
+from utils.lazy import lazy_import
+
+__getattr__ = lazy_import(__name__, {
+    "Window": ".window",
+    "MidjourneyServer": ".discord",
+})
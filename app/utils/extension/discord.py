@@ -2,13 +2,14 @@ import requests
 import os
 import time
 from datetime import datetime
-from pathlib import Path
 from config import logger
 from typing import List, Dict, Optional
 
 import cv2
 import numpy as np
 
+from utils.media import media_store
+
 class MidjourneyServer():
     """
     A class for sending prompts to discord midjourney and getting the image url.
@@ -22,7 +23,6 @@ class MidjourneyServer():
         version: The version of the midjourney server.
         id: The id of the midjourney server.
         authorization: The authorization of the midjourney server.
-        _image_dir: The directory to save the images.
         _prev_message_id: The previous message id.
         
     """
@@ -41,19 +41,9 @@ class MidjourneyServer():
             'Content-Type': 'application/json',
         }
         
-        # get the image directory and the message id
-        self._image_dir = self._get_temp_dir()        
+        # get the message id
         self.prev_message_id = self._load_previous(self._msg_url, self._headers)
     
-    @staticmethod
-    def _get_temp_dir() -> str:
-        """Get or create the EVA temp directory"""
-        
-        temp_dir = Path.home() / '.eva' / 'images'
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        
-        return str(temp_dir)
-    
     @staticmethod
     def _load_previous(msg_url: str, headers: Dict) -> Optional[str]:
         """Load the previous message id"""
@@ -167,11 +157,11 @@ class MidjourneyServer():
                      img[mid_h:, :mid_w], img[mid_h:, mid_w:]]
             
             
-            base_filename = os.path.join(self._image_dir, image_id)
-            image_paths = [f"{base_filename}_{i+1}.jpg" for i in range(4)]
-            
-            for i, part in enumerate(parts):
-                cv2.imwrite(image_paths[i], part)
+            # the parts are kept in the media store, they can be downloaded by the mobile client too
+            image_paths = []
+            for part in parts:
+                _, jpg = cv2.imencode(".jpg", part)
+                image_paths.append(str(media_store.path(media_store.put(jpg.tobytes(), "images", ".jpg"))))
    
             return image_paths
         
@@ -1,18 +1,47 @@
 import os
+import hashlib
+import threading
+from typing import Dict, Tuple
 
-def load_html(template: str, **kwargs) -> str:
+_templates: Dict[str, Tuple[float, str, str]] = {} # path -> (mtime, html, hash)
+_lock = threading.Lock()
+
+def get_template(template: str) -> Tuple[str, str]:
+    """ Return the html of a template and its content hash, read from disk only when the file changes """
 
     dir = os.path.dirname(__file__)
     html_path = os.path.join(dir, template)
-    
+    if os.path.basename(template) != template:
+        raise FileNotFoundError(f"Template file {html_path} not found.")
+
     try:
-        with open(html_path, 'r') as f:
-            html = f.read().strip()
-    
+        mtime = os.stat(html_path).st_mtime
     except FileNotFoundError:
-        raise FileNotFoundError(f"Prompt file {html_path} not found.")
-    
+        raise FileNotFoundError(f"Template file {html_path} not found.")
+
+    with _lock:
+        cached = _templates.get(html_path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+
+    with open(html_path, 'r') as f:
+        html = f.read().strip()
+
+    content_hash = hashlib.sha256(html.encode("utf-8")).hexdigest()[:16]
+    with _lock:
+        _templates[html_path] = (mtime, html, content_hash)
+
+    return html, content_hash
+
+def render_html(html: str, **kwargs) -> str:
+    """ Fill the <key> placeholders of a template, the mobile client renders the same way """
+
     for key, value in kwargs.items():
         html = html.replace(f"<{key}>", value)
-        
-    return html
\ No newline at end of file
+
+    return html
+
+def load_html(template: str, **kwargs) -> str:
+
+    html, _ = get_template(template)
+    return render_html(html, **kwargs)
@@ -0,0 +1,27 @@
+import sys
+import importlib
+from typing import Any, Callable, Dict
+
+def lazy_import(package: str, attributes: Dict[str, str]) -> Callable[[str], Any]:
+    """
+    Build a module level __getattr__ that imports the exported classes of a package on first access,
+    so heavy dependencies (torch, TTS, face_recognition, mpv...) load only when a backend needs them.
+    
+    Args:
+        package (str): The package name, usually __name__.
+        attributes (Dict[str, str]): Exported name mapped to the relative submodule that defines it.
+    
+    Examples:
+        >>> __getattr__ = lazy_import(__name__, {"Speaker": ".speaker"})
+    """
+    
+    def __getattr__(name: str) -> Any:
+        submodule = attributes.get(name)
+        if submodule is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        
+        value = getattr(importlib.import_module(submodule, package), name)
+        setattr(sys.modules[package], name, value) # cache it, __getattr__ is not called again
+        return value
+    
+    return __getattr__
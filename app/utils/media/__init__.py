@@ -0,0 +1 @@
+from .store import MediaStore, media_store
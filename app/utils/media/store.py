@@ -0,0 +1,200 @@
+import os
+import time
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from config import logger, eva_configuration
+from typing import Dict, List, Optional, Tuple
+
+class MediaStore:
+    """
+    Content addressed store for the media files EVA generates: speech, images and html pages.
+
+    The files live in data/media/<kind>/<hash><suffix>, the same content is stored once.
+    A background janitor evicts the files older than max_age, then the least recently used ones
+    until the store fits in max_size. Files referenced by a download in progress, or created
+    within the grace period (not downloaded yet), are never evicted.
+
+    The download references are held by the process serving the files, so only that process may
+    evict them: in server process mode the engine writes the files without a janitor, and the
+    server process runs the janitor with rescan, indexing the files written by the engine.
+
+    Attributes:
+        root (Path): The media directory.
+        max_size (int): The size budget in bytes.
+        max_age (float): The age budget in seconds, since the last access.
+        grace (float): Seconds a new or accessed file is kept regardless of the budgets.
+        janitor (bool): Start the janitor on the first put, False when another process evicts the files.
+    Examples:
+        >>> key = media_store.put(mp3_bytes, "audio", ".mp3")   # "audio/<hash>.mp3"
+        >>> path = media_store.acquire("audio", "<hash>.mp3")   # while serving it
+        >>> media_store.release("audio", "<hash>.mp3")
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        max_size: int = 512 * 1024 * 1024,
+        max_age: float = 24 * 3600,
+        grace: float = 300,
+        interval: float = 300,
+        janitor: bool = True
+    ) -> None:
+        self.root: Path = root or Path(__file__).resolve().parents[2] / 'data' / 'media'
+        self.max_size: int = max_size
+        self.max_age: float = max_age
+        self.grace: float = grace
+        self.interval: float = interval
+        self.janitor: bool = janitor
+
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, List[float]] = OrderedDict() # key -> [size, last access], least recent first
+        self._refs: Dict[str, int] = {}
+        self._size: int = 0
+        self._janitor: Optional[threading.Thread] = None
+        self._scan()
+
+    def _scan(self) -> None:
+        """ Index the files on disk that are not indexed yet, oldest access first """
+        files: List[Tuple[float, str, int]] = []
+        if self.root.exists():
+            for kind in self.root.iterdir():
+                if not kind.is_dir():
+                    continue
+                for entry in os.scandir(kind):
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        files.append((max(stat.st_atime, stat.st_mtime), f"{kind.name}/{entry.name}", stat.st_size))
+
+        with self._lock:
+            new_files = [file for file in sorted(files) if file[1] not in self._index]
+            for accessed, key, size in new_files:
+                self._index[key] = [size, accessed]
+                self._size += size
+            
+            # the index is ordered by access, the new files written by another process go to their place
+            if new_files and len(new_files) < len(self._index):
+                self._index = OrderedDict(sorted(self._index.items(), key=lambda item: item[1][1]))
+
+    @staticmethod
+    def _key(kind: str, filename: str) -> Optional[str]:
+        """ Return the key of the file, None if the name could escape the store """
+        if not filename or Path(filename).name != filename or Path(kind).name != kind or filename.startswith("."):
+            return None
+        return f"{kind}/{filename}"
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, data: bytes, kind: str, suffix: str) -> str:
+        """ Store the content and return its key, the file is written once per content """
+        key = f"{kind}/{hashlib.sha256(data).hexdigest()[:32]}{suffix}"
+        path = self.path(key)
+
+        with self._lock:
+            if key in self._index and path.exists():
+                self._touch(key)
+                return key
+
+        # write to a temporary name first, a reader never sees a partial file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{threading.get_ident()}")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if key not in self._index:
+                self._size += len(data)
+            self._index[key] = [len(data), time.time()]
+            self._index.move_to_end(key)
+
+        if self.janitor:
+            self.start_janitor()
+        return key
+
+    def _touch(self, key: str) -> None:
+        self._index[key][1] = time.time()
+        self._index.move_to_end(key)
+
+    def acquire(self, kind: str, filename: str) -> Optional[Path]:
+        """ Resolve a file and keep it until release, None if it is not in the store """
+        key = self._key(kind, filename)
+        if key is None:
+            return None
+
+        with self._lock:
+            path = self.path(key)
+            if not path.is_file():
+                self._index.pop(key, None)
+                return None
+            
+            # written by another process, the server process serves the files of the engine
+            if key not in self._index:
+                size = path.stat().st_size
+                self._index[key] = [size, time.time()]
+                self._size += size
+                
+            self._refs[key] = self._refs.get(key, 0) + 1
+            self._touch(key)
+
+        return self.path(key)
+
+    def release(self, kind: str, filename: str) -> None:
+        """ Release a file acquired for a download """
+        key = self._key(kind, filename)
+        with self._lock:
+            refs = self._refs.get(key, 0) - 1
+            if refs > 0:
+                self._refs[key] = refs
+            else:
+                self._refs.pop(key, None)
+
+    def sweep(self) -> int:
+        """ Evict the expired files, then the least recently used ones over the size budget """
+        now = time.time()
+        evicted: List[str] = []
+
+        with self._lock:
+            for key, (size, accessed) in list(self._index.items()):
+                if now - accessed < self.grace:
+                    break # the index is ordered by access, the rest is more recent
+                if key in self._refs:
+                    continue
+                if now - accessed > self.max_age or self._size > self.max_size:
+                    del self._index[key]
+                    self._size -= size
+                    evicted.append(key)
+
+        for key in evicted:
+            try:
+                self.path(key).unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"MediaStore: Failed to delete {key}: {e}")
+
+        if evicted:
+            logger.debug(f"MediaStore: Evicted {len(evicted)} files, {self._size / 1024 / 1024:.1f}MB in use.")
+        return len(evicted)
+
+    def _run_janitor(self, rescan: bool) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                if rescan:
+                    self._scan()
+                self.sweep()
+            except Exception as e:
+                logger.error(f"MediaStore: Janitor failed: {e}")
+
+    def start_janitor(self, rescan: bool = False) -> None:
+        """ Start the background janitor, once, rescan indexes the files written by other processes before each sweep """
+        if self._janitor is None:
+            self._janitor = threading.Thread(target=self._run_janitor, args=(rescan,), daemon=True, name="media-janitor")
+            self._janitor.start()
+
+media_store = MediaStore(
+    max_size=eva_configuration.get("MEDIA_MAX_SIZE", 512) * 1024 * 1024,
+    max_age=eva_configuration.get("MEDIA_MAX_AGE", 24) * 3600,
+    # the mobile server process serves the downloads, it runs the janitor
+    janitor=not (eva_configuration.get("SERVER_PROCESS", False) and str(eva_configuration.get("DEVICE")).upper() == "MOBILE")
+)
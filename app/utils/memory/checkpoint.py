@@ -0,0 +1,124 @@
+import json
+import sqlite3
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+from config import logger, eva_configuration
+
+class Checkpointer:
+    """
+    Checkpointer class to persist the conversation state in the memory database.
+
+    Only the serializable part of the EVA state is saved, one row per session (thread_id):
+    status, sense, action_results, num_conv and the session memory, including the summaries.
+    The model objects are rebuilt at startup and never persisted.
+
+    Attributes:
+        enabled (bool): Whether checkpointing is enabled in the configuration.
+    Examples:
+        >>> checkpointer.save("eva", state, memory.export_session())
+        >>> checkpointer.save_memory("eva", memory.export_session())  # after a summary
+        >>> checkpoint = checkpointer.load("eva")
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled: bool = enabled
+        self._dblink: Path = self._get_database_path()
+        self._table_ready: bool = False
+
+    @staticmethod
+    def _get_database_path() -> Path:
+        """Return the path to the memory log database."""
+        db_dir = Path(__file__).resolve().parents[2] / 'data' / 'database'
+        if not db_dir.exists():
+            db_dir.mkdir(parents=True)
+
+        return db_dir / 'eva.db'
+
+    def _create_checkpoint_table(self, conn: sqlite3.Connection) -> None:
+        """ Create the checkpoint table if it doesn't exist. """
+        if self._table_ready:
+            return
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT PRIMARY KEY,
+                status TEXT,
+                num_conv INTEGER,
+                sense TEXT,
+                action_results TEXT,
+                session_memory TEXT,
+                updated TEXT NOT NULL
+            )
+        ''')
+        self._table_ready = True
+
+    def save(self, thread_id: str, state: Dict[str, Any], session_memory: List[Dict]) -> None:
+        """ Save the checkpoint of a session, replacing the previous one """
+        if not self.enabled:
+            return
+
+        status = state.get("status")
+        try:
+            with sqlite3.connect(self._dblink) as conn:
+                self._create_checkpoint_table(conn)
+                conn.execute('''
+                    INSERT OR REPLACE INTO checkpoints (thread_id, status, num_conv, sense, action_results, session_memory, updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    thread_id,
+                    getattr(status, "value", status),
+                    state.get("num_conv", 0),
+                    json.dumps(state.get("sense") or {}, default=str),
+                    json.dumps(state.get("action_results") or [], default=str),
+                    json.dumps(session_memory, default=str),
+                    datetime.now().isoformat()
+                ))
+
+        except sqlite3.Error as e:
+            logger.error(f"Checkpointer: Failed to save checkpoint: {e}")
+
+    def save_memory(self, thread_id: str, session_memory: List[Dict]) -> None:
+        """ Update the session memory of the last checkpoint, the rest of the state is kept """
+        if not self.enabled:
+            return
+
+        try:
+            with sqlite3.connect(self._dblink) as conn:
+                self._create_checkpoint_table(conn)
+                conn.execute('''
+                    UPDATE checkpoints SET session_memory = ?, updated = ? WHERE thread_id = ?
+                ''', (json.dumps(session_memory, default=str), datetime.now().isoformat(), thread_id))
+
+        except sqlite3.Error as e:
+            logger.error(f"Checkpointer: Failed to save the session memory: {e}")
+
+    def load(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """ Load the last checkpoint of a session, None if there is none """
+        if not self.enabled:
+            return None
+
+        try:
+            with sqlite3.connect(self._dblink) as conn:
+                self._create_checkpoint_table(conn)
+                row = conn.execute('''
+                    SELECT status, num_conv, sense, action_results, session_memory FROM checkpoints WHERE thread_id = ?
+                ''', (thread_id,)).fetchone()
+
+        except sqlite3.Error as e:
+            logger.error(f"Checkpointer: Failed to load checkpoint: {e}")
+            return None
+
+        if not row:
+            return None
+
+        status, num_conv, sense, action_results, session_memory = row
+        return {
+            "status": status,
+            "num_conv": num_conv,
+            "sense": json.loads(sense),
+            "action_results": json.loads(action_results),
+            "session_memory": json.loads(session_memory)
+        }
+
+checkpointer = Checkpointer(eva_configuration.get("CHECKPOINT", False))
@@ -1,10 +1,11 @@
-from config import logger
+from config import logger, tracer
 from threading import Thread
 from typing import List, Dict, Optional
 import json
 
 from utils.agent import SmallAgent
 from utils.memory.memlog import MemoryLogger
+from utils.memory.checkpoint import checkpointer
 
 class Memory:
     """
@@ -17,6 +18,7 @@ class Memory:
     Attributes:
         model_name (str): Name of the model used for memory summarization.
         base_url (str): Base URL of the API endpoint for the summarization model.
+        session_id (str): The conversation the memory belongs to, used to checkpoint it.
         _session_memory (List[Dict]): List of memory entries for the current session.
         _memory_thread (Optional[Thread]): Background thread for asynchronous memory operations.
         _summarizer (SmallAgent): Agent instance used for summarizing conversation history.
@@ -25,6 +27,7 @@ class Memory:
     Args:
         model_name (str): The name of the model to use for memory summarization.
         base_url (str): The base URL for the API endpoint.
+        session_id (str): The conversation the memory belongs to. Default is "eva".
 
     Examples:
         >>> memory = Memory(model_name="chatgpt", base_url="http://api.example.com")
@@ -36,7 +39,8 @@ class Memory:
         ConnectionError: If unable to connect to the database or API endpoint.
     """
     
-    def __init__(self, model_name: str, base_url: str):
+    def __init__(self, model_name: str, base_url: str, session_id: str = "eva"):
+        self.session_id: str = session_id
         self._session_memory: List[Dict] = []
         self._memory_thread: Optional[Thread] = None
         
@@ -64,37 +68,6 @@ class Memory:
         if self._memory_thread and self._memory_thread.is_alive():
             self._memory_thread.join()
         
-        self._memory_thread = Thread(target=self._save_memory, daemon=True, kwargs={
-            "timestamp": timestamp, 
-            "user_name": user_name,
-            "user_message": user_message,
-            "eva_message": eva_message,
-            "observation": observation,
-            "analysis": analysis,
-            "strategy": strategy,
-            "premeditation": premeditation,
-            "action": action 
-            })
-    
-        self._memory_thread.start()
-    
-    def _save_memory(self, 
-                     timestamp: str, 
-                     user_name: str, 
-                     user_message: str, 
-                     eva_message: str, 
-                     observation: str, 
-                     analysis: str, 
-                     strategy: str, 
-                     premeditation: str, 
-                     action: str
-                    ) -> None:
-        
-        """
-        Create a single entry of memory. timestamp, user_name, user_message, speech, sight, analysis, strategy, expectation
-        save it to the database and if the conversation is more than 10, summarize them.
-        """  
-        
         entry = {
             "time": timestamp,
             "user_name": user_name,
@@ -107,13 +80,28 @@ class Memory:
             "action": action
         }
         
+        # the entry is in the session right away, a checkpoint of the answered turn includes it
+        self._session_memory = [*self._session_memory, entry]
+        
+        self._memory_thread = Thread(target=tracer.bind(self._save_memory, entry), daemon=True)
+        self._memory_thread.start()
+    
+    @tracer.trace("memory_save")
+    def _save_memory(self, entry: Dict) -> None:
+        """
+        Save a single entry of memory to the database and if the conversation is more than 10, summarize them.
+        The entry holds timestamp, user_name, user_message, speech, sight, analysis, strategy, expectation.
+        """  
+        
         self._memory_logger.save_memory_to_db(entry)
-        self._session_memory.append(entry)
         
         if len(self._session_memory) > 10:
             summary_entry = self._pack_memory()
-            self._session_memory = self._session_memory[5:]
-            self._session_memory.insert(0, summary_entry)
+            # swapped in one assignment, a snapshot sees the session either before or after the summary
+            self._session_memory = [summary_entry, *self._session_memory[5:]]
+            
+            # the answered turn was checkpointed before the summary, a restart must not summarize again
+            checkpointer.save_memory(self.session_id, self.export_session())
             
     def _pack_memory(self) -> List[Dict]:
         """pack the first 5 memory for summarization"""
@@ -136,6 +124,14 @@ class Memory:
             "premeditation": None
         }
         
+    def export_session(self) -> List[Dict]:
+        """Return a snapshot of the session memory, without waiting for a summarization in progress."""
+        return list(self._session_memory)
+    
+    def restore_session(self, session_memory: List[Dict]) -> None:
+        """Restore the session memory from a checkpoint, the summaries are kept as they are."""
+        self._session_memory = list(session_memory)
+        
     def remember(self, time: str = None) -> Optional[Dict]:
         """Return a single entry of memory."""
         for memory in self._session_memory:
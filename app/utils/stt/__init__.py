@@ -1,3 +1,9 @@
-from .transcriber import Transcriber
-from .listener import PCListener
-from .voiceid import VoiceIdentifier
+from utils.lazy import lazy_import
+
+__getattr__ = lazy_import(__name__, {
+    "Transcriber": ".transcriber",
+    "PCListener": ".listener",
+    "VoiceIdentifier": ".voiceid",
+    "VoiceMonitor": ".monitor",
+    "IncrementalTranscriber": ".incremental",
+})
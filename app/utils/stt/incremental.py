@@ -0,0 +1,126 @@
+from config import logger, tracer
+import threading
+from queue import Queue
+from typing_extensions import List, Optional
+
+import numpy as np
+
+from utils.stt.transcriber import Transcriber
+
+class IncrementalTranscriber:
+    """
+    Incremental transcription of an utterance streamed in chunks, for the mobile client.
+
+    The chunks are appended to a growing 16kHz buffer while the user is talking. Each time
+    segment_time seconds of audio are pending, the segment is cut at the quietest frame of its
+    last search_time seconds and transcribed, the text is committed. When the utterance is over
+    only the remaining tail is transcribed, while the speaker is identified on the whole audio.
+    Works with every backend of the Transcriber: rolling windows for faster-whisper, chunked
+    calls for the remote ones.
+
+    Attributes:
+        transcriber: The shared transcriber, segments go through transcribe_clip, the speaker through its identifier.
+        segment_time (float): Seconds of audio pending before a segment is committed.
+        search_time (float): Seconds at the end of a segment searched for a pause to cut at.
+    Examples:
+        >>> stream = IncrementalTranscriber(transcriber)
+        >>> stream.append(samples)
+        >>> if stream.ready: stream.step()  # on a worker thread
+        >>> content, language = stream.finish()
+    """
+
+    SAMPLE_RATE = 16000
+    FRAME_SIZE = 320 # 20ms frames to search for the pause
+
+    def __init__(self, transcriber: Transcriber, segment_time: float = 4.0, search_time: float = 1.0):
+        self.transcriber: Transcriber = transcriber
+        self.segment_time: float = segment_time
+        self.search_time: float = search_time
+
+        self._chunks: List[np.ndarray] = []
+        self._buffer: np.ndarray = np.zeros(0, dtype=np.float32)
+        self._size: int = 0
+        self._committed: int = 0 # samples already transcribed
+        self._texts: List[str] = []
+        self._language: Optional[str] = None
+
+        self._lock = threading.Lock() # guards the chunks, append runs on the server loop
+        self._step_lock = threading.Lock() # one transcription at a time, in order
+
+    @property
+    def ready(self) -> bool:
+        """ Whether a segment can be committed """
+        return self._size - self._committed >= self.segment_time * self.SAMPLE_RATE
+
+    def append(self, samples: np.ndarray) -> None:
+        """ Append a chunk of 16kHz samples """
+        with self._lock:
+            self._chunks.append(samples)
+            self._size += len(samples)
+
+    def _audio(self) -> np.ndarray:
+        """ Return the buffered audio, joining the new chunks """
+        with self._lock:
+            if self._chunks:
+                self._buffer = np.concatenate([self._buffer, *self._chunks])
+                self._chunks = []
+            return self._buffer
+
+    def _find_pause(self, audio: np.ndarray, start: int, end: int) -> int:
+        """ Return the position of the quietest frame between start and end """
+        frames = (end - start) // self.FRAME_SIZE
+        if frames < 1:
+            return end
+
+        energy = np.square(audio[start:start + frames * self.FRAME_SIZE]).reshape(frames, self.FRAME_SIZE).mean(axis=1)
+        return start + int(np.argmin(energy)) * self.FRAME_SIZE + self.FRAME_SIZE // 2
+
+    def _transcribe(self, audioclip: np.ndarray) -> Optional[str]:
+        """ Transcribe a segment, the speaker is identified once on the whole utterance """
+        transcription, language = self.transcriber.transcribe_clip(audioclip)
+
+        if language:
+            self._language = language
+        return transcription.strip() if transcription else None
+
+    def step(self) -> None:
+        """ Commit the complete segments, called on a worker thread while the user is talking """
+        with self._step_lock:
+            audio = self._audio()
+            segment = int(self.segment_time * self.SAMPLE_RATE)
+            search = int(self.search_time * self.SAMPLE_RATE)
+
+            while len(audio) - self._committed >= segment:
+                end = self._committed + segment
+                cut = self._find_pause(audio, end - search, end)
+                transcription = self._transcribe(audio[self._committed:cut])
+                if transcription:
+                    self._texts.append(transcription)
+                self._committed = cut
+
+    def finish(self) -> tuple[Optional[str], Optional[str]]:
+        """ Transcribe the tail and identify the speaker, return the content and the language """
+        with self._step_lock:
+            audio = self._audio()
+            if not len(audio):
+                return None, None
+
+            name_queue = Queue()
+            thread = threading.Thread(target=tracer.bind(self.transcriber.identifier.identify, audio, name_queue))
+            thread.start()
+
+            tail = audio[self._committed:]
+            if len(tail) >= self.FRAME_SIZE:
+                transcription = self._transcribe(tail)
+                if transcription:
+                    self._texts.append(transcription)
+            self._committed = len(audio)
+
+            identification = name_queue.get()
+            thread.join()
+
+        if not self._texts:
+            return None, None
+
+        logger.debug(f"IncrementalTranscriber: {len(self._texts)} segments, {len(audio) / self.SAMPLE_RATE:.1f}s of audio.")
+        return self.transcriber.format_transcription(" ".join(self._texts), identification), self._language or self.transcriber.language
@@ -1,5 +1,6 @@
 from config import logger
 from typing_extensions import Optional
+import numpy as np
 import soundfile as sf
 from pathlib import Path
 
@@ -20,11 +21,15 @@ class PCListener:
         self.microphone: Microphone = Microphone()
         self.transcriber: Transcriber = Transcriber(model_name, language)
 
-    def listen(self, save_file: str=None) -> Optional[tuple[str, str]]:  
-        """ listening to microphone and transcribing it. / for PC use only """
+    def listen(self, save_file: str=None, audio: Optional[np.ndarray]=None) -> Optional[tuple[str, str]]:  
+        """ listening to microphone and transcribing it, start with the given audio if any. / for PC use only """
         
         while True:
-            audio_data = self.microphone.listen()
+            if audio is not None: # the phrase captured while the user interrupted EVA
+                audio_data, audio = audio, None
+            else:
+                audio_data = self.microphone.listen()
+                
             if audio_data is None:
                 logger.warning("Listener: Speech audio data is not valid. Back to listening.")
                 continue
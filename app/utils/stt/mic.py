@@ -1,6 +1,8 @@
 from config import logger
 from datetime import datetime
-from typing_extensions import Optional
+from collections import deque
+from threading import Event
+from typing_extensions import Optional, Callable
 
 import numpy as np
 import speech_recognition as sr
@@ -27,6 +29,11 @@ class Microphone:
         phrase_time_limit (int): 
             Maximum duration in seconds allowed for a single phrase.
             Helps manage input token usage by limiting very long inputs.
+        barge_in_threshold (int):
+            Energy level the user's voice must exceed to interrupt EVA while she is speaking.
+            It is set high so EVA's own voice from the speakers does not trigger it.
+        onset_time (float):
+            Seconds of continuous speech required to interrupt EVA.
         
     Examples:
         >>> # Initialize microphone and start listening
@@ -43,6 +50,8 @@ class Microphone:
         self.max_listen_time = 300 # Listen for 5 minutes maximum
         self.speech_limit = 60  # Speak for 1 minute maximum
         self.phrase_time_limit = 1 # for shorter sentence 
+        self.barge_in_threshold = 2000
+        self.onset_time = 0.3
 
     def detect(self)->bool:
         """ Detect if there is any speech """
@@ -86,4 +95,52 @@ class Microphone:
             
             except Exception as e:
                 logger.error(f"Listener: Failed to listen to audio: {str(e)}")
-                return None
\ No newline at end of file
+                return None
+    
+    def monitor(self, stop: Event, on_speech: Callable[[], None]) -> Optional[np.ndarray]:
+        """
+        Voice activity detection while EVA is speaking.
+        
+        Reads the microphone chunk by chunk and calls on_speech as soon as the user's voice is
+        loud enough for onset_time, then captures the rest of the phrase until the pause threshold.
+
+        Returns:
+            Optional[np.ndarray]: The captured phrase, None if stopped before any speech.
+        """
+        
+        with self.microphone as source:
+            chunk_time = source.CHUNK / source.SAMPLE_RATE
+            onset_chunks = max(1, int(self.onset_time / chunk_time))
+            pause_chunks = int(self.recognizer.pause_threshold / chunk_time)
+            limit_chunks = int(self.speech_limit / chunk_time)
+            
+            preroll = deque(maxlen=onset_chunks * 2) # keep the start of the phrase
+            frames = []
+            loud = quiet = 0
+            
+            while frames or not stop.is_set():
+                buffer = source.stream.read(source.CHUNK)
+                samples = np.frombuffer(buffer, dtype=np.int16).astype(np.float32)
+                energy = np.sqrt(np.mean(samples ** 2)) if samples.size else 0.0
+                
+                # waiting for the onset of the speech
+                if not frames:
+                    preroll.append(buffer)
+                    loud = loud + 1 if energy > self.barge_in_threshold else 0
+                    if loud >= onset_chunks:
+                        frames = list(preroll)
+                        on_speech()
+                    continue
+                
+                # capture until the user pauses
+                frames.append(buffer)
+                quiet = quiet + 1 if energy <= self.barge_in_threshold else 0
+                if quiet >= pause_chunks or len(frames) >= limit_chunks:
+                    break
+            
+            if not frames:
+                return None
+            
+            audio_buffer = sr.AudioData(b"".join(frames), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+            raw_data = np.frombuffer(audio_buffer.get_raw_data(convert_rate=16000), dtype=np.int16)
+            return raw_data.astype(np.float32) / 32768.0
@@ -0,0 +1,70 @@
+from config import logger
+from threading import Thread, Event
+from typing_extensions import Optional, Callable
+
+import numpy as np
+
+from utils.stt.mic import Microphone
+
+class VoiceMonitor:
+    """
+    Voice activity monitor running while EVA is speaking, for barge-in on the desktop.
+
+    The monitor listens on the microphone in a background thread. When the user starts talking
+    the on_speech callback stops EVA right away and the interrupted event is set, the phrase is
+    captured and handed to the listener once the user pauses.
+
+    Attributes:
+        microphone: The microphone shared with the listener.
+        interrupted: Set when the user interrupted EVA, until the monitor is started again.
+    Examples:
+        >>> monitor = VoiceMonitor(listener.microphone)
+        >>> monitor.start(on_speech=speaker.interrupt)
+        >>> audio = monitor.stop()  # the interruption, or None
+    """
+
+    def __init__(self, microphone: Microphone):
+        self.microphone: Microphone = microphone
+        self.interrupted: Event = Event()
+
+        self._stop: Event = Event()
+        self._thread: Optional[Thread] = None
+        self._audio: Optional[np.ndarray] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, on_speech: Callable[[], None]) -> None:
+        """ Start monitoring the microphone, unless it is already running """
+        if self.running:
+            return
+
+        self._stop.clear()
+        self.interrupted.clear()
+        self._audio = None
+
+        def speech_detected() -> None:
+            logger.info("VoiceMonitor: The user is interrupting.")
+            self.interrupted.set()
+            on_speech()
+
+        def monitor() -> None:
+            try:
+                self._audio = self.microphone.monitor(self._stop, speech_detected)
+            except Exception as e:
+                logger.error(f"VoiceMonitor: Failed to monitor the microphone: {str(e)}")
+
+        self._thread = Thread(target=monitor, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Optional[np.ndarray]:
+        """ Stop monitoring and release the microphone, return the audio of the interruption if any """
+        if self._thread is None:
+            return None
+
+        self._stop.set()
+        self._thread.join() # if the user is talking, wait until the phrase is captured
+        self._thread = None
+
+        return self._audio
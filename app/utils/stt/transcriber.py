@@ -1,4 +1,4 @@
-from config import logger
+from config import logger, tracer
 import os
 from datetime import datetime
 import threading
@@ -6,8 +6,6 @@ import secrets
 from queue import Queue
 from typing import Dict, Optional, Callable
 
-from utils.stt.voiceid import VoiceIdentifier
-
 class Transcriber:
     """
     The Transcriber class is responsible for transcribing audio clips using different models.
@@ -18,19 +16,20 @@ class Transcriber:
         _model_selection (str): The selected model name.
         model: The initialized transcription model instance.
         identifier: The initialized voice identifier instance.
-        name_queue: A queue to store the speaker identification results.
     Examples:
         >>> transcriber = Transcriber(model_name="faster-whisper")
         >>> transcription, language = transcriber.transcribe(audioclip)
+        >>> text, language = transcriber.transcribe_clip(segment)  # no speaker identification
     """
     
     def __init__(self, model_name: str = "faster-whisper", language: str = "en"):
         self._model_selection: str = model_name.upper()
         self._model_language: str = language
         
+        from utils.stt.voiceid import VoiceIdentifier # loads wespeaker and torch
+        
         self.model = self._initialize_model()
         self.identifier = VoiceIdentifier()
-        self.name_queue = Queue()
         
         logger.info(f"Transcriber: {self._model_selection} is ready.")
     
@@ -76,25 +75,39 @@ class Transcriber:
         
         return model()
     
+    @property
+    def language(self) -> str:
+        """ The configured language, used when the model does not detect one """
+        return self._model_language
+    
+    def transcribe_clip(self, audioclip) -> tuple[Optional[str], Optional[str]]:
+        """ Transcribe a raw audio clip with the model only, return the text and the detected language """
+        
+        with tracer.span("stt", model=self._model_selection, samples=len(audioclip)):
+            return self.model.transcribe_audio(audioclip)
 
     def transcribe(self, audioclip) -> Optional[tuple[str, str]]:  
         """ Transcribe the given audio clip and identify the speaker """
         
-        while not self.name_queue.empty(): # Clear queue 
-            self.name_queue.get()
-        
-        thread = threading.Thread(target=self.identifier.identify, args=(audioclip, self.name_queue))
+        name_queue = Queue() # one queue per call, the transcriber can be shared between sessions
+        thread = threading.Thread(target=tracer.bind(self.identifier.identify, audioclip, name_queue))
         thread.start()
         
-        transcription, language = self.model.transcribe_audio(audioclip)
+        with tracer.span("stt", model=self._model_selection):
+            transcription, language = self.model.transcribe_audio(audioclip)
         if not transcription:
             thread.join()
             return None, None
         
         # Get the speaker identification result
-        identification = self.name_queue.get()   
+        identification = name_queue.get()   
         thread.join()
         
+        return self.format_transcription(transcription, identification), language
+    
+    def format_transcription(self, transcription: str, identification: str) -> str:
+        """ Format the transcription with the identified speaker """
+        
         # if the name is unknown, return content with a new line, there is a new person speaking, save it into a database
         if identification == "unknown":
             content = f": <human_reply>{transcription.strip()}</human_reply> (I couldn't identify the voice.)"
@@ -111,4 +124,4 @@ class Transcriber:
 
         print(f"({datetime.now().strftime('%H:%M:%S')}) {display}")
         
-        return content, language
+        return content
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from config import logger
+from config import logger, tracer
 from queue import Queue
 from typing import Dict
 
@@ -85,6 +85,7 @@ class VoiceIdentifier:
         else:
             return "unknown"
     
+    @tracer.trace("voice_id")
     def identify(self, audioclip: np.ndarray, name_queue: Queue) -> None:
         """
         Voice identification using wespeaker cli. 
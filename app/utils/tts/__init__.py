@@ -1,2 +1,6 @@
-from .audio_player import AudioPlayer
-from .speaker import Speaker
\ No newline at end of file
+from utils.lazy import lazy_import
+
+__getattr__ = lazy_import(__name__, {
+    "AudioPlayer": ".audio_player",
+    "Speaker": ".speaker",
+})
@@ -23,6 +23,7 @@ class AudioPlayer:
     play_audio: Play audio data from a file or numpy array.
     play_mp3_stream: Play an mp3 stream.
     stream: Stream an mp3 url.
+    stop: Stop the speech playback.
     
     """
     def __init__(self):
@@ -100,6 +101,15 @@ class AudioPlayer:
         except Exception as e:
             raise Exception(f"Error: Failed to play OpenAI stream: {e}")
 
+    def stop(self) -> None:
+        """Stop the speech playback right away, the music stream keeps playing"""
+        try:
+            sd.stop()
+            self.player.stop()
+            
+        except Exception as e:
+            raise Exception(f"Error: Failed to stop playback: {e}")
+
     def __del__(self) -> None:
         if self._audio_thread and self._audio_thread.is_alive():
             self._audio_thread.join()
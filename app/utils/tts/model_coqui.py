@@ -1,10 +1,9 @@
-from config import logger
-import os
+from config import logger, tracer
 import time
 from threading import Thread
-import secrets
 from typing import Optional, List
 from queue import Queue, Empty
+from io import BytesIO
 
 from TTS.api import TTS
 import nltk
@@ -29,6 +28,7 @@ class CoquiSpeaker:
         play: Play the audio.
         eva_speak: Speak the given text using Coqui TTS.
         stop_playback: Stop the playback.
+        interrupt: Stop speaking right away and drop the pending sentences.
         generate_audio: Generate audio files from text using Coqui TTS.
     """
     
@@ -39,6 +39,7 @@ class CoquiSpeaker:
         self.device: str = "cuda" if cuda.is_available() else "cpu"
         
         self.audio_queue: Queue = Queue()    
+        self._interrupted: bool = False
         self.model: TTS = self._initialize_TTS()
         self.player: AudioPlayer = AudioPlayer()
 
@@ -87,41 +88,63 @@ class CoquiSpeaker:
             self.play_thread = Thread(target=self.play, daemon=True)
             self.play_thread.start()
                     
-        for sentence in sentences:
-            wav = self._generate_speech(sentence, language)
+        for index, sentence in enumerate(sentences):
+            if self._interrupted:
+                break
+            
+            with tracer.span("tts_first_audio" if index == 0 else "tts_sentence", model="coqui"):
+                wav = self._generate_speech(sentence, language)
+            if self._interrupted: # the user barged in during the synthesis
+                break
             self.audio_queue.put(wav)
         
         if wait:
             self.audio_queue.put(None)
             self.stop_playback()
     
+    def interrupt(self) -> None:
+        """ Stop speaking right away and drop the pending sentences """
+        self._interrupted = True
+        
+        ended = False
+        while True:
+            try:
+                ended = self.audio_queue.get_nowait() is None or ended
+            except Empty:
+                break
+        
+        if ended: # keep the end of speech mark, eva_speak is waiting for the play thread
+            self.audio_queue.put(None)
+            
+        self.player.stop()
+        
+    def resume(self) -> None:
+        """ Speak again after an interruption, when a new response starts """
+        self._interrupted = False
+        
     def stop_playback(self) -> None:
         if self.play_thread:
             self.play_thread.join()
             self.play_thread = None
         
-    def generate_audio(self, text: str, media_folder: str) -> Optional[str]:
+    def generate_audio(self, text: str, language: Optional[str] = None) -> Optional[bytes]:
         """ Generate mp3 from text using Coqui TTS """
-        audio_files = []
         try:
             sentences = nltk.sent_tokenize(text)
-            for sentence in sentences:
-                wav = self._generate_speech(sentence)
-                audio_data = (np.array(wav) * 32767).astype(np.int16)
-                filename = f"{secrets.token_hex(16)}.mp3"
-                
-                # Create AudioSegment from raw audio data
-                audio = AudioSegment(
-                    audio_data.tobytes(),
-                    frame_rate=22050,
-                    sample_width=2,
-                    channels=1
-                )
-                file_path = os.path.join(media_folder, "audio", filename)
-                audio.export(file_path, format="mp3")
-                audio_files.append(f"audio/{filename}")
-                                
-            return audio_files
+            wav = np.concatenate([np.array(self._generate_speech(sentence, language)) for sentence in sentences])
+            audio_data = (wav * 32767).astype(np.int16)
+            
+            # Create AudioSegment from raw audio data
+            audio = AudioSegment(
+                audio_data.tobytes(),
+                frame_rate=22050,
+                sample_width=2,
+                channels=1
+            )
+            mp3_buffer = BytesIO()
+            audio.export(mp3_buffer, format="mp3")
+            
+            return mp3_buffer.getvalue()
     
         except Exception as e:
             logger.error(f"Error during text to speech synthesis: {e}")
@@ -1,17 +1,52 @@
-from config import logger
-import os
+from config import logger, tracer
+import subprocess
 from threading import Thread
-import secrets
-from typing import Optional
+from typing import Optional, Iterator
 
 from elevenlabs.client import ElevenLabs
-from elevenlabs import stream, VoiceSettings
+from elevenlabs import VoiceSettings
     
 class ElevenLabsSpeaker:
     def __init__(self, voice: str = "TbMNBJ27fH2U0VgpSNko") -> None:
         self.model: ElevenLabs = ElevenLabs()
         self.audio_thread: Optional[Thread] = None
         self.voice: str = voice # voice could be configured in the future
+        self._process: Optional[subprocess.Popen] = None
+        self._interrupted: bool = False
+        
+    def _stream(self, audio_stream: Iterator[bytes]) -> None:
+        """ Play the mp3 stream through mpv, same as elevenlabs.stream but the player can be interrupted """
+        
+        self._process = subprocess.Popen(
+            ["mpv", "--no-cache", "--no-terminal", "--", "fd://0"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        
+        try:
+            for chunk in audio_stream:
+                if self._interrupted:
+                    break
+                if chunk:
+                    self._process.stdin.write(chunk)
+                    self._process.stdin.flush()
+            
+            self._process.stdin.close()
+            self._process.wait()
+            
+        except (BrokenPipeError, ValueError): # the player was killed by interrupt
+            pass
+        
+    def interrupt(self) -> None:
+        """ Stop speaking right away """
+        self._interrupted = True
+        if self._process and self._process.poll() is None:
+            self._process.kill()
+            
+    def resume(self) -> None:
+        """ Speak again after an interruption, when a new response starts """
+        self._interrupted = False
         
     def eva_speak(self, text: str, language: Optional[str] = None, wait: bool = True) -> None:
         """ Speak the given text using ElevenLabs """
@@ -32,30 +67,25 @@ class ElevenLabsSpeaker:
                     use_speaker_boost=True
                 )
             )
+            audio_stream = tracer.first_item("tts_first_audio", audio_stream, model="elevenlabs")
             
             if self.audio_thread and self.audio_thread.is_alive():
                 self.audio_thread.join()
                 
             if wait:
-                stream(audio_stream)
+                self._stream(audio_stream)
             else:   
-                self.audio_thread = Thread(target=lambda: stream(audio_stream), daemon=True)
+                self.audio_thread = Thread(target=tracer.bind(self._stream, audio_stream), daemon=True)
                 self.audio_thread.start()
 
         except Exception as e:
             logger.error(f"Error during text to speech synthesis: {e}")
             
-    def generate_audio(self, text: str, language: Optional[str], media_folder: str) -> Optional[str]:
+    def generate_audio(self, text: str, language: Optional[str] = None) -> Optional[bytes]:
         """ Generate mp3 from text using ElevenLabs """
         
         model_name: str = "eleven_monolingual_v1" if language == "en" else "eleven_turbo_v2_5"
         
-        filename = f"{secrets.token_hex(16)}.mp3"
-        file_path = os.path.join(media_folder, "audio", filename)
-        
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
         try:
             audio_stream = self.model.generate(
                 model=model_name,
@@ -64,16 +94,7 @@ class ElevenLabsSpeaker:
                 voice=self.voice
             )
         
-            with open(file_path, 'wb') as f:
-                audio_data = b''
-                for chunk in audio_stream:
-                    audio_data += chunk
-                f.write(audio_data)
-            
-            # Log the file path for debugging
-            logger.info(f"Audio file saved to: {file_path}")
-            
-            return f"audio/{filename}"
+            return b"".join(audio_stream)
         
         except Exception as e:
             logger.error(f"Error during text to speech synthesis: {e}")
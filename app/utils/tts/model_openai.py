@@ -1,7 +1,5 @@
-from config import logger
-import os
+from config import logger, tracer
 from threading import Thread
-import secrets
 from typing import Optional
 
 from openai import OpenAI
@@ -17,7 +15,9 @@ class OpenAISpeaker:
         player_stream (PyAudio): The audio stream.
     Methods:
         eva_speak: Speak the given text using OpenAI.
-        generate_audio: Generate audio files from text using OpenAI TTS.
+        interrupt: Stop speaking right away.
+        resume: Speak again after an interruption, when a new response starts.
+        generate_audio: Generate mp3 audio from text using OpenAI TTS.
     """
     
     def __init__(self, voice: str = "nova") -> None:
@@ -25,17 +25,19 @@ class OpenAISpeaker:
         self.audio_player: AudioPlayer = AudioPlayer()
         self.voice: str = voice  # default OpenAI voice
         self.audio_thread: Optional[Thread] = None
+        self._interrupted: bool = False
             
     def eva_speak(self, text: str, language: Optional[str] = None, wait: bool = True) -> None:
         """ Speak the given text using OpenAI """  
                                 
         try:
-            response = self.model.audio.speech.create(
-                model="tts-1",
-                voice=self.voice,
-                response_format="mp3",
-                input=text
-            )
+            with tracer.span("tts_first_audio", model="openai"):
+                response = self.model.audio.speech.create(
+                    model="tts-1",
+                    voice=self.voice,
+                    response_format="mp3",
+                    input=text
+                )
    
         except Exception as e:
             logger.error(f"Error during text to speech synthesis: {e}")
@@ -43,6 +45,9 @@ class OpenAISpeaker:
         
         if self.audio_thread and self.audio_thread.is_alive():
             self.audio_thread.join()
+            
+        if self._interrupted: # the user barged in while the speech was synthesized
+            return None
 
         if wait:
             self.audio_player.play_openai_stream(response)
@@ -50,11 +55,17 @@ class OpenAISpeaker:
             self.audio_thread = Thread(target=lambda: self.audio_player.play_openai_stream(response), daemon=True)
             self.audio_thread.start()
                 
-    def generate_audio(self, text: str, media_folder: str) -> Optional[str]:
-        """ Generate mp3 from text using OpenAI TTS """
+    def interrupt(self) -> None:
+        """ Stop speaking right away """
+        self._interrupted = True
+        self.audio_player.stop()
         
-        filename = f"{secrets.token_hex(16)}.mp3"
-        file_path = os.path.join(media_folder, "audio", filename)
+    def resume(self) -> None:
+        """ Speak again after an interruption, when a new response starts """
+        self._interrupted = False
+                
+    def generate_audio(self, text: str, language: Optional[str] = None) -> Optional[bytes]:
+        """ Generate mp3 from text using OpenAI TTS """
         
         try:
             response = self.model.audio.speech.create(
@@ -64,10 +75,7 @@ class OpenAISpeaker:
                 input=text
             )
             
-            with open(file_path, 'wb') as f:
-                response.write_to_file(file_path)
-            
-            return f"audio/{filename}"
+            return response.content
         
         except Exception as e:
             logger.error(f"Error during text to speech synthesis: {e}")
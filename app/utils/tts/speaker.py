@@ -1,7 +1,10 @@
 from datetime import datetime
-from config import logger
+from config import logger, tracer
+from threading import Thread
+from queue import Queue, Empty
 from typing import Dict, Callable, Optional
-from pathlib import Path
+
+from utils.media import media_store
 
 class Speaker:
     """
@@ -16,14 +19,20 @@ class Speaker:
         _initialize_model: Initialize the selected speaker model.
         _get_model_factory: Get the model factory dictionary.
         speak: Speak the given text using the selected speaker model.
+        speak_stream: Queue a sentence of a streamed response to be spoken in order.
+        wait_stream: Wait until all the queued sentences are spoken.
+        interrupt: Stop speaking and drop the queued sentences, when the user barges in.
+        resume: Speak again after an interruption, when a new response starts.
     """
     
     def __init__(self, speaker_model: str = "coqui", language: str = "en"):
         self._model_selection: str = speaker_model.upper()
-        self._media_folder: str = self._get_data_path()
         self._language: str = language
         self.model = self._initialize_model()
         
+        self._sentence_queue: Queue = Queue()
+        self._stream_thread: Optional[Thread] = None
+        
         logger.info(f"Speaker: {self._model_selection} is ready.")
     
     def _get_model_factory(self) -> Dict[str, Callable]:
@@ -73,16 +82,63 @@ class Speaker:
         """ Speak the given text using the selected speaker model """
         try:
             print(f"\n({datetime.now().strftime('%H:%M:%S')}) EVA: {answer}")
-            self.model.eva_speak(answer, language, wait)
+            with tracer.span("tts", model=self._model_selection):
+                self.model.eva_speak(answer, language, wait)
             
         except Exception as e:
             raise Exception(f"Error: Failed to speak {str(e)} ")
         
-    def get_audio(self, text: str) -> str:
-        """ Generate audio from text and save it to the media folder """
-        return self.model.generate_audio(text, self._language, self._media_folder)
+    def _speak_sentence(self, sentence: str, language: Optional[str]) -> None:
+        with tracer.span("tts", model=self._model_selection, streamed=True):
+            self.model.eva_speak(sentence, language, True)
+        
+    def _play_stream(self) -> None:
+        """ Speak the queued sentences one by one """
+        while True:
+            speak = self._sentence_queue.get()
+            try:
+                speak()
+            except Exception as e:
+                logger.error(f"Error: Failed to speak streamed sentence: {str(e)}")
+            finally:
+                self._sentence_queue.task_done()
     
-    def _get_data_path(self) -> Path:
-        """Return the path to the voice database."""
-        return Path(__file__).resolve().parents[2] / 'data' / 'media'
+    def speak_stream(self, sentence: str, language: Optional[str] = "en") -> None:
+        """ Queue a single sentence of a streamed response, it is spoken as soon as the previous one is done """
+        if self._stream_thread is None:
+            self._stream_thread = Thread(target=self._play_stream, daemon=True)
+            self._stream_thread.start()
+        
+        print(f"\n({datetime.now().strftime('%H:%M:%S')}) EVA: {sentence}")
+        self._sentence_queue.put(tracer.bind(self._speak_sentence, sentence, language)) # spoken in the trace of the turn
+    
+    def wait_stream(self) -> None:
+        """ Wait until all the queued sentences are spoken """
+        self._sentence_queue.join()
+        
+    def interrupt(self) -> None:
+        """ Stop speaking right away and drop the queued sentences, when the user barges in """
+        while True:
+            try:
+                self._sentence_queue.get_nowait()
+                self._sentence_queue.task_done()
+            except Empty:
+                break
+            
+        try:
+            self.model.interrupt()
+        except Exception as e:
+            logger.error(f"Error: Failed to interrupt the speech: {str(e)}")
+            
+    def resume(self) -> None:
+        """ Let the model speak again after a barge-in, called once per turn before the new response """
+        if hasattr(self.model, "resume"):
+            self.model.resume()
+        
+    def get_audio(self, text: str, language: Optional[str] = None) -> Optional[str]:
+        """ Generate audio from text and keep it in the media store, return its path for the download endpoint """
+        with tracer.span("tts", model=self._model_selection, file=True):
+            audio = self.model.generate_audio(text, language or self._language)
+            
+        return media_store.put(audio, "audio", ".mp3") if audio else None
         
\ No newline at end of file
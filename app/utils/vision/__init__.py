@@ -1,4 +1,8 @@
-from .watcher import Watcher
-from .identifier import Identifier
-from .webcam import Webcam
-from .describer import Describer
\ No newline at end of file
+from utils.lazy import lazy_import
+
+__getattr__ = lazy_import(__name__, {
+    "Watcher": ".watcher",
+    "Identifier": ".identifier",
+    "Webcam": ".webcam",
+    "Describer": ".describer",
+})
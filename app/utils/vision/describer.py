@@ -1,4 +1,4 @@
-from config import logger
+from config import logger, tracer
 import numpy as np
 import base64
 import threading
@@ -6,9 +6,6 @@ from functools import partial
 from queue import Queue
 from typing import Dict, Callable
 
-import cv2
-from utils.vision.identifier import Identifier
-
 
 class Describer:
     """
@@ -20,7 +17,6 @@ class Describer:
     Attributes:
         model: The initialized vision model instance for image description.
         identifier (Identifier): Component for identifying individuals in images.
-        name_queue (Queue): Thread-safe queue for passing identification results.
 
     Args:
         model_name (str, optional): The name of the vision model to use. Defaults to "llava-phi3".
@@ -38,7 +34,8 @@ class Describer:
     def __init__(self, model_name: str = "llava-phi3", base_url: str = 'http://localhost:11434/'):
         self._model_selection: str = model_name.upper()
         self._base_url: str = base_url
-        self.name_queue = Queue()
+        
+        from utils.vision.identifier import Identifier # loads face_recognition
         
         self.identifier = Identifier()
         self.model = self._initialize_model()
@@ -76,12 +73,17 @@ class Describer:
 
         return model()
     
-    def _convert_base64(self, image_data: np.ndarray | str) -> str:
-        """ Convert image data to base64. """
+    def _convert_base64(self, image_data: np.ndarray | str | bytes | memoryview) -> str:
+        """ Convert image data to base64, raw jpeg bytes are encoded as they are. """
         
         if isinstance(image_data, np.ndarray):
+            import cv2
+            
             _, buffer = cv2.imencode('.jpg', image_data)
             image_data = base64.b64encode(buffer).decode('utf-8')
+            
+        elif isinstance(image_data, (bytes, bytearray, memoryview)):
+            image_data = base64.b64encode(image_data).decode('utf-8')
         
         return image_data
     
@@ -108,7 +110,7 @@ class Describer:
     def describe(
         self, 
         template_name: str, 
-        image_data: np.ndarray | str
+        image_data: np.ndarray | str | bytes
     ) -> str | None:
         
         """ 
@@ -116,8 +118,8 @@ class Describer:
 
         Args:
             template_name (str): The template to use for generating the description.
-            image_data (Union[np.ndarray, str]): The image to describe, either as a numpy array
-                or base64 encoded string.
+            image_data (Union[np.ndarray, str, bytes]): The image to describe, either as a numpy array,
+                base64 encoded string or raw jpeg bytes.
 
         Returns:
             Optional[str]: A natural language description of the image, or None if processing fails.
@@ -125,18 +127,20 @@ class Describer:
 
         """
         
+        name_queue = Queue() # one queue per call, the describer can be shared between sessions
         try:    
-            thread = threading.Thread(target=self.identifier.identify, args=(image_data, self.name_queue))
+            thread = threading.Thread(target=tracer.bind(self.identifier.identify, image_data, name_queue))
             thread.start()
             
             image_base64 = self._convert_base64(image_data)
-            sight = self.model.generate(template_name=template_name,
-                                        image=image_base64)
+            with tracer.span("vision_describe", model=self._model_selection, template=template_name):
+                sight = self.model.generate(template_name=template_name,
+                                            image=image_base64)
         except Exception as e:
             logger.error(f"Error: Failed to describe image: {str(e)}")
             return None
         
-        name = self.name_queue.get()
+        name = name_queue.get()
         thread.join()
         
         return sight if name == "unknown" else sight + f" I recognize it's {name}."
@@ -1,4 +1,4 @@
-from config import logger
+from config import logger, tracer
 import os
 import base64
 from pathlib import Path
@@ -19,7 +19,7 @@ class Identifier:
 
     Methods:
         initialize_ids(): Initializes the photo IDs and face encodings.
-        _base64_to_numpy(base64_str): Converts a base64 string to a numpy array.
+        _decode_image(image_data): Decodes a base64 string or raw jpeg bytes to a numpy array.
         identify(frames): Identifies individuals from the given frames.
     """
     def __init__(self):
@@ -57,21 +57,25 @@ class Identifier:
         
         return photo_ids
     
-    def _base64_to_numpy(self, base64_str: str)-> np.ndarray:
-        """ Convert a base64 string to a numpy array. """
-        img_array = np.frombuffer(base64.b64decode(base64_str), dtype=np.uint8)
+    def _decode_image(self, image_data: str | bytes | memoryview)-> np.ndarray:
+        """ Decode a base64 string or raw jpeg bytes to a numpy array, raw bytes are not copied. """
+        if isinstance(image_data, str):
+            image_data = base64.b64decode(image_data)
+            
+        img_array = np.frombuffer(image_data, dtype=np.uint8)
         return cv2.imdecode(img_array, cv2.IMREAD_COLOR)
     
+    @tracer.trace("face_id")
     def identify(
         self, 
-        frames: np.ndarray | str, 
+        frames: np.ndarray | str | bytes | memoryview, 
         name_queue: Queue
     ) -> None:
         
         """ Identify individuals from the given frames. """
         
-        if isinstance(frames, str):
-            frames = self._base64_to_numpy(frames)
+        if not isinstance(frames, np.ndarray):
+            frames = self._decode_image(frames)
         
         try:
             frames = cv2.cvtColor(cv2.resize(frames, (0, 0), fx=0.5, fy=0.5), cv2.COLOR_BGR2RGB)
@@ -90,7 +94,7 @@ class Identifier:
                     
         except Exception as e:
             logger.error(f"Identifier: Failed to identify faces: {str(e)}")
-            return
+            names = [] # still answer the queue, the describer is waiting on it
         
         name = "unknown" if not names else ", ".join(names)
         
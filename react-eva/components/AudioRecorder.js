@@ -7,7 +7,8 @@ const AudioRecorder = ({
   isEVATalking, 
   cutoffEVA,
   onRecordingStart,
-  onRecordingEnd
+  onRecordingEnd,
+  onAudioChunk
 }) => {
   const [isRecording, setIsRecording] = useState(false);
   const [isClient, setIsClient] = useState(false);
@@ -18,6 +19,7 @@ const AudioRecorder = ({
   const [recordingDuration, setRecordingDuration] = useState(0);
   const actualDurationRef = useRef(0);
   const timerRef = useRef(null);
+  const chunkProcessorRef = useRef(null);
   const [recordingError, setRecordingError] = useState(null);
   
   // Check if we're on client-side
@@ -141,6 +143,22 @@ const AudioRecorder = ({
       mediaRecorderRef.current = mediaRecorder;
       audioChunksRef.current = [];
       
+      // Stream the raw samples while recording, when the parent asks for them
+      if (onAudioChunk && audioContextRef.current) {
+        const audioContext = audioContextRef.current;
+        if (audioContext.state === 'suspended') {
+          await audioContext.resume();
+        }
+        const source = audioContext.createMediaStreamSource(stream);
+        const processor = audioContext.createScriptProcessor(4096, 1, 1);
+        processor.onaudioprocess = (event) => {
+          onAudioChunk(new Float32Array(event.inputBuffer.getChannelData(0)), audioContext.sampleRate);
+        };
+        source.connect(processor);
+        processor.connect(audioContext.destination);
+        chunkProcessorRef.current = { source, processor };
+      }
+      
       // Handle data available event
       mediaRecorder.ondataavailable = (event) => {
         if (event.data.size > 0) {
@@ -253,6 +271,12 @@ const AudioRecorder = ({
     if (mediaRecorderRef.current && isRecording) {
       console.log('Stopping recording...');
       mediaRecorderRef.current.stop();
+      
+      if (chunkProcessorRef.current) {
+        chunkProcessorRef.current.source.disconnect();
+        chunkProcessorRef.current.processor.disconnect();
+        chunkProcessorRef.current = null;
+      }
       setIsRecording(false);
       
       // Clear the timer
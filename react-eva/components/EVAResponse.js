@@ -2,6 +2,7 @@ import { useState, useEffect, useRef } from 'react';
 import EVAAnimation from './EVAAnimation';
 import AudioRecorder from './AudioRecorder';
 import webSocketService from '../services/WebSocketService';
+import templateCache from '../services/TemplateCache';
 import config from '../config';
 
 const EVAResponse = ({ query, onNewQuery, onReset }) => {
@@ -189,8 +190,14 @@ const EVAResponse = ({ query, onNewQuery, onReset }) => {
       // Set speech text if provided (for captions)
       if (message.text) {
         console.log('Setting speech text from audio message:', message.text);
-        setSpeechText(message.text);
-        setResponse(message.text);
+        if (message.sentence > 0) {
+          // streamed responses arrive sentence by sentence, the caption grows with them
+          setSpeechText(prev => `${prev} ${message.text}`);
+          setResponse(prev => `${prev} ${message.text}`);
+        } else {
+          setSpeechText(message.text);
+          setResponse(message.text);
+        }
       }
       
       console.log('Queueing audio from:', audioUrl);
@@ -233,8 +240,18 @@ const EVAResponse = ({ query, onNewQuery, onReset }) => {
       
       setIsLoading(false);
     } 
+    else if (message.type === 'template') {
+      // a new version of an html template, the next html messages only reference it
+      templateCache.store(message.id, message.hash, message.content);
+    }
     else if (message.type === 'html') {
-      setHtmlContent(message.content);
+      if (message.template) {
+        templateCache.render(message.template, message.hash, message.params)
+          .then((html) => setHtmlContent(html))
+          .catch((error) => console.error('Failed to render the html template:', error));
+      } else {
+        setHtmlContent(message.content);
+      }
       setIsLoading(false);
     }
     else if (message.type === 'over') {
@@ -351,7 +368,12 @@ const EVAResponse = ({ query, onNewQuery, onReset }) => {
       
       // Send audio via WebSocket, our updated service will handle conversion if needed
       try {
-        await webSocketService.sendAudio(audioBlob);
+        if (config.behavior.streamAudio) {
+          // the audio was streamed while recording, the backend only transcribes the tail
+          await webSocketService.endAudioStream();
+        } else {
+          await webSocketService.sendAudio(audioBlob);
+        }
         console.log('Audio sent successfully to WebSocket service');
       } catch (socketError) {
         console.error('WebSocket error sending audio:', socketError);
@@ -465,11 +487,6 @@ const EVAResponse = ({ query, onNewQuery, onReset }) => {
       // If no session ID in URL, use the current session ID
       if (!sessionId) {
         sessionId = webSocketService.sessionId;
-        
-        // Add session ID to URL if not already present
-        if (!audioUrl.includes('session_id=')) {
-          audioUrl = `${audioUrl}${audioUrl.includes('?') ? '&' : '?'}session_id=${sessionId}`;
-        }
       }
     } catch (e) {
       console.log('Could not parse URL for session ID:', e);
@@ -483,13 +500,13 @@ const EVAResponse = ({ query, onNewQuery, onReset }) => {
           if (filename) {
             console.log('Converting relative audio path to absolute URL:', filename);
             const baseUrl = config.api.baseUrl;
-            audioUrl = `${baseUrl}/download/audio/${filename}?session_id=${sessionId}`;
+            audioUrl = `${baseUrl}/download/audio/${filename}`;
           }
         }
       }
     }
     
-    // Use the audioUrl as is, with session ID for cache busting
+    // Use the audioUrl as is, the files are immutable and cached by the browser
     const cacheBustUrl = audioUrl;
     
     console.log('Final audio URL to fetch:', cacheBustUrl);
@@ -752,6 +769,9 @@ const EVAResponse = ({ query, onNewQuery, onReset }) => {
                 cutoffEVA={cutoffEVA}
                 onRecordingStart={handleUserSpeakingStart}
                 onRecordingEnd={handleUserSpeakingEnd}
+                onAudioChunk={config.behavior.streamAudio
+                  ? (samples, sampleRate) => webSocketService.sendAudioChunk(samples, sampleRate)
+                  : undefined}
               />
             </div>
           )}
@@ -38,6 +38,7 @@ const config = {
     
     // Audio settings
     audioEnabled: true,  // Whether audio responses are enabled
+    streamAudio: false,  // Stream the recording as PCM chunks, transcribed while the user speaks
     
     // Text-to-speech settings
     ttsEnabled: true,    // Whether text-to-speech is enabled
@@ -0,0 +1,62 @@
+// TemplateCache.js - Caches the html templates pushed by the EVA backend
+import config from '../config';
+
+const STORAGE_PREFIX = 'eva_template_';
+
+class TemplateCache {
+  constructor() {
+    this.templates = new Map(); // template id -> { hash, content }
+  }
+
+  store(id, hash, content) {
+    const template = { hash, content };
+    this.templates.set(id, template);
+
+    try {
+      // kept across reloads, the backend only pushes a template once per version
+      localStorage.setItem(STORAGE_PREFIX + id, JSON.stringify(template));
+    } catch (error) {
+      console.warn(`Could not persist the template ${id}:`, error);
+    }
+  }
+
+  lookup(id, hash) {
+    let template = this.templates.get(id);
+    if (!template) {
+      try {
+        const saved = localStorage.getItem(STORAGE_PREFIX + id);
+        template = saved ? JSON.parse(saved) : null;
+      } catch (error) {
+        template = null;
+      }
+    }
+
+    return template && template.hash === hash ? template.content : null;
+  }
+
+  async fetchTemplate(id, hash) {
+    // the versioned url is cached as immutable, it is only downloaded when the template changes
+    const response = await fetch(`${config.api.baseUrl}/template/${encodeURIComponent(id)}?v=${hash}`);
+    if (!response.ok) {
+      throw new Error(`Template ${id} not available: ${response.status}`);
+    }
+
+    const content = await response.text();
+    this.store(id, hash, content);
+    return content;
+  }
+
+  async render(id, hash, params = {}) {
+    const content = this.lookup(id, hash) || await this.fetchTemplate(id, hash);
+
+    // same placeholders as the backend: <key> is replaced by its value
+    return Object.entries(params).reduce(
+      (html, [key, value]) => html.split(`<${key}>`).join(value ?? ''),
+      content
+    );
+  }
+}
+
+// Singleton instance
+const templateCache = new TemplateCache();
+export default templateCache;
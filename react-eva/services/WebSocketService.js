@@ -138,7 +138,12 @@ class WebSocketService {
       
       // Handle validation messages
       if (parsedData.type && parsedData.type.startsWith('validation-')) {
-        console.log(`Message validation: ${parsedData.type} - ${parsedData.content}`);
+        if (parsedData.content === 'rejected') {
+          // the server is over its memory caps, the item was not processed
+          console.warn(`Message rejected by the server: ${parsedData.type}`);
+        } else {
+          console.log(`Message validation: ${parsedData.type} - ${parsedData.content}`);
+        }
         return;
       }
 
@@ -161,13 +166,18 @@ class WebSocketService {
         console.log('Processing array of messages, length:', parsedData.length);
         
         for (const item of parsedData) {
+          // batched messages carry their own session ID
+          if (item.session_id) {
+            this.sessionId = item.session_id;
+          }
+
           if (item.type === 'audio') {
             const audioUrl = this.formatAudioUrl(item.content);
             
+            // keep the other fields, the sentence index tells the caption to grow
             const audioMessage = { 
-              type: 'audio', 
+              ...item,
               content: audioUrl,
-              text: item.text,
               session_id: this.sessionId
             };
             
@@ -185,9 +195,8 @@ class WebSocketService {
           const audioUrl = this.formatAudioUrl(parsedData.content);
           
           const audioMessage = {
-            type: 'audio', 
+            ...parsedData,
             content: audioUrl,
-            text: parsedData.text,
             session_id: this.sessionId
           };
           
@@ -217,18 +226,11 @@ class WebSocketService {
       const parts = audioPath.split('audio/');
       const filename = parts[1]?.split('?')[0];
       audioUrl = `${baseUrl}/download/audio/${filename}`;
-      
-      if (!audioUrl.includes('session_id=')) {
-        audioUrl = `${audioUrl}?session_id=${this.sessionId}`;
-      }
     } else {
       audioUrl = `${baseUrl}/download/${audioPath.startsWith('/') ? audioPath.substring(1) : audioPath}`;
     }
     
-    if (!audioUrl.includes('session_id=')) {
-      audioUrl = `${audioUrl}${audioUrl.includes('?') ? '&' : '?'}session_id=${this.sessionId}`;
-    }
-    
+    // the files are content addressed, the same URL in every session keeps them in the browser cache
     return audioUrl;
   }
 
@@ -307,6 +309,50 @@ class WebSocketService {
     }
   }
 
+  sendAudioChunk(samples, sampleRate = 16000) {
+    // stream the utterance while recording, as 16-bit PCM, the backend transcribes it incrementally
+    if (!this.socket || !this.isConnected || !samples || samples.length === 0) {
+      return;
+    }
+
+    const pcm = new Int16Array(samples.length);
+    for (let i = 0; i < samples.length; i++) {
+      const sample = Math.max(-1, Math.min(1, samples[i]));
+      pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7FFF;
+    }
+
+    let binary = '';
+    const bytes = new Uint8Array(pcm.buffer);
+    for (let i = 0; i < bytes.length; i++) {
+      binary += String.fromCharCode(bytes[i]);
+    }
+
+    this.socket.send(JSON.stringify({
+      type: 'audioChunk',
+      session_id: this.sessionId,
+      sample_rate: sampleRate,
+      content: btoa(binary)
+    }));
+  }
+
+  async endAudioStream() {
+    try {
+      await this.connect();
+
+      const overPayload = {
+        type: "over",
+        session_id: this.sessionId,
+        content: "done"
+      };
+
+      console.log('Audio stream complete, sending "over" signal');
+      this.socket.send(JSON.stringify(overPayload));
+    } catch (error) {
+      console.error('Error ending audio stream:', error);
+      throw error;
+    }
+  }
+
   async sendImage(imageBlob, isFrontImage = true) {
     console.log(`sendImage called with blob:`, imageBlob ? `${imageBlob.size} bytes` : 'null');
     
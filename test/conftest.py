@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# the EVA packages are imported from app, as main.py does
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
@@ -0,0 +1,84 @@
+"""
+Checkpoints of the conversation state and the session memory.
+"""
+import json
+import threading
+
+import pytest
+
+from utils.memory import memory as memory_module
+from utils.memory.checkpoint import Checkpointer
+from utils.memory.memory import Memory
+
+
+@pytest.fixture
+def checkpointer(tmp_path, monkeypatch):
+    checkpointer = Checkpointer(enabled=True)
+    checkpointer._dblink = tmp_path / "eva.db"
+    monkeypatch.setattr(memory_module, "checkpointer", checkpointer)
+    return checkpointer
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+
+    def generate(self, template, conversation):
+        self.release.wait(5)
+        return json.dumps({"summary": f"summary of {conversation.count('EVA01:')} turns"})
+
+
+class FakeMemoryLogger:
+    def save_memory_to_db(self, entry):
+        pass
+
+
+def make_memory(session_id: str = "eva") -> Memory:
+    memory = Memory.__new__(Memory)
+    memory.session_id = session_id
+    memory._session_memory = []
+    memory._memory_thread = None
+    memory._summarizer = FakeSummarizer()
+    memory._memory_logger = FakeMemoryLogger()
+    return memory
+
+
+def test_save_memory_keeps_the_state_of_the_checkpoint(checkpointer):
+    checkpointer.save("eva", {"status": "waiting", "num_conv": 3}, [{"eva_message": "hi"}])
+    checkpointer.save_memory("eva", [{"eva_message": "summary"}])
+
+    checkpoint = checkpointer.load("eva")
+    assert checkpoint["status"] == "waiting"
+    assert checkpoint["num_conv"] == 3
+    assert checkpoint["session_memory"] == [{"eva_message": "summary"}]
+
+
+def test_summary_is_checkpointed_once_written(checkpointer):
+    memory = make_memory()
+    for turn in range(11):
+        if turn == 10: # the summary is written after the checkpoint of the turn
+            memory._summarizer.release.clear()
+        memory.create_memory(timestamp=str(turn), user_response={"user_message": f"message {turn}"}, response={"response": f"answer {turn}"})
+        checkpointer.save("eva", {"status": "waiting", "num_conv": turn + 1}, memory.export_session())
+
+    assert len(checkpointer.load("eva")["session_memory"]) == 11
+    memory._summarizer.release.set()
+    memory._memory_thread.join()
+
+    # the eleventh turn was checkpointed before its summary, the summary replaced it in the background
+    session_memory = checkpointer.load("eva")["session_memory"]
+    assert session_memory[0]["eva_message"] == "summary of 5 turns"
+    assert len(session_memory) == 7
+    assert session_memory == memory.export_session()
+
+
+def test_disabled_checkpointer_writes_nothing(tmp_path):
+    checkpointer = Checkpointer(enabled=False)
+    checkpointer._dblink = tmp_path / "eva.db"
+
+    checkpointer.save("eva", {"status": "waiting"}, [])
+    checkpointer.save_memory("eva", [])
+
+    assert checkpointer.load("eva") is None
+    assert not checkpointer._dblink.exists()
@@ -0,0 +1,128 @@
+"""
+Conditional and partial downloads of the media files.
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from client import connection as connection_module
+from client.connection import ConnectionManager
+from utils.media import MediaStore
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = MediaStore(root=tmp_path, janitor=False)
+    monkeypatch.setattr(connection_module, "media_store", store)
+    return store
+
+
+@pytest.fixture
+def download(store):
+    """ The url and the ETag of a stored mp3 """
+    key = store.put(CONTENT, "audio", ".mp3")
+    name = key.split("/")[1]
+    return f"/download/audio/{name}", f'"{name.removesuffix(".mp3")}"'
+
+
+@pytest.fixture
+def client():
+    return TestClient(ConnectionManager(None, None).app)
+
+
+def test_full_download(client, download):
+    url, etag = download
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == etag
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", 'W/{etag}', '"other", {etag}', "*"])
+def test_revalidation_is_not_modified(client, download, if_none_match):
+    url, etag = download
+    response = client.get(url, headers={"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_revalidation_of_another_version(client, download):
+    url, _ = download
+    response = client.get(url, headers={"If-None-Match": '"other"'})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+@pytest.mark.parametrize("byte_range, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+    ("bytes=-5000", 0, 1023),
+])
+def test_partial_download(client, download, byte_range, start, end):
+    url, _ = download
+    response = client.get(url, headers={"Range": byte_range})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("byte_range", ["bytes=5-3", "bytes=a-b", "bytes=-", "bytes=--5", "items=0-9", "bytes=0-9, 20-29"])
+def test_invalid_range_is_ignored(client, download, byte_range):
+    url, _ = download
+    response = client.get(url, headers={"Range": byte_range})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+@pytest.mark.parametrize("byte_range", ["bytes=1024-", "bytes=5000-6000", "bytes=-0"])
+def test_unsatisfiable_range(client, download, store, byte_range):
+    url, _ = download
+    response = client.get(url, headers={"Range": byte_range})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+    assert store._refs == {} # the file is released on errors too
+
+
+def test_if_range_of_the_current_version(client, download):
+    url, etag = download
+    response = client.get(url, headers={"Range": "bytes=10-19", "If-Range": etag})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+
+
+@pytest.mark.parametrize("if_range", ['"stale"', "W/{etag}", "Wed, 21 Oct 2015 07:28:00 GMT"])
+def test_if_range_of_another_version_sends_the_whole_file(client, download, if_range):
+    url, etag = download
+    response = client.get(url, headers={"Range": "bytes=10-19", "If-Range": if_range.format(etag=etag)})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_missing_file(client, store):
+    assert client.get("/download/audio/missing.mp3").status_code == 404
+    assert client.get("/download/video/missing.mp4").status_code == 400
+
+
+def test_parse_range_of_an_empty_file():
+    with pytest.raises(HTTPException) as error:
+        ConnectionManager._parse_range("bytes=-5", 0)
+    assert error.value.status_code == 416
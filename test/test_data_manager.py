@@ -0,0 +1,181 @@
+"""
+Turn assembly and memory accounting of the mobile DataManager.
+"""
+import io
+import wave
+import base64
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from client.data_manager import DataManager
+from client.protocol import dumps
+
+
+class StubTranscriber:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay # seconds per second of audio, to let a long clip finish last
+
+    def transcribe(self, audioclip):
+        time.sleep(self.delay * len(audioclip) / 16000)
+        return f"heard {len(audioclip)} samples", "en"
+
+
+class StubDescriber:
+    def describe(self, template, content):
+        return f"saw {len(content)} bytes"
+
+
+def wav_clip(seconds: float = 0.1, rate: int = 16000) -> str:
+    """ A silent 16-bit mono WAV clip, base64 as the JSON clients send it """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def message(session_id: str, type: str, content: str = "done") -> str:
+    return dumps({"session_id": session_id, "type": type, "content": content})
+
+
+async def next_turn(data_manager: DataManager, timeout: float = 5.0):
+    return await asyncio.wait_for(data_manager.wait_turn(), timeout)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_buffered_bytes_are_released_after_every_turn():
+    async def scenario():
+        data_manager = DataManager(StubTranscriber(), StubDescriber())
+        await data_manager.start_queue()
+
+        for turn in range(5):
+            session_id = f"turn-{turn}"
+            await data_manager.process_message(message(session_id, "audio", wav_clip()))
+            await data_manager.process_message(message(session_id, "frontImage", base64.b64encode(b"jpeg" * 64).decode()))
+            await data_manager.process_message(message(session_id, "over"))
+
+            turn_data = await next_turn(data_manager)
+            assert turn_data["session_id"] == session_id
+            assert data_manager.buffered_bytes == 0
+
+        await data_manager.stop()
+
+    run(scenario())
+
+
+def test_control_messages_are_not_accounted():
+    data_manager = DataManager(StubTranscriber(), StubDescriber(), max_buffered_bytes=4)
+
+    assert data_manager.admit({"type": "over", "content": "done"})
+    assert data_manager.buffered_bytes == 0
+    assert not data_manager.admit({"type": "audio", "content": "12345"})
+
+
+def test_interleaved_sessions_are_assembled_apart_in_over_order():
+    async def scenario():
+        data_manager = DataManager(StubTranscriber(delay=1.0), StubDescriber())
+        await data_manager.start_queue()
+
+        # the first turn has the longest clip, its transcription ends last
+        await data_manager.process_message(message("first", "audio", wav_clip(0.3)))
+        await data_manager.process_message(message("second", "audio", wav_clip(0.1)))
+        await data_manager.process_message(message("first", "frontImage", base64.b64encode(b"a" * 30).decode()))
+        await data_manager.process_message(message("second", "backImage", base64.b64encode(b"b" * 20).decode()))
+        await data_manager.process_message(message("first", "over"))
+        await data_manager.process_message(message("second", "over"))
+
+        first, second = await next_turn(data_manager), await next_turn(data_manager)
+        assert first == {"session_id": "first", "user_message": ("heard 4800 samples", "en"), "observation": "saw 40 bytes"}
+        assert second == {"session_id": "second", "user_message": ("heard 1600 samples", "en"), "view": "saw 28 bytes"}
+        assert data_manager.sessions == {}
+        assert data_manager.buffered_bytes == 0
+
+        await data_manager.stop()
+
+    run(scenario())
+
+
+def test_over_before_its_media_ends_the_turn_without_it():
+    async def scenario():
+        data_manager = DataManager(StubTranscriber(), StubDescriber())
+        await data_manager.start_queue()
+
+        await data_manager.process_message(message("early", "over"))
+        assert await next_turn(data_manager) == {"session_id": "early"}
+
+        # the late clip opens a session of its own, it never leaks into the next turn
+        await data_manager.process_message(message("early", "audio", wav_clip()))
+        await data_manager.process_message(message("next", "audio", wav_clip(0.2)))
+        await data_manager.process_message(message("next", "over"))
+
+        turn = await next_turn(data_manager)
+        assert turn == {"session_id": "next", "user_message": ("heard 3200 samples", "en")}
+        assert list(data_manager.sessions) == ["early"]
+
+        await asyncio.sleep(0.1) # the late clip is still transcribed, then released
+        assert data_manager.buffered_bytes == 0
+        await data_manager.stop()
+
+    run(scenario())
+
+
+def test_sessions_without_over_expire():
+    async def scenario():
+        data_manager = DataManager(StubTranscriber(), StubDescriber(), session_ttl=0.2)
+        await data_manager.start_queue()
+
+        await data_manager.process_message(message("abandoned", "frontImage", base64.b64encode(b"jpeg").decode()))
+        await asyncio.sleep(0.3)
+        assert "abandoned" in data_manager.sessions
+
+        # the sessions are swept when the next item is processed
+        await data_manager.process_message(message("live", "over"))
+        assert await next_turn(data_manager) == {"session_id": "live"}
+        assert data_manager.sessions == {}
+
+        await data_manager.stop()
+
+    run(scenario())
+
+
+def test_expiry_keeps_the_sessions_with_pending_items():
+    data_manager = DataManager(StubTranscriber(), StubDescriber(), session_ttl=1.0)
+    busy = data_manager._get_session("busy")
+    idle = data_manager._get_session("idle")
+    recent = data_manager._get_session("recent")
+
+    busy["pending"].add(object()) # a transcription still running
+    busy["updated"] = idle["updated"] = time.monotonic() - 2.0
+    idle["stream_bytes"] = 100
+    data_manager.buffered_bytes = 150
+    data_manager._last_sweep -= 1.0
+
+    data_manager._expire_sessions()
+    assert set(data_manager.sessions) == {"busy", "recent"}
+    assert data_manager.buffered_bytes == 50
+
+
+def test_finish_session_waits_for_the_previous_turn():
+    async def scenario():
+        data_manager = DataManager(StubTranscriber(), StubDescriber())
+        release = asyncio.Event()
+        previous = asyncio.create_task(release.wait())
+
+        finishing = asyncio.create_task(data_manager._finish_session("second", {"content": {"view": "v"}, "pending": set()}, previous))
+        await asyncio.sleep(0.05)
+        assert data_manager.turns.empty()
+
+        release.set()
+        await finishing
+        assert data_manager.get_turn(0) == {"session_id": "second", "view": "v"}
+
+    run(scenario())
@@ -0,0 +1,87 @@
+"""
+In-process decoding and resampling of the uploaded audio.
+"""
+import io
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+av = pytest.importorskip("av")
+
+from client.decoder import TARGET_RATE, decode_audio, resample
+
+
+def tone(frequency: float, rate: int, seconds: float = 1.0) -> np.ndarray:
+    return np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate).astype(np.float32)
+
+
+def rms(samples: np.ndarray) -> float:
+    middle = samples[len(samples) // 10:-len(samples) // 10] # skip the filter edges
+    return float(np.sqrt(np.mean(np.square(middle))))
+
+
+def wav_bytes(samples: np.ndarray, rate: int, channels: int = 1) -> bytes:
+    pcm = (np.repeat(samples, channels) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def encoded_bytes(samples: np.ndarray, rate: int, container: str, codec: str) -> bytes:
+    buffer = io.BytesIO()
+    with av.open(buffer, mode="w", format=container) as output:
+        stream = output.add_stream(codec, rate=rate)
+        stream.layout = "mono"
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="flt", layout="mono")
+        frame.sample_rate = rate
+        for resampled in av.AudioResampler(format=stream.format.name, layout="mono", rate=rate).resample(frame):
+            for packet in stream.encode(resampled):
+                output.mux(packet)
+        for packet in stream.encode(None):
+            output.mux(packet)
+    return buffer.getvalue()
+
+
+def test_resample_keeps_the_speech_band():
+    resampled = resample(tone(1000, 48000), 48000)
+
+    assert len(resampled) == pytest.approx(TARGET_RATE, abs=32)
+    assert rms(resampled) == pytest.approx(np.sqrt(0.5), rel=0.02)
+
+
+def test_resample_filters_above_nyquist():
+    # a 12kHz tone has no place at 16kHz, box averaging folds it back to 4kHz at a third of its level
+    resampled = resample(tone(12000, 48000), 48000)
+
+    assert rms(resampled) < 0.01
+
+
+def test_resample_is_a_no_op_at_the_target_rate():
+    samples = tone(440, TARGET_RATE)
+    assert resample(samples, TARGET_RATE) is samples
+
+
+def test_decode_stereo_wav():
+    decoded = decode_audio(wav_bytes(tone(440, 44100, 0.5), 44100, channels=2))
+
+    assert decoded.dtype == np.float32
+    assert len(decoded) == pytest.approx(TARGET_RATE / 2, abs=32)
+    assert rms(decoded) == pytest.approx(np.sqrt(0.5), rel=0.02)
+
+
+@pytest.mark.parametrize("container, codec", [("webm", "libopus"), ("ogg", "libvorbis"), ("mp3", "libmp3lame")])
+def test_decode_compressed_clips(container, codec):
+    if codec not in av.codecs_available:
+        pytest.skip(f"{codec} is not available in this PyAV build")
+
+    rate = 48000 if codec == "libopus" else 44100
+    decoded = decode_audio(memoryview(encoded_bytes(tone(440, rate), rate, container, codec)))
+
+    assert decoded.dtype == np.float32
+    assert len(decoded) == pytest.approx(TARGET_RATE, rel=0.1)
+    assert rms(decoded) == pytest.approx(np.sqrt(0.5), rel=0.1)
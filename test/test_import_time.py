@@ -0,0 +1,80 @@
+"""
+Import time budget of the EVA packages.
+
+Importing the client and utils packages must stay cheap: the heavy backends (torch, TTS,
+face_recognition, wespeaker, mpv, pyautogui...) are loaded lazily, only by the backend that
+needs them. This test fails when a new eager import slips in.
+
+Run with pytest, or directly:
+    python test/test_import_time.py
+The budget can be raised on slow machines with EVA_IMPORT_BUDGET_MS.
+"""
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+PACKAGES = ("client", "utils")
+BUDGET_MS = float(os.getenv("EVA_IMPORT_BUDGET_MS", 1000))
+
+# loaded only by the backend that uses them
+HEAVY_MODULES = (
+    "torch", "TTS", "face_recognition", "wespeaker", "mpv", "pyautogui",
+    "sounddevice", "cv2", "faster_whisper", "elevenlabs", "openai",
+)
+LAZY_SUBMODULES = ("client.mobile", "client.wslclient", "utils.tts.speaker", "utils.stt.transcriber", "utils.vision.describer")
+
+
+def _import_packages() -> tuple[float, set]:
+    """ Import the packages in a fresh interpreter, return the import time in ms and the loaded modules """
+    code = f"import sys, json; import {', '.join(PACKAGES)}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    )
+
+    # import time: self [us] | cumulative | imported package, the top level imports are not indented
+    elapsed_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, package = line.split("|")
+        if package.rstrip() in {f" {name}" for name in PACKAGES}:
+            elapsed_us += int(cumulative)
+
+    return elapsed_us / 1000, set(json.loads(result.stdout))
+
+
+def test_no_heavy_module_is_imported():
+    _, modules = _import_packages()
+    heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES)
+    assert not heavy, f"Heavy modules imported eagerly: {heavy}"
+
+
+def test_exports_are_lazy():
+    _, modules = _import_packages()
+    eager = sorted(name for name in LAZY_SUBMODULES if name in modules)
+    assert not eager, f"Lazy submodules imported eagerly: {eager}"
+
+
+def test_import_time_budget():
+    elapsed_ms, _ = _import_packages()
+    assert elapsed_ms < BUDGET_MS, f"Importing {PACKAGES} took {elapsed_ms:.0f}ms, over the {BUDGET_MS:.0f}ms budget"
+
+
+if __name__ == "__main__":
+    elapsed_ms, modules = _import_packages()
+    print(f"import {', '.join(PACKAGES)}: {elapsed_ms:.1f}ms (budget {BUDGET_MS:.0f}ms), {len(modules)} modules")
+
+    failed = False
+    for test in (test_no_heavy_module_is_imported, test_exports_are_lazy, test_import_time_budget):
+        try:
+            test()
+            print(f"PASS {test.__name__}")
+        except AssertionError as e:
+            failed = True
+            print(f"FAIL {test.__name__}: {e}")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,196 @@
+"""
+Outbound message queue of the mobile connections: ordering, coalescing, backpressure and shutdown.
+"""
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from client.outbox import Outbox
+
+
+class FakeWebSocket:
+    """ Records the frames, sends block while the gate is closed like a client that does not read """
+
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send_text(self, frame):
+        await self.gate.wait()
+        self.sent.append(frame)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle(outbox: Outbox, timeout: float = 1.0):
+    await asyncio.wait_for(outbox._task, timeout)
+
+
+def test_messages_are_sent_in_order():
+    async def scenario():
+        websocket = FakeWebSocket()
+        outbox = Outbox(websocket)
+        outbox.start()
+
+        for index in range(10):
+            outbox.put(json.dumps({"index": index}))
+            if index % 3 == 0:
+                await asyncio.sleep(0) # let the writer send part of them
+        outbox.close()
+        await settle(outbox)
+
+        assert [json.loads(frame)["index"] for frame in websocket.sent] == list(range(10))
+
+    run(scenario())
+
+
+def test_waiting_coalescable_messages_share_a_frame():
+    async def scenario():
+        websocket = FakeWebSocket()
+        outbox = Outbox(websocket)
+        outbox.put('{"type": "ack"}')
+        outbox.put('[{"type": "audio"}]', coalesce=True)
+        outbox.put('{"type": "html"}', coalesce=True)
+        outbox.put('{"type": "over"}', coalesce=True)
+        outbox.put('{"type": "ack"}')
+
+        outbox.start()
+        outbox.close()
+        await settle(outbox)
+
+        frames = [json.loads(frame) for frame in websocket.sent]
+        assert frames == [
+            {"type": "ack"},
+            [{"type": "audio"}, {"type": "html"}, {"type": "over"}],
+            {"type": "ack"},
+        ]
+
+    run(scenario())
+
+
+def test_droppable_messages_are_dropped_first_under_pressure():
+    async def scenario():
+        websocket = FakeWebSocket()
+        websocket.gate.clear()
+        outbox = Outbox(websocket, max_messages=3)
+
+        outbox.put("ack 1", droppable=True)
+        outbox.put("speech", coalesce=True)
+        outbox.put("ack 2", droppable=True)
+        outbox.put("over", coalesce=True) # full, the oldest acknowledgement makes room
+        outbox.put("ack 3", droppable=True) # full, ack 2 makes room
+        outbox.put("ack 4", droppable=True) # full, ack 3 makes room
+        assert outbox.dropped == 3
+
+        websocket.gate.set()
+        outbox.start()
+        outbox.close()
+        await settle(outbox)
+
+        assert websocket.sent == ["[speech,over]", "ack 4"]
+        assert websocket.close_code is None
+
+    run(scenario())
+
+
+def test_droppable_message_is_dropped_when_nothing_else_can_be():
+    async def scenario():
+        outbox = Outbox(FakeWebSocket(), max_messages=2)
+        outbox.put("speech", coalesce=True)
+        outbox.put("over", coalesce=True)
+        outbox.put("ack", droppable=True)
+
+        assert outbox.dropped == 1
+        assert [message for message, _, _ in outbox._queue] == ["speech", "over"]
+
+    run(scenario())
+
+
+def test_slow_client_full_of_conversation_messages_is_disconnected():
+    async def scenario():
+        websocket = FakeWebSocket()
+        websocket.gate.clear()
+        outbox = Outbox(websocket, max_messages=2)
+        outbox.start()
+
+        outbox.put("speech 1", coalesce=True)
+        await asyncio.sleep(0) # the writer holds the first frame
+        outbox.put("speech 2", coalesce=True)
+        outbox.put("speech 3", coalesce=True)
+        outbox.put("over", coalesce=True) # would be lost, the connection is closed instead
+        outbox.put("ignored")
+
+        websocket.gate.set()
+        await settle(outbox)
+
+        assert websocket.close_code == 1011
+        assert "over" not in websocket.sent
+        assert "ignored" not in websocket.sent
+
+    run(scenario())
+
+
+def test_send_timeout_closes_the_connection():
+    async def scenario():
+        websocket = FakeWebSocket()
+        websocket.gate.clear()
+        outbox = Outbox(websocket, send_timeout=0.05)
+        outbox.start()
+        outbox.put("speech")
+
+        await settle(outbox)
+        assert websocket.close_code == 1011
+        assert websocket.sent == []
+
+    run(scenario())
+
+
+def test_close_drains_the_queued_messages():
+    async def scenario():
+        websocket = FakeWebSocket()
+        websocket.gate.clear()
+        outbox = Outbox(websocket)
+        outbox.start()
+
+        outbox.put("speech", coalesce=True)
+        await asyncio.sleep(0)
+        outbox.put("html", coalesce=True)
+        outbox.put("over", coalesce=True)
+        outbox.close()
+        outbox.put("after close")
+
+        websocket.gate.set()
+        await settle(outbox)
+
+        assert websocket.sent == ["speech", "[html,over]"]
+        assert websocket.close_code is None
+
+    run(scenario())
+
+
+def test_close_of_a_disconnected_client_stops_quietly():
+    class GoneWebSocket(FakeWebSocket):
+        async def send_text(self, frame):
+            raise RuntimeError("Cannot call send once a close message has been sent.")
+
+    async def scenario():
+        outbox = Outbox(GoneWebSocket())
+        outbox.put("speech")
+        outbox.put("over")
+        outbox.start()
+        outbox.close()
+
+        await settle(outbox)
+        assert outbox._task.done()
+
+    run(scenario())
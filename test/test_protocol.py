@@ -0,0 +1,65 @@
+"""
+Binary frames of the mobile websocket protocol.
+"""
+import pytest
+
+pytest.importorskip("orjson")
+
+from client.protocol import FRAME_TYPES, HEADER, PROTOCOL_VERSION, decode_frame, encode_frame
+
+
+@pytest.mark.parametrize("frame_type", FRAME_TYPES.values())
+def test_round_trip(frame_type):
+    payload = bytes(range(256)) * 4
+    frame = decode_frame(encode_frame(frame_type, "séance-42", 7, payload))
+
+    assert frame.type == frame_type
+    assert frame.session_id == "séance-42"
+    assert frame.sequence == 7
+    assert isinstance(frame.payload, memoryview)
+    assert frame.payload == payload
+
+
+def test_round_trip_without_payload():
+    frame = decode_frame(encode_frame("over", "", 2**32 - 1, b""))
+
+    assert (frame.type, frame.session_id, frame.sequence) == ("over", "", 2**32 - 1)
+    assert len(frame.payload) == 0
+
+
+def test_payload_is_not_copied():
+    data = bytearray(encode_frame("audio", "s", 0, b"abc"))
+    frame = decode_frame(data)
+    data[-1:] = b"d"
+
+    assert frame.payload == b"abd"
+
+
+@pytest.mark.parametrize("length", range(HEADER.size))
+def test_truncated_header(length):
+    data = encode_frame("audio", "session", 1, b"payload")[:length]
+
+    with pytest.raises(ValueError, match="too short"):
+        decode_frame(data)
+
+
+@pytest.mark.parametrize("code", [0, 6, 255])
+def test_unknown_type(code):
+    data = HEADER.pack(PROTOCOL_VERSION, code, 1, 0) + b"s"
+
+    with pytest.raises(ValueError, match="frame type"):
+        decode_frame(data)
+
+
+def test_unsupported_version():
+    data = HEADER.pack(PROTOCOL_VERSION + 1, 1, 1, 0) + b"s"
+
+    with pytest.raises(ValueError, match="version"):
+        decode_frame(data)
+
+
+def test_session_id_longer_than_the_frame():
+    data = HEADER.pack(PROTOCOL_VERSION, 1, 10, 0) + b"short"
+
+    with pytest.raises(ValueError, match="truncated"):
+        decode_frame(data)
@@ -0,0 +1,94 @@
+"""
+Barge-in handling of the speakers: an interruption lasts until the next response.
+"""
+import threading
+
+import pytest
+
+from utils.tts.speaker import Speaker
+
+
+class RecordingModel:
+    def __init__(self):
+        self.spoken = []
+        self.interrupted = False
+
+    def eva_speak(self, text, language=None, wait=True):
+        if not self.interrupted:
+            self.spoken.append(text)
+
+    def interrupt(self):
+        self.interrupted = True
+
+    def resume(self):
+        self.interrupted = False
+
+
+class RecordingSpeaker(Speaker):
+    def _get_model_factory(self):
+        return {"RECORDING": RecordingModel}
+
+
+def test_interruption_lasts_until_resume():
+    speaker = RecordingSpeaker("recording")
+
+    speaker.speak_stream("first sentence.")
+    speaker.wait_stream()
+    speaker.interrupt()
+
+    speaker.speak_stream("queued after the barge-in.")
+    speaker.wait_stream()
+    assert speaker.model.spoken == ["first sentence."]
+
+    speaker.resume()
+    speaker.speak_stream("next response.")
+    speaker.wait_stream()
+    assert speaker.model.spoken == ["first sentence.", "next response."]
+
+
+class FakePlayer:
+    def __init__(self):
+        self.played = []
+
+    def play_openai_stream(self, response):
+        self.played.append(response)
+
+    def stop(self):
+        pass
+
+
+class FakeSpeech:
+    """ speech.create returns only once the test lets it, to barge in during the synthesis """
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def create(self, input, **kwargs):
+        self.release.wait(5)
+        return input
+
+
+def test_openai_drops_the_speech_synthesized_after_the_barge_in():
+    try:
+        from utils.tts import model_openai # the player needs portaudio and libmpv
+    except (ImportError, OSError) as e:
+        pytest.skip(f"OpenAI speaker not available: {e}")
+
+    speaker = model_openai.OpenAISpeaker.__new__(model_openai.OpenAISpeaker)
+    speech = FakeSpeech()
+    speaker.model = type("Client", (), {"audio": type("Audio", (), {"speech": speech})()})()
+    speaker.audio_player = FakePlayer()
+    speaker.audio_thread = None
+    speaker.voice = "nova"
+    speaker._interrupted = False
+
+    thread = threading.Thread(target=speaker.eva_speak, args=("late sentence.",))
+    thread.start()
+    speaker.interrupt()
+    speech.release.set()
+    thread.join()
+    assert speaker.audio_player.played == []
+
+    speaker.resume()
+    speaker.eva_speak("next response.")
+    assert speaker.audio_player.played == ["next response."]
@@ -0,0 +1,170 @@
+"""
+Html templates referenced by id and hash: the template is pushed once per version, then only the parameters.
+"""
+import os
+import json
+import hashlib
+import secrets
+from pathlib import Path
+
+import pytest
+
+from utils.extension import html as html_module
+from utils.extension.html import get_template, load_html, render_html
+
+TEMPLATES = Path(html_module.__file__).parent
+
+
+@pytest.fixture
+def template():
+    """ A temporary template in the template directory, its id and path """
+    template_id = f"test_{secrets.token_hex(4)}"
+    path = TEMPLATES / f"{template_id}.html"
+    path.write_text("<p><title></p>\n")
+    yield template_id, path
+    path.unlink(missing_ok=True)
+    html_module._templates.pop(str(path), None)
+
+
+def rewrite(path: Path, content: str) -> None:
+    """ Change the template, with a later mtime even on coarse clocks """
+    stat = path.stat()
+    path.write_text(content)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_get_template_returns_the_html_and_its_hash(template):
+    template_id, _ = template
+    html, content_hash = get_template(f"{template_id}.html")
+
+    assert html == "<p><title></p>"
+    assert content_hash == hashlib.sha256(html.encode("utf-8")).hexdigest()[:16]
+
+
+def test_get_template_reads_the_file_once_per_version(template, monkeypatch):
+    template_id, path = template
+    first = get_template(f"{template_id}.html")
+
+    def no_read(*args, **kwargs):
+        raise AssertionError("the template was read again")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("builtins.open", no_read)
+        assert get_template(f"{template_id}.html") == first
+
+    rewrite(path, "<h1><title></h1>")
+    html, content_hash = get_template(f"{template_id}.html")
+    assert html == "<h1><title></h1>"
+    assert content_hash != first[1]
+
+
+@pytest.mark.parametrize("name", ["missing.html", "../config/config.py", "/etc/hostname"])
+def test_get_template_only_serves_the_template_directory(name):
+    with pytest.raises(FileNotFoundError):
+        get_template(name)
+
+
+def test_render_html_fills_the_placeholders():
+    html = "<img src='<image_url>'><p><music_title></p><p><music_title></p><other>"
+
+    assert render_html(html, image_url="cover.jpg", music_title="Song") == "<img src='cover.jpg'><p>Song</p><p>Song</p><other>"
+    assert render_html(html) == html
+
+
+def test_load_html_renders_the_template(template):
+    template_id, _ = template
+    assert load_html(f"{template_id}.html", title="EVA") == "<p>EVA</p>"
+
+
+##### MobileClient #####
+
+@pytest.fixture
+def client():
+    try:
+        from client.mobile import MobileClient
+    except (ImportError, OSError) as e:
+        pytest.skip(f"Mobile client not available: {e}")
+
+    client = MobileClient()
+    client.session_id = "session"
+    client.sent = []
+    client.send_data = lambda data: client.sent.append(json.loads(data))
+    return client
+
+
+def test_template_is_pushed_once_then_referenced(client, template):
+    template_id, _ = template
+    html, content_hash = get_template(f"{template_id}.html")
+
+    first = client._html_messages(template_id, title="one")
+    assert first == [
+        {"type": "template", "id": template_id, "hash": content_hash, "content": html},
+        {"session_id": "session", "type": "html", "template": template_id, "hash": content_hash, "params": {"title": "one"}},
+    ]
+
+    second = client._html_messages(template_id, title="two")
+    assert second == [
+        {"session_id": "session", "type": "html", "template": template_id, "hash": content_hash, "params": {"title": "two"}},
+    ]
+
+
+def test_changed_template_is_pushed_again(client, template):
+    template_id, path = template
+    client._html_messages(template_id, title="one")
+
+    rewrite(path, "<h1><title></h1>")
+    messages = client._html_messages(template_id, title="two")
+
+    assert [message["type"] for message in messages] == ["template", "html"]
+    assert messages[0]["content"] == "<h1><title></h1>"
+    assert messages[0]["hash"] == messages[1]["hash"] == get_template(f"{template_id}.html")[1]
+
+
+def test_templates_are_tracked_per_id(client):
+    client.launch_youtube("dQw4w9WgXcQ", "video")
+    client.stream_music("audio/song.mp3", "images/cover.jpg", "song")
+    client.launch_youtube("abc", "another video")
+
+    youtube, music, youtube_again = client.sent
+    assert [message["type"] for message in youtube] == ["template", "html"]
+    assert [message["type"] for message in music] == ["mp3", "template", "html"]
+    assert [message["type"] for message in youtube_again] == ["html"]
+
+    assert music[2]["params"] == {"image_url": "images/cover.jpg", "music_title": "song"}
+    assert youtube_again[0]["params"] == {"video_id": "abc", "video_title": "another video"}
+    assert youtube_again[0]["hash"] == youtube[0]["hash"]
+
+
+def test_bound_clients_push_the_templates_to_their_own_connection(client):
+    first, second = client.bind("phone-1"), client.bind("phone-2")
+
+    assert first._html_messages("blank", full_html="<p>hi</p>")[0]["type"] == "template"
+    assert second._html_messages("blank", full_html="<p>hi</p>")[0]["type"] == "template"
+    assert first._html_messages("blank", full_html="<p>hi</p>")[0]["type"] == "html"
+
+
+##### template endpoint, for the clients that missed a pushed template #####
+
+@pytest.fixture
+def http():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from client.connection import ConnectionManager
+
+    return TestClient(ConnectionManager(None, None).app)
+
+
+def test_template_endpoint_serves_the_version_by_its_hash(http):
+    html, content_hash = get_template("music.html")
+
+    response = http.get(f"/template/music?v={content_hash}")
+    assert response.status_code == 200
+    assert response.text == html
+    assert response.headers["etag"] == f'"{content_hash}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    response = http.get("/template/music", headers={"If-None-Match": f'"{content_hash}"'})
+    assert response.status_code == 304
+
+    assert http.get("/template/missing").status_code == 404
@@ -0,0 +1,71 @@
+"""
+Trace propagation across the nodes of the EVA graph.
+"""
+import threading
+from typing import Optional, TypedDict
+
+import pytest
+
+from config.tracer import Tracer, load_spans
+
+
+class TurnState(TypedDict):
+    step: int
+    trace_id: Optional[str]
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    tracer = Tracer("jsonl")
+    tracer.path = tmp_path / "trace.jsonl"
+    return tracer
+
+
+def test_nodes_share_the_trace_of_the_turn(tracer):
+    graph_module = pytest.importorskip("langgraph.graph")
+
+    @tracer.node("sense")
+    def sense(state):
+        return {"step": 1, "trace_id": tracer.new_trace()}
+
+    @tracer.node("converse")
+    def converse(state):
+        with tracer.span("llm"):
+            pass
+        return {"step": 2}
+
+    workflow = graph_module.StateGraph(TurnState)
+    workflow.add_node("sense", sense)
+    workflow.add_node("converse", converse)
+    workflow.add_edge(graph_module.START, "sense")
+    workflow.add_edge("sense", "converse")
+    workflow.add_edge("converse", graph_module.END)
+
+    state = workflow.compile().invoke({"step": 0, "trace_id": None})
+
+    spans = {span["name"]: span["trace_id"] for span in load_spans(tracer.path)}
+    assert set(spans) == {"sense", "converse", "llm"}
+    assert state["trace_id"] is not None
+    assert spans["sense"] == spans["converse"] == spans["llm"] == state["trace_id"]
+
+
+def test_use_restores_the_previous_trace(tracer):
+    with tracer.use("turn-1"):
+        with tracer.use("turn-2"):
+            assert tracer.trace_id == "turn-2"
+        assert tracer.trace_id == "turn-1"
+    assert tracer.trace_id is None
+
+
+def test_bind_carries_the_trace_into_threads(tracer):
+    seen = []
+    with tracer.use("turn-1"):
+        bound = tracer.bind(lambda: seen.append(tracer.trace_id))
+        plain = lambda: seen.append(tracer.trace_id)
+
+    for target in (bound, plain):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+    assert seen == ["turn-1", None]